@@ -0,0 +1,111 @@
+"""
+Minimum-cost bipartite assignment of rides to drivers.
+
+``distance_matrix`` computes all rider-to-driver haversine distances in one
+vectorized pass and ``solve_assignment`` solves the resulting cost matrix
+with the Hungarian algorithm (shortest augmenting paths with potentials,
+O(n^2 m) for n <= m), with the inner column scan done in NumPy.
+
+Pairs that must never be matched (too far away, driver booked) are given
+``INFEASIBLE`` cost and dropped from the result, so a batch with more rides
+than reachable drivers simply leaves some rides unassigned.
+
+This module has no app dependencies so benchmarks can use it directly.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+INFEASIBLE = 1e9
+
+
+def distance_matrix(
+    from_lats: Sequence[float],
+    from_lngs: Sequence[float],
+    to_lats: Sequence[float],
+    to_lngs: Sequence[float]
+) -> np.ndarray:
+    """Haversine distances in km, shape (len(from), len(to))"""
+    lat1 = np.radians(np.asarray(from_lats, dtype=float))[:, None]
+    lng1 = np.radians(np.asarray(from_lngs, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(to_lats, dtype=float))[None, :]
+    lng2 = np.radians(np.asarray(to_lngs, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def solve_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Minimum total cost (row, column) pairs; the smaller side is fully assigned"""
+    cost = np.asarray(cost, dtype=float)
+    if cost.size == 0:
+        return []
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    # 1-based rows/columns; column 0 is the virtual start of each augmenting path
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # owner[j] = row assigned to column j (0 = none)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(m, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            free = ~used[1:]
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            better = free & (slack < min_slack)
+            min_slack[better] = slack[better]
+            way[1:][better] = column
+
+            candidates = np.where(free, min_slack, np.inf)
+            next_column = int(np.argmin(candidates))
+            delta = candidates[next_column]
+            used_columns = np.flatnonzero(used)
+            u[owner[used_columns]] += delta
+            v[used_columns] -= delta
+            min_slack[free] -= delta
+
+            column = next_column + 1
+            if owner[column] == 0:
+                break
+
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+
+    pairs = [(int(owner[j]) - 1, j - 1) for j in range(1, m + 1) if owner[j]]
+    if transposed:
+        pairs = [(column, row) for row, column in pairs]
+    return sorted(pairs)
+
+
+def assign_batch(
+    distances: np.ndarray,
+    radius_km: float,
+    blocked: Optional[np.ndarray] = None
+) -> List[Tuple[int, int, float]]:
+    """(ride_index, driver_index, pickup_km) minimising total pickup distance.
+
+    ``distances`` is a rides x drivers matrix from ``distance_matrix``. Drivers
+    further than ``radius_km`` from a ride, or where ``blocked`` is True, are
+    never assigned to it.
+    """
+    if distances.size == 0:
+        return []
+    cost = np.where(distances <= radius_km, distances, INFEASIBLE)
+    if blocked is not None:
+        cost[blocked] = INFEASIBLE
+    return [
+        (ride, driver, float(distances[ride, driver]))
+        for ride, driver in solve_assignment(cost)
+        if cost[ride, driver] < INFEASIBLE
+    ]
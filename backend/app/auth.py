@@ -1,14 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
-from app.config import settings
 from app.database import get_db
 from app.models import User
+from app.tokens import token_service
 
 # Handle bcrypt version issue
 try:
@@ -29,23 +28,26 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+    return token_service.create(data, expires_delta)
+
+def access_token_for(user: User) -> str:
+    """Access token carrying the user's id and role alongside the email"""
+    role = user.role.value if hasattr(user.role, 'value') else str(user.role)
+    return create_access_token(data={"sub": user.email, "uid": user.id, "role": role})
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode a JWT access token"""
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
-    except JWTError:
+    """Decode a JWT access token (cached until it expires)"""
+    return token_service.decode(token)
+
+def user_from_claims(db: Session, payload: dict) -> Optional[User]:
+    """Load the token's user by primary key, or by email for tokens without a uid claim"""
+    user_id = payload.get("uid")
+    if user_id is not None:
+        return db.get(User, user_id)
+    email = payload.get("sub")
+    if email is None:
         return None
+    return db.query(User).filter(User.email == email).first()
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     """Get the current authenticated user"""
@@ -59,11 +61,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if payload is None:
         raise credentials_exception
     
-    email = payload.get("sub")
-    if email is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+    user = user_from_claims(db, payload)
     if user is None:
         raise credentials_exception
     
@@ -0,0 +1,163 @@
+"""
+Driver availability calendar.
+
+Each driver's commitments (confirmed vacations and accepted rides) are kept
+as intervals sorted by start time, alongside a running maximum of end times.
+"Is this driver free between start and end?" is then one binary search: the
+driver is busy iff some interval starting before ``end`` finishes after
+``start``, i.e. iff the running max end just before ``bisect(starts, end)``
+exceeds ``start``.
+
+The calendar is derived state: the vacations and rides tables are the
+persistent record, and ``load(db)`` rebuilds it at startup. Routers call
+``reserve``/``release`` on the same transitions that change those rows.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Ride, RideStatus, Vacation
+
+# Vacation statuses that tie a driver up for the booked dates
+ACTIVE_VACATION_STATUSES = ["confirmed", "in_progress"]
+ACTIVE_RIDE_STATUSES = [RideStatus.ACCEPTED, RideStatus.IN_PROGRESS]
+
+# Rides without a known duration block the driver for this long
+DEFAULT_RIDE_MINUTES = 60
+
+Booking = Tuple[str, int]  # ("vacation" | "ride", id)
+
+
+class DriverSchedule:
+    """One driver's bookings, sorted by start"""
+    __slots__ = ("intervals", "starts", "max_ends")
+
+    def __init__(self):
+        self.intervals: List[Tuple[float, float, Booking]] = []
+        self.starts: List[float] = []
+        self.max_ends: List[float] = []
+
+    def _reindex(self):
+        self.starts = [interval[0] for interval in self.intervals]
+        running = float("-inf")
+        self.max_ends = []
+        for _, end, _ in self.intervals:
+            running = max(running, end)
+            self.max_ends.append(running)
+
+    def add(self, start: float, end: float, booking: Booking):
+        insort(self.intervals, (start, end, booking))
+        self._reindex()
+
+    def remove(self, booking: Booking) -> bool:
+        kept = [interval for interval in self.intervals if interval[2] != booking]
+        if len(kept) == len(self.intervals):
+            return False
+        self.intervals = kept
+        self._reindex()
+        return True
+
+    def is_free(self, start: float, end: float, ignore: Optional[Booking] = None) -> bool:
+        index = bisect_left(self.starts, end)
+        if index == 0 or self.max_ends[index - 1] <= start:
+            return True
+        if ignore is None:
+            return False
+        # Rare path: the overlap might be the booking being re-checked itself
+        return all(
+            interval[2] == ignore or interval[1] <= start
+            for interval in self.intervals[:index]
+        )
+
+    def conflicts(self, start: float, end: float) -> List[Booking]:
+        index = bisect_left(self.starts, end)
+        return [booking for _, interval_end, booking in self.intervals[:index] if interval_end > start]
+
+
+def _timestamp(value: datetime) -> float:
+    """Epoch seconds; naive values (SQLite drops tzinfo) are UTC, not host-local time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def ride_window(ride: Ride) -> Tuple[datetime, datetime]:
+    """Time a ride keeps its driver busy"""
+    start = ride.scheduled_time or ride.started_at or ride.created_at or datetime.now(timezone.utc)
+    return start, start + timedelta(minutes=ride.duration_minutes or DEFAULT_RIDE_MINUTES)
+
+
+class AvailabilityCalendar:
+    def __init__(self):
+        self._drivers: Dict[int, DriverSchedule] = {}
+        self._bookings: Dict[Booking, int] = {}
+
+    def load(self, db: Session):
+        """Rebuild the calendar from active vacations and rides"""
+        self._drivers = {}
+        self._bookings = {}
+        vacations = db.query(Vacation.id, Vacation.driver_id, Vacation.start_date, Vacation.end_date).filter(
+            Vacation.driver_id != None,
+            Vacation.status.in_(ACTIVE_VACATION_STATUSES)
+        ).all()
+        for vacation_id, driver_id, start, end in vacations:
+            self.reserve(driver_id, start, end, ("vacation", vacation_id))
+
+        # Vacation legs are covered by their vacation's booking
+        rides = db.query(Ride).filter(
+            Ride.driver_id != None,
+            Ride.vacation_id == None,
+            Ride.status.in_(ACTIVE_RIDE_STATUSES)
+        ).all()
+        for ride in rides:
+            self.reserve_ride(ride)
+        print(f"Availability calendar loaded: {len(vacations)} vacations and {len(rides)} rides across {len(self._drivers)} drivers")
+
+    def reserve(self, driver_id: int, start: datetime, end: datetime, booking: Booking):
+        self.release(booking)
+        self._drivers.setdefault(driver_id, DriverSchedule()).add(_timestamp(start), _timestamp(end), booking)
+        self._bookings[booking] = driver_id
+
+    def reserve_vacation(self, vacation: Vacation):
+        self.reserve(vacation.driver_id, vacation.start_date, vacation.end_date, ("vacation", vacation.id))
+
+    def reserve_ride(self, ride: Ride):
+        start, end = ride_window(ride)
+        self.reserve(ride.driver_id, start, end, ("ride", ride.id))
+
+    def release(self, booking: Booking):
+        driver_id = self._bookings.pop(booking, None)
+        if driver_id is not None:
+            schedule = self._drivers.get(driver_id)
+            if schedule is not None:
+                schedule.remove(booking)
+                if not schedule.intervals:
+                    del self._drivers[driver_id]
+
+    def has_bookings(self, driver_id: int) -> bool:
+        return driver_id in self._drivers
+
+    def is_free(self, driver_id: int, start: datetime, end: datetime, ignore: Optional[Booking] = None) -> bool:
+        schedule = self._drivers.get(driver_id)
+        return schedule is None or schedule.is_free(_timestamp(start), _timestamp(end), ignore)
+
+    def free_drivers(self, driver_ids: Iterable[int], start: datetime, end: datetime) -> List[int]:
+        """Keep the drivers (in order) that have nothing booked between start and end"""
+        start_ts, end_ts = _timestamp(start), _timestamp(end)
+        drivers = self._drivers
+        return [
+            driver_id for driver_id in driver_ids
+            if driver_id not in drivers or drivers[driver_id].is_free(start_ts, end_ts)
+        ]
+
+    def conflicts(self, driver_id: int, start: datetime, end: datetime) -> List[Booking]:
+        schedule = self._drivers.get(driver_id)
+        return schedule.conflicts(_timestamp(start), _timestamp(end)) if schedule else []
+
+    def stats(self) -> dict:
+        return {"drivers": len(self._drivers), "bookings": len(self._bookings)}
+
+
+availability = AvailabilityCalendar()
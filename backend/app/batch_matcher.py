@@ -0,0 +1,208 @@
+"""
+Batched ride matching.
+
+With ``dispatch_mode = "batch"`` dispatched rides are not offered straight
+away. They queue for up to ``batch_window_seconds``; at the end of each
+window the matcher takes every queued ride and every idle driver, builds the
+pickup distance matrix and assigns drivers so that the total pickup distance
+of the whole batch is minimal (see ``app.assignment``). Without batching each
+ride grabs whichever nearby driver answers first, which at peak leaves later
+rides with far-away drivers and sends every driver a flood of requests to
+race for.
+
+Each assigned driver gets an exclusive offer through the offer engine, with
+the ride's other nearby drivers as fallbacks on decline or timeout. Rides
+left unassigned (no reachable idle driver) wait for the next window; after
+``batch_max_wait_seconds`` they are opened to every online driver.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.assignment import assign_batch, distance_matrix
+from app.availability import availability, ride_window
+from app.config import settings
+from app.database import SessionLocal
+from app.driver_state import driver_registry
+from app.models import Ride, RideStatus, UserRole
+from app.offers import offer_engine
+from app.websocket import manager
+
+# Extra drivers each offer can cascade to if the assigned driver passes
+FALLBACK_CANDIDATES = 10
+
+
+class PendingRide:
+    __slots__ = ("ride_id", "lat", "lng", "window_start", "window_end", "message", "queued_at")
+
+    def __init__(self, ride: Ride, message: dict):
+        self.ride_id = ride.id
+        self.lat = float(ride.pickup_lat)
+        self.lng = float(ride.pickup_lng)
+        self.window_start, self.window_end = ride_window(ride)
+        self.message = message
+        self.queued_at = time.monotonic()
+
+
+class BatchMatcher:
+    def __init__(self, enabled: bool = False, window_seconds: float = 2.0, radius_km: float = 50.0, max_wait_seconds: float = 30.0):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.radius_km = radius_km
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: Dict[int, PendingRide] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.matched = 0
+        self.expired = 0
+        self.total_pickup_km = 0.0
+        self.last_batch: dict = {}
+        self._solve_ms: Deque[float] = deque(maxlen=200)
+
+    def submit(self, ride: Ride, message: dict):
+        """Queue a dispatched ride for the next batch"""
+        self._queue[ride.id] = PendingRide(ride, message)
+
+    def cancel(self, ride_id: int):
+        self._queue.pop(ride_id, None)
+
+    def _blocked(self, rides: List[PendingRide], driver_ids: List[int]) -> np.ndarray:
+        """True where a driver is booked elsewhere during the ride; only drivers with bookings are checked"""
+        blocked = np.zeros((len(rides), len(driver_ids)), dtype=bool)
+        for column, driver_id in enumerate(driver_ids):
+            if not availability.has_bookings(driver_id):
+                continue
+            for row, ride in enumerate(rides):
+                blocked[row, column] = not availability.is_free(driver_id, ride.window_start, ride.window_end)
+        return blocked
+
+    def match(self, rides: List[PendingRide], drivers: List[Tuple[int, float, float]]) -> List[Tuple[PendingRide, List[int], float]]:
+        """(ride, candidate driver IDs with the assigned driver first, pickup_km) for each matched ride"""
+        if not rides or not drivers:
+            return []
+        driver_ids = [driver_id for driver_id, _, _ in drivers]
+        distances = distance_matrix(
+            [ride.lat for ride in rides], [ride.lng for ride in rides],
+            [lat for _, lat, _ in drivers], [lng for _, _, lng in drivers]
+        )
+        blocked = self._blocked(rides, driver_ids)
+        assignments = assign_batch(distances, self.radius_km, blocked)
+
+        assigned = {driver_index for _, driver_index, _ in assignments}
+        matches = []
+        for ride_index, driver_index, pickup_km in assignments:
+            row = distances[ride_index]
+            fallbacks = [
+                driver_ids[column] for column in np.argsort(row)
+                if column not in assigned and row[column] <= self.radius_km and not blocked[ride_index, column]
+            ][:FALLBACK_CANDIDATES]
+            matches.append((rides[ride_index], [driver_ids[driver_index]] + fallbacks, pickup_km))
+        return matches
+
+    async def run_batch(self, db: Session) -> int:
+        """Match everything queued right now; returns the number of rides offered"""
+        pending = list(self._queue.values())
+        if not pending:
+            return 0
+
+        # Rides cancelled or taken from the open listing since they were queued
+        still_open = {
+            ride_id for (ride_id,) in db.query(Ride.id).filter(
+                Ride.id.in_([ride.ride_id for ride in pending]),
+                Ride.status == RideStatus.PENDING,
+                Ride.driver_id == None
+            )
+        }
+        for ride in pending:
+            if ride.ride_id not in still_open:
+                self._queue.pop(ride.ride_id, None)
+        pending = [ride for ride in pending if ride.ride_id in still_open]
+        drivers = driver_registry.positions()
+
+        started = time.perf_counter()
+        matches = self.match(pending, drivers)
+        solve_ms = (time.perf_counter() - started) * 1000
+        self._solve_ms.append(solve_ms)
+
+        for ride, candidates, pickup_km in matches:
+            self._queue.pop(ride.ride_id, None)
+            offer_engine.offer(ride.ride_id, candidates, ride.message)
+            self.total_pickup_km += pickup_km
+        self.batches += 1
+        self.matched += len(matches)
+        self.last_batch = {
+            "at": datetime.now().isoformat(),
+            "rides": len(pending),
+            "idle_drivers": len(drivers),
+            "matched": len(matches),
+            "solve_ms": round(solve_ms, 2)
+        }
+
+        # Give up batching on rides nobody could be assigned to for too long
+        now = time.monotonic()
+        stale = [ride for ride in self._queue.values() if now - ride.queued_at >= self.max_wait_seconds]
+        if stale:
+            online_drivers = manager.online_users(UserRole.DRIVER.value)
+            for ride in stale:
+                self._queue.pop(ride.ride_id, None)
+            self.expired += len(stale)
+            print(f"Batch matcher: opening {len(stale)} unmatched rides to all drivers")
+            await asyncio.gather(*(
+                manager.send_to_many(ride.message, online_drivers, concurrency=settings.notification_concurrency)
+                for ride in stale
+            ))
+        return len(matches)
+
+    def stats(self) -> dict:
+        solve_ms = sorted(self._solve_ms)
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window_seconds,
+            "queued": len(self._queue),
+            "batches": self.batches,
+            "matched": self.matched,
+            "expired": self.expired,
+            "mean_pickup_km": round(self.total_pickup_km / self.matched, 2) if self.matched else None,
+            "solve_ms_p95": round(solve_ms[int(0.95 * (len(solve_ms) - 1))], 2) if solve_ms else None,
+            "last_batch": self.last_batch
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            if not self._queue:
+                continue
+            db = SessionLocal()
+            try:
+                await self.run_batch(db)
+            except Exception as e:
+                print(f"Batch matching failed: {e}")
+            finally:
+                db.close()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+batch_matcher = BatchMatcher(
+    enabled=settings.dispatch_mode == "batch",
+    window_seconds=settings.batch_window_seconds,
+    radius_km=settings.batch_radius_km,
+    max_wait_seconds=settings.batch_max_wait_seconds
+)
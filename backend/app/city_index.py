@@ -0,0 +1,160 @@
+"""
+In-memory index of the ``cities`` table for intercity bookings.
+
+Cities change only through ``create_city``, so they are loaded once into a
+dict keyed by id, and all city pairs are precomputed with numpy as float64
+arrays: distance, highway duration and the fare of every vehicle type
+(float32 would round some fares a paisa away from
+``calculate_intercity_price``). Booking an intercity ride or rendering an
+origin's price grid is then a lookup that never touches the database. Call
+``city_index.add_city(city)`` after creating a city; everything is rebuilt,
+which for a few hundred cities takes about a millisecond.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.assignment import distance_matrix
+from app.models import City
+
+# Intercity fare: (base + per_km * distance) * multiplier
+INTERCITY_BASE_FARE = {"economy": 200, "premium": 350, "suv": 450, "luxury": 700}
+INTERCITY_PER_KM_RATE = {"economy": 12, "premium": 18, "suv": 22, "luxury": 30}
+INTERCITY_FARE_MULTIPLIER = 1.5
+INTERCITY_VEHICLE_TYPES = list(INTERCITY_BASE_FARE)
+HIGHWAY_SPEED_KMH = 80
+
+
+@dataclass(frozen=True)
+class CityEntry:
+    id: int
+    name: str
+    lat: Optional[float]
+    lng: Optional[float]
+    is_active: bool
+
+    @classmethod
+    def from_city(cls, city: City) -> "CityEntry":
+        return cls(
+            id=city.id,
+            name=city.name,
+            lat=float(city.lat) if city.lat is not None else None,
+            lng=float(city.lng) if city.lng is not None else None,
+            is_active=city.is_active is not False
+        )
+
+
+class CityIndex:
+    def __init__(self):
+        self._cities: Dict[int, CityEntry] = {}
+        self._slots: Dict[int, int] = {}
+        self._ids: List[int] = []
+        self._distances = np.zeros((0, 0))
+        self._durations = np.zeros((0, 0))
+        # Fares indexed [vehicle type, origin, destination]
+        self._prices = np.zeros((len(INTERCITY_VEHICLE_TYPES), 0, 0))
+        self.version = 0
+
+    def _build(self, cities: List[CityEntry]):
+        cities_by_id = {city.id: city for city in cities}
+        slots = {city_id: slot for slot, city_id in enumerate(cities_by_id)}
+        # Cities without coordinates get NaN rows/columns
+        lats = [city.lat if city.lat is not None else np.nan for city in cities_by_id.values()]
+        lngs = [city.lng if city.lng is not None else np.nan for city in cities_by_id.values()]
+        distances = distance_matrix(lats, lngs, lats, lngs).astype(np.float64)
+        durations = distances / HIGHWAY_SPEED_KMH
+        base = np.array([INTERCITY_BASE_FARE[vt] for vt in INTERCITY_VEHICLE_TYPES], dtype=np.float64)[:, None, None]
+        per_km = np.array([INTERCITY_PER_KM_RATE[vt] for vt in INTERCITY_VEHICLE_TYPES], dtype=np.float64)[:, None, None]
+        prices = (base + per_km * distances[None, :, :]) * INTERCITY_FARE_MULTIPLIER
+        # Swap everything in together so readers never see a half-built index
+        self._cities, self._slots, self._ids = cities_by_id, slots, list(cities_by_id)
+        self._distances, self._durations, self._prices = distances, durations, prices
+        self.version += 1
+
+    def load(self, db: Session):
+        """(Re)build the index from the cities table"""
+        try:
+            cities = db.query(City).all()
+        except Exception as e:
+            print(f"Failed to load city index: {e}")
+            cities = []
+        self._build([CityEntry.from_city(city) for city in cities])
+        print(f"City index loaded with {len(self._cities)} cities")
+
+    def add_city(self, city: City):
+        """Index a newly created (or updated) city"""
+        cities = dict(self._cities)
+        cities[city.id] = CityEntry.from_city(city)
+        self._build(list(cities.values()))
+
+    def get(self, city_id: int) -> Optional[CityEntry]:
+        return self._cities.get(city_id)
+
+    def _pair(self, origin_id: int, destination_id: int) -> Optional[Tuple[int, int]]:
+        origin = self._slots.get(origin_id)
+        destination = self._slots.get(destination_id)
+        if origin is None or destination is None or np.isnan(self._distances[origin, destination]):
+            return None
+        return origin, destination
+
+    def distance(self, origin_id: int, destination_id: int) -> Optional[float]:
+        """Great-circle distance in km, or None if either city is unknown or has no coordinates"""
+        pair = self._pair(origin_id, destination_id)
+        return float(self._distances[pair]) if pair else None
+
+    def duration_hours(self, origin_id: int, destination_id: int) -> Optional[float]:
+        """Estimated drive time at highway speed"""
+        pair = self._pair(origin_id, destination_id)
+        return float(self._durations[pair]) if pair else None
+
+    def price(self, origin_id: int, destination_id: int, vehicle_type: str) -> Optional[float]:
+        """Precomputed fare; unknown vehicle types are priced as economy"""
+        pair = self._pair(origin_id, destination_id)
+        if pair is None:
+            return None
+        vehicle_type = vehicle_type if vehicle_type in INTERCITY_BASE_FARE else "economy"
+        return float(self._prices[(INTERCITY_VEHICLE_TYPES.index(vehicle_type),) + pair])
+
+    def nearby(self, city_id: int, radius_km: float) -> List[int]:
+        """Ids of the city itself and every city within ``radius_km`` of it"""
+        slot = self._slots.get(city_id)
+        if slot is None:
+            return [city_id]
+        close = np.flatnonzero(self._distances[slot] <= radius_km)
+        return [city_id] + [self._ids[other] for other in close if other != slot]
+
+    def price_grid(self, origin_id: int) -> Optional[List[dict]]:
+        """Distance, duration and every vehicle type's fare from ``origin_id`` to each reachable active city"""
+        origin = self._slots.get(origin_id)
+        if origin is None:
+            return None
+        distances = self._distances[origin]
+        durations = self._durations[origin]
+        prices = self._prices[:, origin, :]
+        rows = []
+        for city_id, slot in self._slots.items():
+            city = self._cities[city_id]
+            if slot == origin or not city.is_active or np.isnan(distances[slot]):
+                continue
+            rows.append({
+                "city_id": city_id,
+                "name": city.name,
+                "distance_km": round(float(distances[slot]), 1),
+                "duration_hours": round(float(durations[slot]), 2),
+                "prices": {vt: round(float(prices[v, slot]), 2) for v, vt in enumerate(INTERCITY_VEHICLE_TYPES)}
+            })
+        rows.sort(key=lambda row: row["distance_km"])
+        return rows
+
+    def stats(self) -> dict:
+        return {
+            "cities": len(self._cities),
+            "version": self.version,
+            "matrix_shape": list(self._distances.shape),
+            "matrix_bytes": int(self._distances.nbytes + self._durations.nbytes + self._prices.nbytes)
+        }
+
+
+city_index = CityIndex()
@@ -5,11 +5,65 @@ class Settings(BaseSettings):
     database_url: str
     secret_key: str
     algorithm: str = "HS256"
-    access_token_expire_minutes: int = 30
+    access_token_expire_minutes: int = 15
+    refresh_token_expire_days: int = 30
+    refresh_token_purge_hours: int = 24  # How often expired refresh tokens are deleted
+    token_cache_size: int = 10000  # Verified access tokens kept until they expire
     google_maps_api_key: str = ""
     stripe_secret_key: str = ""
     redis_url: str = "redis://localhost:6379"
     
+    # Surge pricing
+    surge_enabled: bool = True
+    surge_cell_size_deg: float = 0.02  # ~2km grid cells
+    surge_window_seconds: int = 600
+    surge_refresh_seconds: int = 15
+    surge_max_multiplier: float = 2.5
+    surge_sensitivity: float = 0.5
+    
+    # Route distance / ETA
+    route_provider: str = "haversine"  # haversine, road_graph or google
+    road_graph_path: str = ""
+    route_cache_size: int = 10000
+    route_cache_precision: int = 3  # Decimal places of lat/lng used as the cache key (~100m)
+    average_speed_kmh: float = 40.0
+    
+    # Scheduled rides
+    scheduled_ride_release_minutes: int = 15  # Offer a scheduled ride to drivers this long before pickup
+    
+    # Vacation package price cache
+    vacation_price_cache_size: int = 5000
+    vacation_price_cache_ttl_seconds: int = 600
+    
+    # Fixed vacation package dispatch
+    vacation_dispatch_radius_km: float = 50.0  # Notify drivers this close to the rider's origin city
+    vacation_dispatch_max_drivers: int = 25
+    notification_concurrency: int = 50  # WebSocket sends in flight per batch
+    
+    # WebSocket heartbeats
+    ws_heartbeat_interval_seconds: int = 20  # Ping every connection this often
+    ws_heartbeat_timeout_seconds: int = 60  # Drop connections silent for this long
+    
+    # Ride offers
+    dispatch_mode: str = "broadcast"  # broadcast, sequential (one driver at a time), wave or batch
+    offer_timeout_seconds: int = 15  # How long each driver/wave has to accept
+    offer_wave_size: int = 3  # Drivers per wave in "wave" mode
+    batch_window_seconds: float = 2.0  # "batch" mode: how long rides are collected before matching
+    batch_radius_km: float = 50.0
+    batch_max_wait_seconds: int = 30  # Unmatched rides are opened to all drivers after this
+    intercity_pooling_enabled: bool = True  # Share vehicles between intercity bookings on the same route and day
+    intercity_pool_window_hours: float = 2.0  # Max spread of scheduled times within one pool
+    intercity_pool_radius_km: float = 15.0  # Cities this close count as the same origin/destination
+    intercity_pool_sweep_minutes: int = 5  # How often departed and finished pools are closed
+    
+    # Driver state registry
+    driver_state_snapshot_seconds: int = 10  # How often changed driver states are written to driver_profiles
+    
+    # Vacation leg dispatch
+    vacation_leg_lead_minutes: int = 30  # Dispatch a leg's ride this long before it is needed
+    vacation_leg_retry_minutes: int = 5  # Re-check interval while earlier legs are still running
+    vacation_leg_expiry_hours: int = 12  # Stop trying to auto-dispatch a leg this long after its planned time
+    
     class Config:
         env_file = ".env"
 
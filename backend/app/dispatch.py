@@ -0,0 +1,179 @@
+"""
+Ride dispatch: offering pending rides to drivers.
+
+Rides requested for now are dispatched as soon as they are created. Rides
+booked for a later ``scheduled_time`` are held back and released by a
+``ride_release`` job ``scheduled_ride_release_minutes`` before pickup; the job
+scheduler keeps these in its timer heap and reloads them at startup.
+
+``rides.dispatched_at`` records when a ride was released, so driver-facing
+listings only ever look at rides that are actually open for acceptance.
+
+Depending on ``dispatch_mode`` nearby drivers are either all notified at once,
+offered the ride in turn by the offer engine (see ``app.offers``), or matched
+to rides a batch at a time (see ``app.batch_matcher``).
+
+Candidate drivers come from the in-memory driver registry, so matching runs
+no SQL. Fixed vacation packages are offered to a short list of drivers
+picked by proximity to the rider's origin city, vehicle type and free dates
+(from the availability calendar), and the notifications go out as one
+bounded concurrent batch.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.availability import availability, ride_window
+from app.batch_matcher import batch_matcher
+from app.config import settings
+from app.driver_state import ONLINE_STATES, driver_registry
+from app.geocoding import geocoder
+from app.jobs import job_scheduler
+from app.models import Ride, RideStatus, UserRole, Vacation, VehicleType
+from app.offers import offer_engine
+from app.vacation_pricing import DEFAULT_ORIGIN, departure_city
+from app.websocket import manager
+
+
+def find_nearby_drivers(pickup_lat: float, pickup_lng: float, max_distance_km: float = 50.0) -> List[int]:
+    """IDs of idle drivers within the given distance of a pickup location, nearest first"""
+    nearby = driver_registry.nearby(pickup_lat, pickup_lng, max_distance_km)
+    print(f"Found {len(nearby)} nearby drivers for pickup at ({pickup_lat}, {pickup_lng})")
+    return [driver_id for _, driver_id in nearby]
+
+
+def ride_request_message(ride: Ride) -> dict:
+    return {
+        "type": "new_ride_request",
+        "ride_id": ride.id,
+        "pickup_address": ride.pickup_address,
+        "destination_address": ride.destination_address,
+        "distance_km": round(float(ride.distance_km or 0), 2),
+        "estimated_fare": round(float(ride.estimated_fare or 0), 2),
+        "vehicle_type": ride.vehicle_type.value if ride.vehicle_type is not None else "economy",
+        "scheduled_time": ride.scheduled_time.isoformat() if ride.scheduled_time else None
+    }
+
+
+def local_time(value: datetime) -> datetime:
+    """Normalise a possibly timezone-aware datetime to naive local time"""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def release_time(ride: Ride) -> Optional[datetime]:
+    """When a scheduled ride should be offered to drivers, or None to offer it now"""
+    if ride.scheduled_time is None:
+        return None
+    release_at = local_time(ride.scheduled_time) - timedelta(minutes=settings.scheduled_ride_release_minutes)
+    return release_at if release_at > datetime.now() else None
+
+
+async def dispatch_ride(db: Session, ride: Ride):
+    """Open a pending ride for acceptance and notify nearby drivers"""
+    ride.dispatched_at = datetime.now()
+    db.commit()
+
+    if batch_matcher.enabled:
+        batch_matcher.submit(ride, ride_request_message(ride))
+        return
+
+    print(f"=== FINDING NEARBY DRIVERS FOR RIDE {ride.id} ===")
+    print(f"Pickup location: ({ride.pickup_lat}, {ride.pickup_lng})")
+    nearby_drivers = find_nearby_drivers(float(ride.pickup_lat), float(ride.pickup_lng), max_distance_km=50.0)
+    # Skip drivers already committed to a vacation or another ride at that time
+    window_start, window_end = ride_window(ride)
+    nearby_drivers = availability.free_drivers(nearby_drivers, window_start, window_end)
+
+    message = ride_request_message(ride)
+    notification_sent = False
+
+    # Exclusive offers to one driver / a small wave at a time
+    if offer_engine.enabled and nearby_drivers:
+        offer_engine.offer(ride.id, nearby_drivers, message)
+        return
+
+    # Send WebSocket notification to nearby drivers; offline drivers are never in this list
+    if nearby_drivers:
+        print(f"Sending notifications to {len(nearby_drivers)} drivers")
+        reached = await manager.send_to_many(message, nearby_drivers, concurrency=settings.notification_concurrency)
+        notification_sent = reached > 0
+    else:
+        print("No nearby drivers found")
+
+    # If no notifications were sent to nearby drivers, fall back to every online driver
+    if not notification_sent:
+        try:
+            print("Broadcasting ride request to all connected drivers as fallback")
+            await manager.send_to_many(message, manager.online_users(UserRole.DRIVER.value), concurrency=settings.notification_concurrency)
+        except Exception as e:
+            print(f"Failed to broadcast ride request: {e}")
+
+
+async def submit_ride(db: Session, ride: Ride):
+    """Dispatch a new ride now, or queue it for release ahead of its scheduled time"""
+    release_at = release_time(ride)
+    if release_at is None:
+        await dispatch_ride(db, ride)
+        return
+
+    job_scheduler.schedule(db, "ride_release", release_at, {"ride_id": ride.id}, key=f"ride_release:{ride.id}")
+    print(f"Ride {ride.id} scheduled for {ride.scheduled_time}; releasing to drivers at {release_at}")
+
+
+@job_scheduler.handler("ride_release")
+async def release_scheduled_ride(db: Session, payload: dict) -> Optional[datetime]:
+    """Release a scheduled ride to drivers unless it was cancelled or taken meanwhile"""
+    ride = db.query(Ride).filter(Ride.id == payload["ride_id"]).first()
+    if ride is None or ride.dispatched_at is not None:
+        return None
+    if ride.status != RideStatus.PENDING or ride.driver_id is not None:
+        return None
+
+    await dispatch_ride(db, ride)
+    return None
+
+
+def vehicle_type_aliases(vehicle_type: Optional[VehicleType]) -> List[VehicleType]:
+    """Vehicle types that can serve a booking (PREMIUM_UC is a legacy spelling of PREMIUM)"""
+    vehicle_type = vehicle_type or VehicleType.ECONOMY
+    if vehicle_type in (VehicleType.PREMIUM, VehicleType.PREMIUM_UC):
+        return [VehicleType.PREMIUM, VehicleType.PREMIUM_UC]
+    return [vehicle_type]
+
+
+def find_vacation_drivers(vacation: Vacation) -> List[int]:
+    """IDs of the nearest available drivers with the booked vehicle type and no overlapping vacation"""
+    origin_lat, origin_lng = geocoder.coords(departure_city(vacation.flight_details), default=DEFAULT_ORIGIN)
+    # Drivers busy on a trip right now may still be free on the vacation dates
+    ranked = driver_registry.nearby(
+        origin_lat, origin_lng,
+        settings.vacation_dispatch_radius_km,
+        states=ONLINE_STATES,
+        vehicle_types=vehicle_type_aliases(vacation.vehicle_type)
+    )
+    free = availability.free_drivers((driver_id for _, driver_id in ranked), vacation.start_date, vacation.end_date)
+    return free[:settings.vacation_dispatch_max_drivers]
+
+
+async def dispatch_vacation(vacation: Vacation) -> int:
+    """Offer a fixed vacation package to matching drivers; returns how many were reached"""
+    driver_ids = find_vacation_drivers(vacation)
+    if not driver_ids:
+        print(f"No matching drivers for vacation {vacation.id}")
+        return 0
+
+    reached = await manager.send_to_many({
+        "type": "new_vacation_request",
+        "vacation_id": vacation.id,
+        "destination": vacation.destination,
+        "hotel_name": vacation.hotel_name,
+        "start_date": vacation.start_date.isoformat(),
+        "end_date": vacation.end_date.isoformat(),
+        "total_price": float(vacation.total_price),
+        "passengers": vacation.passengers
+    }, driver_ids, concurrency=settings.notification_concurrency)
+    print(f"Vacation {vacation.id} offered to {reached}/{len(driver_ids)} matching drivers")
+    return reached
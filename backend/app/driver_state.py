@@ -0,0 +1,334 @@
+"""
+Authoritative in-memory driver state.
+
+Every driver has one record combining the inputs that used to be re-derived
+with joins on each dispatch:
+
+- ``on_duty``    - the driver's availability toggle (``DriverProfile.is_available``)
+- ``connected``  - whether the driver has a live WebSocket
+- ``ride_id``    - the ride the driver is currently committed to, if any
+- ``offer_ride_id`` - a ride currently offered exclusively to the driver
+
+from which the state is derived::
+
+    on_trip   ride in progress
+    en_route  ride accepted, heading to pickup
+    offered   waiting on the driver's answer to a ride offer
+    idle      on duty, connected and free
+    offline   everything else
+
+Routers update the registry on ride transitions, availability toggles,
+location pings and socket connects/disconnects. Matching reads it without
+touching SQL. Changed records are written back to ``driver_profiles.status``
+by a background snapshot task so the state survives in the database for
+reporting; at startup trip states are re-derived from the rides table.
+"""
+import asyncio
+import enum
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import User, DriverProfile, Ride, RideStatus, UserRole, VehicleType
+from app.utils import calculate_distance
+
+
+class DriverState(str, enum.Enum):
+    OFFLINE = "offline"
+    IDLE = "idle"
+    OFFERED = "offered"
+    EN_ROUTE = "en_route"
+    ON_TRIP = "on_trip"
+
+
+ONLINE_STATES = frozenset([DriverState.IDLE, DriverState.OFFERED, DriverState.EN_ROUTE, DriverState.ON_TRIP])
+
+
+def as_bool(value) -> bool:
+    """is_available has been stored as a string by older code paths"""
+    if isinstance(value, str):
+        return value.strip().lower() == "true"
+    return bool(value)
+
+
+class DriverRecord:
+    __slots__ = (
+        "driver_id", "profile_id", "vehicle_type", "lat", "lng",
+        "on_duty", "connected", "ride_id", "on_trip", "offer_ride_id", "offer_expires_at",
+        "state", "updated_at"
+    )
+
+    def __init__(self, driver_id: int, profile_id: Optional[int] = None):
+        self.driver_id = driver_id
+        self.profile_id = profile_id
+        self.vehicle_type: VehicleType = VehicleType.ECONOMY
+        self.lat: Optional[float] = None
+        self.lng: Optional[float] = None
+        self.on_duty = False
+        self.connected = False
+        self.ride_id: Optional[int] = None
+        self.on_trip = False
+        self.offer_ride_id: Optional[int] = None
+        self.offer_expires_at = 0.0
+        self.state = DriverState.OFFLINE
+        self.updated_at = time.time()
+
+    def derive(self, now: Optional[float] = None) -> DriverState:
+        if self.ride_id is not None:
+            return DriverState.ON_TRIP if self.on_trip else DriverState.EN_ROUTE
+        if not (self.on_duty and self.connected):
+            return DriverState.OFFLINE
+        if self.offer_ride_id is not None and self.offer_expires_at > (now or time.time()):
+            return DriverState.OFFERED
+        return DriverState.IDLE
+
+    def to_dict(self) -> dict:
+        return {
+            "driver_id": self.driver_id,
+            "state": self.state.value,
+            "on_duty": self.on_duty,
+            "connected": self.connected,
+            "ride_id": self.ride_id,
+            "offer_ride_id": self.offer_ride_id,
+            "vehicle_type": self.vehicle_type.value if self.vehicle_type else None,
+            "lat": self.lat,
+            "lng": self.lng,
+            "updated_at": datetime.fromtimestamp(self.updated_at).isoformat()
+        }
+
+
+class DriverRegistry:
+    def __init__(self, snapshot_seconds: int = 10):
+        self.snapshot_seconds = snapshot_seconds
+        self._drivers: Dict[int, DriverRecord] = {}
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self, db: Session):
+        """Build records for all active drivers; trip states come from the rides table"""
+        drivers: Dict[int, DriverRecord] = {}
+        profiles = db.query(DriverProfile).join(User).filter(
+            User.role == UserRole.DRIVER,
+            User.is_active == True
+        ).all()
+        for profile in profiles:
+            record = DriverRecord(profile.user_id, profile.id)
+            self._apply_profile(record, profile)
+            drivers[record.driver_id] = record
+
+        rides = db.query(Ride.id, Ride.driver_id, Ride.status).filter(
+            Ride.driver_id != None,
+            Ride.status.in_([RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
+        ).order_by(Ride.created_at).all()
+        for ride_id, driver_id, status in rides:
+            record = drivers.get(driver_id)
+            if record is not None:
+                record.ride_id = ride_id
+                record.on_trip = status == RideStatus.IN_PROGRESS
+
+        # Socket presence does not survive a restart, so everything else starts offline
+        for record in drivers.values():
+            record.state = record.derive()
+        self._drivers = drivers
+        self._dirty = set(drivers)
+        print(f"Driver registry loaded {len(drivers)} drivers ({len(rides)} on active rides)")
+
+    @staticmethod
+    def _apply_profile(record: DriverRecord, profile: DriverProfile):
+        record.profile_id = profile.id
+        record.vehicle_type = profile.vehicle_type or VehicleType.ECONOMY
+        record.on_duty = as_bool(profile.is_available)
+        record.lat = float(profile.current_lat) if profile.current_lat is not None else None
+        record.lng = float(profile.current_lng) if profile.current_lng is not None else None
+
+    def _record(self, driver_id: int) -> DriverRecord:
+        record = self._drivers.get(driver_id)
+        if record is None:
+            record = self._drivers[driver_id] = DriverRecord(driver_id)
+        return record
+
+    def _touch(self, record: DriverRecord):
+        state = record.derive()
+        if state != record.state:
+            record.state = state
+            record.updated_at = time.time()
+            self._dirty.add(record.driver_id)
+
+    def get(self, driver_id: int) -> Optional[DriverRecord]:
+        record = self._drivers.get(driver_id)
+        if record is not None:
+            self._touch(record)  # Lets expired offers lapse back to idle
+        return record
+
+    def state(self, driver_id: int) -> DriverState:
+        record = self.get(driver_id)
+        return record.state if record else DriverState.OFFLINE
+
+    # --- Inputs ---
+
+    def sync_profile(self, profile: DriverProfile):
+        """Pick up availability, vehicle and location changes from a driver profile"""
+        record = self._record(profile.user_id)
+        self._apply_profile(record, profile)
+        self._touch(record)
+
+    def set_on_duty(self, driver_id: int, on_duty: bool):
+        record = self._record(driver_id)
+        record.on_duty = on_duty
+        self._touch(record)
+
+    def update_location(self, driver_id: int, lat: float, lng: float):
+        record = self._record(driver_id)
+        record.lat, record.lng = lat, lng
+
+    def set_connected(self, driver_id: int, connected: bool):
+        record = self._record(driver_id)
+        record.connected = connected
+        self._touch(record)
+
+    def offer(self, driver_id: int, ride_id: int, timeout_seconds: float):
+        record = self._record(driver_id)
+        record.offer_ride_id = ride_id
+        record.offer_expires_at = time.time() + timeout_seconds
+        self._touch(record)
+
+    def clear_offer(self, driver_id: int, ride_id: Optional[int] = None):
+        record = self._drivers.get(driver_id)
+        if record is not None and (ride_id is None or record.offer_ride_id == ride_id):
+            record.offer_ride_id = None
+            record.offer_expires_at = 0.0
+            self._touch(record)
+
+    def ride_accepted(self, driver_id: int, ride_id: int):
+        record = self._record(driver_id)
+        record.ride_id = ride_id
+        record.on_trip = False
+        record.offer_ride_id = None
+        self._touch(record)
+
+    def ride_started(self, driver_id: int, ride_id: int):
+        record = self._record(driver_id)
+        record.ride_id = ride_id
+        record.on_trip = True
+        self._touch(record)
+
+    def ride_finished(self, driver_id: int, ride_id: int):
+        record = self._drivers.get(driver_id)
+        if record is not None and record.ride_id == ride_id:
+            record.ride_id = None
+            record.on_trip = False
+            self._touch(record)
+
+    # --- Queries ---
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        states: Iterable[DriverState] = (DriverState.IDLE,),
+        vehicle_types: Optional[Iterable[VehicleType]] = None
+    ) -> List[Tuple[float, int]]:
+        """(distance_km, driver_id) of drivers in the given states within radius, nearest first"""
+        states = frozenset(states)
+        vehicle_types = frozenset(vehicle_types) if vehicle_types is not None else None
+        now = time.time()
+        matches = []
+        for record in self._drivers.values():
+            if record.lat is None or record.lng is None:
+                continue
+            state = record.derive(now)
+            if state != record.state:
+                self._touch(record)
+            if state not in states:
+                continue
+            if vehicle_types is not None and record.vehicle_type not in vehicle_types:
+                continue
+            distance = calculate_distance(lat, lng, record.lat, record.lng)
+            if distance <= radius_km:
+                matches.append((distance, record.driver_id))
+        matches.sort()
+        return matches
+
+    def positions(self, states: Iterable[DriverState] = (DriverState.IDLE,)) -> List[Tuple[int, float, float]]:
+        """(driver_id, lat, lng) of every located driver in the given states"""
+        states = frozenset(states)
+        now = time.time()
+        located = []
+        for record in self._drivers.values():
+            if record.lat is None or record.lng is None:
+                continue
+            if record.derive(now) != record.state:
+                self._touch(record)
+            if record.state in states:
+                located.append((record.driver_id, record.lat, record.lng))
+        return located
+
+    def counts(self) -> Dict[str, int]:
+        counts = {state.value: 0 for state in DriverState}
+        for record in self._drivers.values():
+            self._touch(record)
+            counts[record.state.value] += 1
+        return counts
+
+    def snapshot(self) -> List[dict]:
+        return [self.get(driver_id).to_dict() for driver_id in list(self._drivers)]
+
+    # --- Persistence ---
+
+    def flush(self, db: Session) -> int:
+        """Write changed states to driver_profiles.status"""
+        dirty, self._dirty = self._dirty, set()
+        mappings = []
+        for driver_id in dirty:
+            record = self._drivers.get(driver_id)
+            if record is not None and record.profile_id is not None:
+                mappings.append({
+                    "id": record.profile_id,
+                    "status": record.state.value,
+                    "status_updated_at": datetime.fromtimestamp(record.updated_at)
+                })
+        if mappings:
+            try:
+                db.bulk_update_mappings(DriverProfile, mappings)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._dirty |= dirty
+                print(f"Driver state snapshot failed: {e}")
+                return 0
+        return len(mappings)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            db = SessionLocal()
+            try:
+                self.flush(db)
+            finally:
+                db.close()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        db = SessionLocal()
+        try:
+            self.flush(db)
+        finally:
+            db.close()
+
+
+driver_registry = DriverRegistry(snapshot_seconds=settings.driver_state_snapshot_seconds)
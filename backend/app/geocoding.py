@@ -0,0 +1,158 @@
+"""
+City name -> coordinate lookups.
+
+The ``cities`` table (plus a few built-in aliases such as state names) is
+loaded once into an exact-match dict and a prefix trie. Lookups resolve in
+O(1) for exact names and O(k) in the length of the query otherwise:
+
+1. exact (case/whitespace-insensitive) match
+2. prefix match - "bang" resolves to the shortest known name starting with it
+3. word match - "North Goa beaches" resolves via the word "goa"
+
+Call ``geocoder.add_city(city)`` after creating a city to keep it current.
+"""
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import City
+
+Coordinates = Tuple[float, float]
+
+DEFAULT_COORDINATES: Coordinates = (12.9716, 77.5946)  # Bangalore
+
+# Aliases and regions that aren't rows in the cities table
+BUILTIN_LOCATIONS: Dict[str, Coordinates] = {
+    "bangalore": (12.9716, 77.5946),
+    "bengaluru": (12.9716, 77.5946),
+    "goa": (15.2993, 74.1240),
+    "hyderabad": (17.3850, 78.4867),
+    "kolkata": (22.5726, 88.3639),
+    "delhi": (28.7041, 77.1025),
+    "new delhi": (28.6139, 77.2090),
+    "mumbai": (19.0760, 72.8777),
+    "chennai": (13.0827, 80.2707),
+    "tamil nadu": (13.0827, 80.2707),
+    "coorg": (12.3375, 75.8069),
+    "mysore": (12.2958, 76.6394),
+    "mysuru": (12.2958, 76.6394),
+    "leh": (34.1526, 77.5770),
+    "ladakh": (34.1526, 77.5770),
+    "kashmir": (34.0837, 74.7973),
+    "srinagar": (34.0837, 74.7973),
+    "mangalore": (12.9141, 74.8560),
+    "mangaluru": (12.9141, 74.8560),
+    "gokarna": (14.5479, 74.3188),
+    "kochi": (9.9312, 76.2673),
+    "kerala": (9.9312, 76.2673),
+    "jaipur": (26.9124, 75.7873),
+    "udaipur": (24.5854, 73.7125),
+}
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().replace(",", " ").split())
+
+
+class _TrieNode:
+    __slots__ = ("children", "best")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # (name length, coordinates) of the shortest name in this subtree
+        self.best: Optional[Tuple[int, Coordinates]] = None
+
+
+class GeocodingService:
+    def __init__(self):
+        self._exact: Dict[str, Coordinates] = {}
+        self._trie = _TrieNode()
+        self._build(BUILTIN_LOCATIONS)
+
+    def _build(self, locations: Dict[str, Coordinates]):
+        exact: Dict[str, Coordinates] = {}
+        trie = _TrieNode()
+        for name, coords in locations.items():
+            self._insert(exact, trie, name, coords)
+        # Swap both structures in together so readers never see a half-built index
+        self._exact, self._trie = exact, trie
+
+    @staticmethod
+    def _insert(exact: Dict[str, Coordinates], trie: _TrieNode, name: str, coords: Coordinates):
+        key = normalize_name(name)
+        if not key:
+            return
+        exact[key] = coords
+        entry = (len(key), coords)
+        node = trie
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            if node.best is None or entry[0] < node.best[0]:
+                node.best = entry
+
+    def load(self, db: Session):
+        """(Re)build the index from the cities table"""
+        locations = dict(BUILTIN_LOCATIONS)
+        try:
+            cities = db.query(City.name, City.lat, City.lng).filter(
+                City.is_active == True,
+                City.lat != None,
+                City.lng != None
+            ).all()
+        except Exception as e:
+            print(f"Failed to load cities for geocoding, using built-in locations: {e}")
+            cities = []
+
+        for name, lat, lng in cities:
+            locations[name] = (float(lat), float(lng))
+        self._build(locations)
+        print(f"Geocoding index loaded with {len(self._exact)} names ({len(cities)} from cities table)")
+
+    def add_city(self, city: City):
+        """Index a newly created city"""
+        if city.lat is None or city.lng is None or city.is_active is False:
+            return
+        self._insert(self._exact, self._trie, city.name, (float(city.lat), float(city.lng)))
+
+    def _prefix(self, key: str) -> Optional[Coordinates]:
+        node = self._trie
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node.best[1] if node.best else None
+
+    def resolve(self, name: Optional[str]) -> Optional[Coordinates]:
+        """Resolve a free-text place name, or None if nothing matches"""
+        if not name:
+            return None
+        key = normalize_name(name)
+        if not key:
+            return None
+
+        coords = self._exact.get(key)
+        if coords is not None:
+            return coords
+
+        coords = self._prefix(key)
+        if coords is not None:
+            return coords
+
+        # Longer free text such as "Baga Beach, Goa": try word pairs, then single words
+        words = key.split()
+        for pair in zip(words, words[1:]):
+            coords = self._exact.get(" ".join(pair))
+            if coords is not None:
+                return coords
+        for word in words:
+            coords = self._exact.get(word)
+            if coords is not None:
+                return coords
+        return None
+
+    def coords(self, name: Optional[str], default: Coordinates = DEFAULT_COORDINATES) -> Coordinates:
+        """Resolve a place name, falling back to ``default``"""
+        return self.resolve(name) or default
+
+
+geocoder = GeocodingService()
@@ -0,0 +1,202 @@
+"""
+Vacation itinerary planner.
+
+At booking time the vacation's flight details and activities are compiled
+once into ordered ``vacation_legs`` rows (coordinates, distance, duration and
+fare included). ``vacation.leg_cursor`` points at the next leg to dispatch, so
+advancing the trip is a single indexed lookup plus a ride insert instead of
+re-parsing JSON and recounting rides on every step.
+
+Leg order:
+
+1. departure - Home -> origin airport (requires ``departureTime``)
+2. arrival   - destination airport -> hotel (when ``arrivalTime`` is given)
+3. activity  - hotel -> activity, one per activity
+4. return    - hotel -> destination airport
+5. home      - origin airport -> Home
+
+Every leg gets a planned time so the scheduler can dispatch it. The home leg
+is planned for when the return flight (``end_date``) lands, taking as long as
+the outbound flight. Activities without a date follow the previous stop after
+``UNDATED_ACTIVITY_GAP``.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Vacation, VacationLeg, Ride, VehicleType
+from app.geocoding import geocoder
+from app.routing import route_provider
+from app.utils import calculate_distance, calculate_fare
+from app.vacation_pricing import AIRPORT_OFFSET_DEG, ACTIVITY_OFFSET_DEG
+
+# Flight time estimate when only the departure time is known
+FLIGHT_SPEED_KMH = 700
+FLIGHT_OVERHEAD = timedelta(minutes=30)
+UNDATED_ACTIVITY_GAP = timedelta(hours=2)
+
+
+def _load_json(value: Optional[str], default):
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return default
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _activity_time(activity: dict) -> Optional[datetime]:
+    if not isinstance(activity, dict) or not activity.get('date'):
+        return None
+    return _parse_time(f"{activity['date']}T{activity.get('time') or '00:00'}")
+
+
+def _flight_duration(departure_time: Optional[datetime], arrival_time: Optional[datetime], origin: tuple, destination: tuple) -> timedelta:
+    """The booked outbound flight's duration, else an estimate from the distance between the cities"""
+    comparable = departure_time and arrival_time and (departure_time.tzinfo is None) == (arrival_time.tzinfo is None)
+    if comparable and arrival_time > departure_time:
+        return arrival_time - departure_time
+    distance_km = calculate_distance(origin[0], origin[1], destination[0], destination[1])
+    return timedelta(minutes=round(distance_km / FLIGHT_SPEED_KMH * 60)) + FLIGHT_OVERHEAD
+
+
+def _plan_stops(vacation: Vacation) -> Tuple[str, list]:
+    """Vehicle type and ordered (kind, pickup address, pickup, destination address, destination, time) stops"""
+    flight_details = _load_json(vacation.flight_details, {})
+    if not isinstance(flight_details, dict):
+        flight_details = {}
+    activities = _load_json(vacation.activities, [])
+    if not isinstance(activities, list):
+        activities = []
+
+    # Without a departure there is no trip to chauffeur
+    if not flight_details.get('departureTime'):
+        return "", []
+
+    vehicle_type = vacation.vehicle_type.value if vacation.vehicle_type else VehicleType.ECONOMY.value
+    hotel_name = vacation.hotel_name or "Hotel"
+
+    origin_city = flight_details.get('departureCity') or 'Bangalore'
+    home_lat, home_lng = geocoder.coords(origin_city)
+    origin_airport = (home_lat + AIRPORT_OFFSET_DEG, home_lng + AIRPORT_OFFSET_DEG)
+
+    dest_city = vacation.destination or flight_details.get('arrivalCity') or 'Goa'
+    hotel_lat, hotel_lng = geocoder.coords(dest_city)
+    dest_airport = (hotel_lat + AIRPORT_OFFSET_DEG, hotel_lng + AIRPORT_OFFSET_DEG)
+
+    departure_time = _parse_time(flight_details.get('departureTime'))
+    arrival_time = _parse_time(flight_details.get('arrivalTime'))
+    flight = _flight_duration(departure_time, arrival_time, origin_airport, dest_airport)
+
+    stops = [
+        ("departure", "Home", (home_lat, home_lng), f"{flight_details.get('departureCity') or 'Airport'} Airport", origin_airport, departure_time)
+    ]
+    if flight_details.get('arrivalTime'):
+        stops.append(
+            ("arrival", f"{flight_details.get('arrivalCity') or 'Destination'} Airport", dest_airport, hotel_name, (hotel_lat, hotel_lng), arrival_time)
+        )
+    previous_time = arrival_time or (departure_time + flight if departure_time else None)
+    for index, activity in enumerate(activities):
+        offset = ACTIVITY_OFFSET_DEG * (index + 1)
+        location = activity.get('location', 'Activity Location') if isinstance(activity, dict) else 'Activity Location'
+        planned_time = _activity_time(activity) or (previous_time + UNDATED_ACTIVITY_GAP if previous_time else None)
+        stops.append(
+            ("activity", hotel_name, (hotel_lat, hotel_lng), location, (hotel_lat + offset, hotel_lng + offset), planned_time)
+        )
+        previous_time = planned_time or previous_time
+    stops.append(("return", hotel_name, (hotel_lat, hotel_lng), f"{dest_city} Airport", dest_airport, vacation.end_date))
+    # Picked up when the return flight lands
+    home_time = vacation.end_date + flight if vacation.end_date else None
+    stops.append(("home", f"{origin_city} Airport", origin_airport, "Home", (home_lat, home_lng), home_time))
+    return vehicle_type, stops
+
+
+async def prefetch_routes(vacation: Vacation):
+    """Resolve every leg's route ahead of compile_itinerary without blocking the event loop"""
+    _, stops = _plan_stops(vacation)
+    await route_provider.prefetch((pickup, destination) for _, _, pickup, _, destination, _ in stops)
+
+
+def build_legs(vacation: Vacation) -> List[VacationLeg]:
+    """Compute the full ordered leg list for a vacation (not yet added to a session)"""
+    vehicle_type, stops = _plan_stops(vacation)
+    legs = []
+    for sequence, (kind, pickup_address, pickup, destination_address, destination, planned_time) in enumerate(stops):
+        route = route_provider.estimate(pickup[0], pickup[1], destination[0], destination[1])
+        legs.append(VacationLeg(
+            vacation_id=vacation.id,
+            sequence=sequence,
+            kind=kind,
+            pickup_address=pickup_address,
+            pickup_lat=pickup[0],
+            pickup_lng=pickup[1],
+            destination_address=destination_address,
+            destination_lat=destination[0],
+            destination_lng=destination[1],
+            distance_km=route.distance_km,
+            duration_minutes=route.duration_minutes,
+            estimated_fare=calculate_fare(route.distance_km, vehicle_type),
+            planned_time=planned_time
+        ))
+    return legs
+
+
+def compile_itinerary(db: Session, vacation: Vacation) -> List[VacationLeg]:
+    """Persist the leg list for a vacation and reset its cursor"""
+    legs = build_legs(vacation)
+    for leg in legs:
+        db.add(leg)
+    vacation.leg_count = len(legs)
+    vacation.leg_cursor = 0
+
+    # Bookings made before itineraries existed already have rides; attach them in order
+    existing_rides = db.query(Ride).filter(Ride.vacation_id == vacation.id).order_by(Ride.created_at, Ride.id).all()
+    for leg, ride in zip(legs, existing_rides):
+        leg.ride_id = ride.id
+    vacation.leg_cursor = min(len(existing_rides), len(legs))
+
+    db.commit()
+    print(f"Compiled itinerary for vacation {vacation.id}: {len(legs)} legs")
+    return legs
+
+
+def current_legs(db: Session, vacation: Vacation) -> dict:
+    """Fetch the previous and next legs around the cursor in one indexed query"""
+    cursor = vacation.leg_cursor or 0
+    legs = db.query(VacationLeg).filter(
+        VacationLeg.vacation_id == vacation.id,
+        VacationLeg.sequence.in_([cursor - 1, cursor])
+    ).all()
+    by_sequence = {leg.sequence: leg for leg in legs}
+    return {"previous": by_sequence.get(cursor - 1), "next": by_sequence.get(cursor)}
+
+
+def ride_from_leg(vacation: Vacation, leg: VacationLeg) -> Ride:
+    return Ride(
+        rider_id=vacation.user_id,
+        vacation_id=vacation.id,
+        pickup_address=leg.pickup_address,
+        pickup_lat=leg.pickup_lat,
+        pickup_lng=leg.pickup_lng,
+        destination_address=leg.destination_address,
+        destination_lat=leg.destination_lat,
+        destination_lng=leg.destination_lng,
+        vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
+        distance_km=leg.distance_km,
+        duration_minutes=leg.duration_minutes,
+        estimated_fare=leg.estimated_fare,
+        scheduled_time=datetime.now(),
+        dispatched_at=datetime.now(),
+        driver_id=vacation.driver_id  # Assign to the vacation driver
+    )
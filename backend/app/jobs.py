@@ -0,0 +1,169 @@
+"""
+In-process job scheduler for time-based work.
+
+Jobs are persisted in ``scheduled_jobs`` and kept in a timer heap ordered by
+``run_at``. A single background task sleeps until the earliest job is due (or
+until a new job is scheduled), then runs its handler with a fresh database
+session. Pending jobs are reloaded from the table at startup, so nothing is
+lost across restarts.
+
+Handlers are registered per job kind::
+
+    @job_scheduler.handler("vacation_leg")
+    async def dispatch_leg(db, payload):
+        ...
+        return None  # done; or return a datetime to run again at that time
+"""
+import asyncio
+import heapq
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ScheduledJob
+
+JobHandler = Callable[[Session, dict], Awaitable[Optional[datetime]]]
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 60
+
+
+class JobScheduler:
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def handler(self, kind: str):
+        """Decorator registering the coroutine that runs jobs of ``kind``"""
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def _push(self, run_at: datetime, job_id: int):
+        heapq.heappush(self._heap, (run_at.timestamp(), job_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def schedule(self, db: Session, kind: str, run_at: datetime, payload: Optional[dict] = None, key: Optional[str] = None) -> ScheduledJob:
+        """Persist a job and add it to the timer heap; a pending job with the same key is moved instead"""
+        job = None
+        if key:
+            job = db.query(ScheduledJob).filter(
+                ScheduledJob.key == key,
+                ScheduledJob.status == "pending"
+            ).first()
+        if job is None:
+            job = ScheduledJob(kind=kind, key=key, status="pending", attempts=0)
+            db.add(job)
+        job.payload = json.dumps(payload or {})
+        job.run_at = run_at
+        db.commit()
+        db.refresh(job)
+
+        self._push(run_at, job.id)
+        return job
+
+    def recover(self, db: Session) -> int:
+        """Reload pending jobs (and jobs interrupted mid-run) into the heap"""
+        jobs = db.query(ScheduledJob).filter(ScheduledJob.status.in_(["pending", "running"])).all()
+        for job in jobs:
+            job.status = "pending"
+        db.commit()
+
+        self._heap = [(job.run_at.timestamp(), job.id) for job in jobs]
+        heapq.heapify(self._heap)
+        print(f"Job scheduler recovered {len(jobs)} pending jobs")
+        return len(jobs)
+
+    async def _execute(self, job_id: int):
+        db = SessionLocal()
+        try:
+            job = db.query(ScheduledJob).filter(ScheduledJob.id == job_id).first()
+            # Stale heap entry: the job finished already or was moved to a later time
+            if job is None or job.status != "pending" or job.run_at.timestamp() > time.time() + 1:
+                return
+
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                job.status = "failed"
+                job.last_error = f"No handler registered for job kind '{job.kind}'"
+                db.commit()
+                return
+
+            job.status = "running"
+            db.commit()
+
+            try:
+                next_run = await handler(db, json.loads(job.payload or "{}"))
+            except Exception as e:
+                db.rollback()
+                job = db.query(ScheduledJob).filter(ScheduledJob.id == job_id).first()
+                job.last_error = str(e)
+                job.attempts = (job.attempts or 0) + 1
+                if job.attempts < MAX_ATTEMPTS:
+                    job.status = "pending"
+                    job.run_at = datetime.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * job.attempts)
+                    db.commit()
+                    self._push(job.run_at, job.id)
+                else:
+                    job.status = "failed"
+                    db.commit()
+                print(f"Job {job_id} ({job.kind}) failed: {e}")
+                return
+
+            job = db.query(ScheduledJob).filter(ScheduledJob.id == job_id).first()
+            if next_run is not None:
+                job.status = "pending"
+                job.run_at = next_run
+                db.commit()
+                self._push(next_run, job.id)
+            else:
+                job.status = "done"
+                db.commit()
+        finally:
+            db.close()
+
+    async def run_due(self):
+        """Run every job whose time has come"""
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, job_id = heapq.heappop(self._heap)
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                print(f"Job {job_id} crashed the scheduler loop: {e}")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            await self.run_due()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+
+job_scheduler = JobScheduler()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Enum, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -65,6 +65,8 @@ class DriverProfile(Base):
     is_available = Column(Boolean, default=True)
     current_lat = Column(Float, nullable=True)
     current_lng = Column(Float, nullable=True)
+    status = Column(String, default="offline")  # Snapshot of the in-memory driver state
+    status_updated_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -92,6 +94,7 @@ class Ride(Base):
     rating = Column(Integer, nullable=True)
     feedback = Column(Text, nullable=True)
     scheduled_time = Column(DateTime(timezone=True), nullable=True)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)  # When the ride was opened to drivers
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -100,6 +103,11 @@ class Ride(Base):
     rider = relationship("User", back_populates="rides_as_rider", foreign_keys=[rider_id])
     driver = relationship("User", back_populates="rides_as_driver", foreign_keys=[driver_id])
     vacation = relationship("Vacation", back_populates="rides")
+    
+    __table_args__ = (
+        # Driver-facing "open rides" listing
+        Index("ix_rides_open", "status", "driver_id", "dispatched_at"),
+    )
 
 class City(Base):
     __tablename__ = "cities"
@@ -133,11 +141,36 @@ class IntercityRide(Base):
     estimated_duration_hours = Column(Float, nullable=True)
     price = Column(Float, nullable=False)
     passengers = Column(Integer, default=1)
+    pool_id = Column(Integer, ForeignKey("intercity_pools.id"), nullable=True, index=True)  # Shared vehicle, see app/pooling.py
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     origin_city = relationship("City", back_populates="origin_rides", foreign_keys=[origin_city_id])
     destination_city = relationship("City", back_populates="destination_rides", foreign_keys=[destination_city_id])
+    
+    __table_args__ = (
+        # Driver-facing "available rides" listing, paginated by (scheduled_date, id)
+        Index("ix_intercity_rides_open", "status", "scheduled_date", "id"),
+    )
+
+class IntercityPool(Base):
+    __tablename__ = "intercity_pools"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    origin_city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    destination_city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    travel_date = Column(Date, nullable=False)  # Day of departure_time; part of the pooling bucket
+    departure_time = Column(DateTime(timezone=True), nullable=False)  # Earliest scheduled_date among its rides
+    vehicle_type = Column(Enum(VehicleType), nullable=False)
+    capacity = Column(Integer, nullable=False)
+    seats_taken = Column(Integer, default=0)
+    status = Column(String, default="open")  # open, assigned (driver claimed it), closed (empty or merged)
+    driver_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_intercity_pools_bucket", "origin_city_id", "destination_city_id", "travel_date", "status"),
+    )
 
 class Vacation(Base):
     __tablename__ = "vacations"
@@ -166,10 +199,15 @@ class Vacation(Base):
     activities = Column(Text, nullable=True)  # JSON string containing activities schedule
     meal_preferences = Column(Text, nullable=True)  # JSON string containing meal timings
     
+    # Compiled itinerary: legs live in vacation_legs, leg_cursor is the next leg to dispatch
+    leg_count = Column(Integer, nullable=True)  # NULL until the itinerary has been compiled
+    leg_cursor = Column(Integer, default=0)
+    
     # Relationships
     user = relationship("User", back_populates="vacations", foreign_keys=[user_id])
     driver = relationship("User", foreign_keys=[driver_id])
     rides = relationship("Ride", back_populates="vacation")
+    legs = relationship("VacationLeg", back_populates="vacation", order_by="VacationLeg.sequence")
 
     @property
     def completed_rides_count(self):
@@ -179,6 +217,31 @@ class Vacation(Base):
     def has_active_ride(self):
         return any(ride.status in [RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.IN_PROGRESS] for ride in self.rides)
 
+class VacationLeg(Base):
+    __tablename__ = "vacation_legs"
+    __table_args__ = (UniqueConstraint("vacation_id", "sequence", name="uq_vacation_leg_sequence"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    vacation_id = Column(Integer, ForeignKey("vacations.id"), nullable=False, index=True)
+    sequence = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # departure, arrival, activity, return, home
+    pickup_address = Column(String, nullable=False)
+    pickup_lat = Column(Float, nullable=False)
+    pickup_lng = Column(Float, nullable=False)
+    destination_address = Column(String, nullable=False)
+    destination_lat = Column(Float, nullable=False)
+    destination_lng = Column(Float, nullable=False)
+    distance_km = Column(Float, nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    estimated_fare = Column(Float, nullable=False)
+    planned_time = Column(DateTime(timezone=True), nullable=True)  # From flight details / activity schedule
+    ride_id = Column(Integer, ForeignKey("rides.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    vacation = relationship("Vacation", back_populates="legs")
+    ride = relationship("Ride", lazy="joined")
+
 class LoyaltyPoints(Base):
     __tablename__ = "loyalty_points"
     
@@ -204,3 +267,45 @@ class Transaction(Base):
     
     # Relationships
     user = relationship("User", back_populates="transactions")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String, unique=True, nullable=False, index=True)  # sha256 of the token; the token itself is never stored
+    family_id = Column(String, nullable=False, index=True)  # Shared by every rotation descending from one login
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)  # Set when rotated, logged out or revoked for reuse
+    replaced_by_id = Column(Integer, ForeignKey("refresh_tokens.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Tariff(Base):
+    __tablename__ = "tariffs"
+    __table_args__ = (UniqueConstraint("vehicle_type", "city", name="uq_tariff_vehicle_city"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_type = Column(String, nullable=False)
+    city = Column(String, nullable=True)  # NULL means the tariff applies to every city
+    base_fare = Column(Float, nullable=False)
+    per_km_rate = Column(Float, nullable=False)
+    peak_multiplier = Column(Float, default=1.0)
+    peak_hours = Column(String, nullable=True)  # Hour ranges such as "8-11,17-21"
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+    __table_args__ = (Index("ix_scheduled_jobs_status_run_at", "status", "run_at"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=True, index=True)  # Deduplication key, e.g. "vacation:12:leg:3"
+    payload = Column(Text, nullable=True)  # JSON string passed to the job handler
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, default=0)  # Failed runs so far
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
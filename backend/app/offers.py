@@ -0,0 +1,226 @@
+"""
+Sequential / wave ride offers.
+
+With ``dispatch_mode = "broadcast"`` every nearby driver is notified at once
+and the first to accept wins. In ``"sequential"`` and ``"wave"`` modes the
+ride is instead offered to the best candidate (or the next
+``offer_wave_size`` candidates) exclusively. Each wave waits up to
+``offer_timeout_seconds`` on an asyncio timer; a timeout or a decline from
+every driver in the wave cascades to the next candidates. While an offer is
+out only the offered drivers may accept; once the candidate list is exhausted
+the ride is opened to every online driver.
+
+In ``"batch"`` mode the batch matcher (``app.batch_matcher``) picks the first
+candidate for each ride and the engine offers it sequentially from there.
+
+Time-to-accept (ride dispatch -> accept) is recorded in every mode so the
+strategies can be compared.
+"""
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set
+
+from app.config import settings
+from app.driver_state import DriverState, driver_registry
+from app.models import Ride, UserRole
+from app.websocket import manager
+
+OFFER_MODES = ("sequential", "wave", "batch")
+
+
+class RideOffer:
+    def __init__(self, ride_id: int, candidates: List[int]):
+        self.ride_id = ride_id
+        self.candidates = candidates
+        self.next_index = 0
+        self.wave: Set[int] = set()
+        self.declined: Set[int] = set()
+        self.waves_sent = 0
+        self.accepted_by: Optional[int] = None
+        self.wave_done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class OfferEngine:
+    def __init__(self, mode: str = "broadcast", timeout_seconds: float = 15, wave_size: int = 3):
+        self.mode = mode if mode in OFFER_MODES else "broadcast"
+        self.timeout_seconds = timeout_seconds
+        self.wave_size = 1 if self.mode in ("sequential", "batch") else max(1, wave_size)
+        self._offers: Dict[int, RideOffer] = {}
+
+        self.offers_sent = 0
+        self.declines = 0
+        self.expirations = 0
+        self.exhausted = 0
+        self.accepts = 0
+        self.rejected_accepts = 0
+        self._time_to_accept: Deque[float] = deque(maxlen=1000)
+        self._waves_to_accept: Deque[int] = deque(maxlen=1000)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in OFFER_MODES
+
+    def offer(self, ride_id: int, candidates: List[int], message: dict):
+        """Start offering a ride to ``candidates`` (best first)"""
+        self.cancel(ride_id)
+        offer = RideOffer(ride_id, candidates)
+        self._offers[ride_id] = offer
+        offer.task = asyncio.create_task(self._cascade(offer, message))
+
+    def _next_wave(self, offer: RideOffer) -> List[int]:
+        wave = []
+        while offer.next_index < len(offer.candidates) and len(wave) < self.wave_size:
+            driver_id = offer.candidates[offer.next_index]
+            offer.next_index += 1
+            # Candidates may have gone offline or taken another ride since dispatch
+            if driver_registry.state(driver_id) == DriverState.IDLE:
+                wave.append(driver_id)
+        return wave
+
+    async def _cascade(self, offer: RideOffer, message: dict):
+        try:
+            while True:
+                # Accepted or cancelled while the previous wave was being expired
+                if offer.accepted_by is not None or self._offers.get(offer.ride_id) is not offer:
+                    return
+                wave = self._next_wave(offer)
+                if not wave:
+                    break
+
+                offer.wave = set(wave)
+                offer.wave_done.clear()
+                offer.waves_sent += 1
+                for driver_id in wave:
+                    driver_registry.offer(driver_id, offer.ride_id, self.timeout_seconds)
+                self.offers_sent += len(wave)
+                await manager.send_to_many(
+                    dict(message, offer=True, offer_timeout_seconds=self.timeout_seconds),
+                    wave,
+                    concurrency=settings.notification_concurrency
+                )
+
+                try:
+                    await asyncio.wait_for(offer.wave_done.wait(), self.timeout_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                if offer.accepted_by is not None:
+                    return
+
+                # Close the wave before awaiting so expired drivers can no longer accept
+                expired = offer.wave - offer.declined
+                self.expirations += len(expired)
+                for driver_id in offer.wave:
+                    driver_registry.clear_offer(driver_id, offer.ride_id)
+                offer.wave = set()
+                await manager.send_to_many({"type": "ride_offer_expired", "ride_id": offer.ride_id}, expired)
+
+            # Nobody took it: open the ride to every online driver
+            if offer.accepted_by is not None or self._offers.get(offer.ride_id) is not offer:
+                return
+            self.exhausted += 1
+            self._offers.pop(offer.ride_id, None)
+            print(f"Offers for ride {offer.ride_id} exhausted after {offer.waves_sent} waves; opening to all drivers")
+            await manager.send_to_many(
+                message,
+                manager.online_users(UserRole.DRIVER.value),
+                concurrency=settings.notification_concurrency
+            )
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._offers.pop(offer.ride_id, None)
+            print(f"Offer cascade for ride {offer.ride_id} failed: {e}")
+
+    def may_accept(self, ride_id: int, driver_id: int) -> bool:
+        """While an offer is out, only the drivers in the current wave may accept"""
+        offer = self._offers.get(ride_id)
+        allowed = offer is None or driver_id in offer.wave
+        if not allowed:
+            self.rejected_accepts += 1
+        return allowed
+
+    def decline(self, ride_id: int, driver_id: int) -> bool:
+        offer = self._offers.get(ride_id)
+        if offer is None or driver_id not in offer.wave or driver_id in offer.declined:
+            return False
+        offer.declined.add(driver_id)
+        self.declines += 1
+        driver_registry.clear_offer(driver_id, ride_id)
+        if offer.wave <= offer.declined:
+            offer.wave_done.set()
+        return True
+
+    def accepted(self, ride: Ride, driver_id: int):
+        """Record an accept (in any mode) and withdraw the offer from the rest of the wave"""
+        self.accepts += 1
+        if ride.dispatched_at is not None:
+            dispatched_at = ride.dispatched_at
+            now = datetime.now(dispatched_at.tzinfo) if dispatched_at.tzinfo else datetime.now()
+            self._time_to_accept.append(max(0.0, (now - dispatched_at).total_seconds()))
+
+        offer = self._offers.pop(ride.id, None)
+        if offer is None:
+            return
+        offer.accepted_by = driver_id
+        self._waves_to_accept.append(offer.waves_sent)
+        offer.wave_done.set()
+        others = [d for d in offer.wave if d != driver_id]
+        for other in others:
+            driver_registry.clear_offer(other, ride.id)
+        if others:
+            asyncio.create_task(manager.send_to_many({"type": "ride_offer_withdrawn", "ride_id": ride.id}, others))
+        if offer.task is not None and offer.task is not asyncio.current_task():
+            offer.task.cancel()
+
+    def cancel(self, ride_id: int):
+        offer = self._offers.pop(ride_id, None)
+        if offer is None:
+            return
+        for driver_id in offer.wave:
+            driver_registry.clear_offer(driver_id, ride_id)
+        if offer.task is not None:
+            offer.task.cancel()
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+        return round(samples[index], 2)
+
+    def stats(self) -> dict:
+        samples = sorted(self._time_to_accept)
+        waves = list(self._waves_to_accept)
+        return {
+            "mode": self.mode,
+            "timeout_seconds": self.timeout_seconds,
+            "wave_size": self.wave_size,
+            "active_offers": len(self._offers),
+            "offers_sent": self.offers_sent,
+            "accepts": self.accepts,
+            "declines": self.declines,
+            "expirations": self.expirations,
+            "exhausted": self.exhausted,
+            "rejected_accepts": self.rejected_accepts,
+            "time_to_accept_seconds": {
+                "count": len(samples),
+                "mean": round(sum(samples) / len(samples), 2) if samples else None,
+                "p50": self._percentile(samples, 0.5),
+                "p95": self._percentile(samples, 0.95),
+                "max": round(samples[-1], 2) if samples else None
+            },
+            "mean_waves_to_accept": round(sum(waves) / len(waves), 2) if waves else None
+        }
+
+    async def stop(self):
+        for ride_id in list(self._offers):
+            self.cancel(ride_id)
+
+
+offer_engine = OfferEngine(
+    mode=settings.dispatch_mode,
+    timeout_seconds=settings.offer_timeout_seconds,
+    wave_size=settings.offer_wave_size
+)
@@ -0,0 +1,412 @@
+"""
+Intercity ride pooling.
+
+Intercity bookings that travel between the same (or neighbouring) cities at
+about the same time share one vehicle, a pool, up to its vehicle type's seat
+capacity. One driver accepts a pool and carries all of its bookings.
+
+Open pools are indexed in memory by ``(origin city, destination city, day)``
+bucket. A new booking looks up the buckets for its route, its neighbouring
+cities (``intercity_pool_radius_km``, from ``city_index``) and the one or two
+days its time window touches. Each lookup is a dict access, so matching never
+scans the pools table. It joins the fullest compatible pool, meaning the same
+vehicle type, enough free seats and every scheduled time within
+``intercity_pool_window_hours``. If none fits, it opens a new pool.
+
+When a booking leaves a pool (cancelled), the pools around it are re-pooled
+incrementally: smaller open pools are folded into fuller ones they now fit
+in, and emptied pools are closed. Pools a driver has claimed are never
+changed.
+
+Pools leave memory once they are over: an open pool whose departure has
+passed is closed, and a claimed pool is dropped once none of its bookings
+holds a seat any more (cancelled or completed). ``load`` does this at startup
+and the recurring ``intercity_pool_sweep`` job every
+``intercity_pool_sweep_minutes``.
+
+The ``intercity_pools`` table and ``intercity_rides.pool_id`` are the
+persistent record; ``load(db)`` rebuilds the index at startup and pools any
+pending bookings that are not in a pool yet.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.city_index import city_index
+from app.config import settings
+from app.jobs import job_scheduler
+from app.models import IntercityPool, IntercityRide, RideStatus, VehicleType
+
+# Seats per vehicle
+VEHICLE_CAPACITY = {
+    VehicleType.ECONOMY: 4,
+    VehicleType.PREMIUM: 4,
+    VehicleType.PREMIUM_UC: 4,
+    VehicleType.SUV: 6,
+    VehicleType.LUXURY: 3,
+}
+
+OPEN = "open"
+ASSIGNED = "assigned"
+CLOSED = "closed"
+
+SWEEP_JOB = "intercity_pool_sweep"
+
+# Rides that still hold a seat
+SEATED_STATUSES = [RideStatus.PENDING, RideStatus.ACCEPTED]
+
+BucketKey = Tuple[int, int, date]
+
+
+def _naive(value: datetime) -> datetime:
+    """Compare everything as naive local time (SQLite drops tzinfo, clients may send it)"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+class PoolState:
+    """In-memory view of one pool"""
+    __slots__ = ("id", "origin_city_id", "destination_city_id", "vehicle_type", "capacity", "status", "driver_id", "rides", "bucket")
+
+    def __init__(self, pool: IntercityPool):
+        self.id = pool.id
+        self.origin_city_id = pool.origin_city_id
+        self.destination_city_id = pool.destination_city_id
+        self.vehicle_type = pool.vehicle_type
+        self.capacity = pool.capacity
+        self.status = pool.status
+        self.driver_id = pool.driver_id
+        self.rides: Dict[int, Tuple[datetime, int]] = {}  # ride id -> (scheduled, passengers)
+        self.bucket: Optional[BucketKey] = None
+
+    @property
+    def seats_taken(self) -> int:
+        return sum(passengers for _, passengers in self.rides.values())
+
+    @property
+    def departure(self) -> Optional[datetime]:
+        return min((scheduled for scheduled, _ in self.rides.values()), default=None)
+
+    def is_over(self, now: datetime) -> bool:
+        """Open pools are over once they depart, claimed ones once no booking holds a seat"""
+        if not self.rides:
+            return True
+        return self.status == OPEN and self.departure < now
+
+    def fits(self, scheduled: datetime, passengers: int, window: timedelta) -> bool:
+        if self.seats_taken + passengers > self.capacity:
+            return False
+        times = [when for when, _ in self.rides.values()] + [scheduled]
+        return max(times) - min(times) <= window
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "origin_city_id": self.origin_city_id,
+            "destination_city_id": self.destination_city_id,
+            "departure_time": self.departure,
+            "vehicle_type": self.vehicle_type,
+            "capacity": self.capacity,
+            "seats_taken": self.seats_taken,
+            "status": self.status,
+            "driver_id": self.driver_id,
+            "ride_ids": sorted(self.rides)
+        }
+
+
+class PoolingEngine:
+    def __init__(self, enabled: bool = True, window_hours: float = 2.0, radius_km: float = 15.0):
+        self.enabled = enabled
+        self.window = timedelta(hours=window_hours)
+        self.radius_km = radius_km
+        self._pools: Dict[int, PoolState] = {}
+        self._buckets: Dict[BucketKey, Dict[int, PoolState]] = {}
+        self._ride_pools: Dict[int, int] = {}
+        self.created = 0
+        self.joined = 0
+        self.merged = 0
+        self.closed = 0
+
+    # Index maintenance
+
+    def _index(self, state: PoolState):
+        self._unindex(state)
+        departure = state.departure
+        if state.status != OPEN or departure is None:
+            return
+        state.bucket = (state.origin_city_id, state.destination_city_id, departure.date())
+        self._buckets.setdefault(state.bucket, {})[state.id] = state
+
+    def _unindex(self, state: PoolState):
+        if state.bucket is None:
+            return
+        bucket = self._buckets.get(state.bucket)
+        if bucket is not None:
+            bucket.pop(state.id, None)
+            if not bucket:
+                del self._buckets[state.bucket]
+        state.bucket = None
+
+    def _candidates(self, origin_city_id: int, destination_city_id: int, scheduled: datetime) -> Iterable[PoolState]:
+        """Open, not yet departed pools in every bucket a booking could share"""
+        now = datetime.now()
+        days = {(scheduled - self.window).date(), scheduled.date(), (scheduled + self.window).date()}
+        for origin in city_index.nearby(origin_city_id, self.radius_km):
+            for destination in city_index.nearby(destination_city_id, self.radius_km):
+                for day in days:
+                    for state in self._buckets.get((origin, destination, day), {}).values():
+                        if state.departure >= now:
+                            yield state
+
+    @staticmethod
+    def _sync_row(db: Session, state: PoolState):
+        departure = state.departure
+        values = {IntercityPool.seats_taken: state.seats_taken, IntercityPool.status: state.status}
+        if departure is not None:
+            values[IntercityPool.departure_time] = departure
+            values[IntercityPool.travel_date] = departure.date()
+        db.query(IntercityPool).filter(IntercityPool.id == state.id).update(values, synchronize_session=False)
+
+    # Startup
+
+    def load(self, db: Session):
+        """Rebuild the bucket index from open/assigned pools, then pool unpooled pending bookings"""
+        self._pools, self._buckets, self._ride_pools = {}, {}, {}
+        if not self.enabled:
+            return
+        pools = db.query(IntercityPool).filter(IntercityPool.status.in_([OPEN, ASSIGNED])).all()
+        for pool in pools:
+            self._pools[pool.id] = PoolState(pool)
+        if self._pools:
+            rides = db.query(IntercityRide.id, IntercityRide.pool_id, IntercityRide.scheduled_date, IntercityRide.passengers).filter(
+                IntercityRide.pool_id.in_(list(self._pools)),
+                IntercityRide.status.in_(SEATED_STATUSES)
+            ).all()
+            for ride_id, pool_id, scheduled, passengers in rides:
+                self._pools[pool_id].rides[ride_id] = (_naive(scheduled), passengers or 1)
+                self._ride_pools[ride_id] = pool_id
+        finished = [state for state in self._pools.values() if state.is_over(datetime.now())]
+        for state in finished:
+            self._retire(db, state)
+        for state in self._pools.values():
+            self._index(state)
+
+        unpooled = db.query(IntercityRide).filter(
+            IntercityRide.pool_id == None,
+            IntercityRide.status == RideStatus.PENDING,
+            IntercityRide.scheduled_date >= datetime.now()
+        ).order_by(IntercityRide.scheduled_date).all()
+        for ride in unpooled:
+            self.add_ride(db, ride)
+        print(f"Pooling engine loaded {len(self._pools)} pools ({len(self._buckets)} open buckets), closed {len(finished)} finished pools, pooled {len(unpooled)} new bookings")
+
+    # Booking changes
+
+    def add_ride(self, db: Session, ride: IntercityRide) -> Optional[PoolState]:
+        """Put a pending booking into the fullest compatible pool, or a new one"""
+        if not self.enabled or ride.id in self._ride_pools:
+            return None
+        scheduled = _naive(ride.scheduled_date)
+        passengers = ride.passengers or 1
+        best = None
+        for state in self._candidates(ride.origin_city_id, ride.destination_city_id, scheduled):
+            if state.vehicle_type != ride.vehicle_type or not state.fits(scheduled, passengers, self.window):
+                continue
+            if best is None or state.seats_taken > best.seats_taken:
+                best = state
+
+        if best is None:
+            pool = IntercityPool(
+                origin_city_id=ride.origin_city_id,
+                destination_city_id=ride.destination_city_id,
+                travel_date=scheduled.date(),
+                departure_time=scheduled,
+                vehicle_type=ride.vehicle_type,
+                # A party larger than the vehicle gets a pool of its own
+                capacity=max(VEHICLE_CAPACITY.get(ride.vehicle_type, 4), passengers),
+                status=OPEN
+            )
+            db.add(pool)
+            db.flush()
+            best = PoolState(pool)
+            self._pools[best.id] = best
+            self.created += 1
+        else:
+            self.joined += 1
+
+        ride.pool_id = best.id
+        best.rides[ride.id] = (scheduled, passengers)
+        self._ride_pools[ride.id] = best.id
+        self._sync_row(db, best)
+        db.commit()
+        self._index(best)
+        return best
+
+    def remove_ride(self, db: Session, ride: IntercityRide):
+        """Release a cancelled booking's seats and re-pool its neighbourhood"""
+        pool_id = self._ride_pools.pop(ride.id, None)
+        state = self._pools.get(pool_id) if pool_id is not None else None
+        if state is None:
+            return
+        state.rides.pop(ride.id, None)
+        if not state.rides:
+            self._close(state)
+        self._sync_row(db, state)
+        db.commit()
+        self._index(state)
+        if state.status == OPEN:
+            self._repool(db, state)
+
+    def _close(self, state: PoolState):
+        state.status = CLOSED
+        self._unindex(state)
+        self._pools.pop(state.id, None)
+        self.closed += 1
+
+    def _retire(self, db: Session, state: PoolState):
+        """Close a pool that is over and forget its bookings (they stay linked in the database)"""
+        for ride_id in state.rides:
+            if self._ride_pools.get(ride_id) == state.id:
+                del self._ride_pools[ride_id]
+        self._close(state)
+        self._sync_row(db, state)
+        db.commit()
+
+    def sweep(self, db: Session) -> int:
+        """Close departed open pools and claimed pools whose bookings no longer hold seats"""
+        assigned = [state.id for state in self._pools.values() if state.status == ASSIGNED]
+        if assigned:
+            seated = {ride_id for (ride_id,) in db.query(IntercityRide.id).filter(
+                IntercityRide.pool_id.in_(assigned),
+                IntercityRide.status.in_(SEATED_STATUSES)
+            )}
+            for pool_id in assigned:
+                state = self._pools[pool_id]
+                for ride_id in [ride_id for ride_id in state.rides if ride_id not in seated]:
+                    del state.rides[ride_id]
+                    self._ride_pools.pop(ride_id, None)
+        now = datetime.now()
+        finished = [state for state in self._pools.values() if state.is_over(now)]
+        for state in finished:
+            self._retire(db, state)
+        return len(finished)
+
+    def _repool(self, db: Session, changed: PoolState):
+        """Fold smaller open pools near ``changed`` into fuller ones they fit in"""
+        departure = changed.departure
+        if departure is None:
+            return
+        pools = {
+            state.id: state for state in self._candidates(changed.origin_city_id, changed.destination_city_id, departure)
+            if state.vehicle_type == changed.vehicle_type
+        }
+        moved = False
+        for source in sorted(pools.values(), key=lambda state: state.seats_taken):
+            if source.status != OPEN:
+                continue
+            targets = sorted(
+                (state for state in pools.values() if state.id != source.id and state.status == OPEN),
+                key=lambda state: -state.seats_taken
+            )
+            for target in targets:
+                if target.seats_taken + source.seats_taken > target.capacity:
+                    continue
+                times = [when for when, _ in target.rides.values()] + [when for when, _ in source.rides.values()]
+                if max(times) - min(times) > self.window:
+                    continue
+                db.query(IntercityRide).filter(IntercityRide.id.in_(list(source.rides))).update(
+                    {IntercityRide.pool_id: target.id}, synchronize_session=False
+                )
+                for ride_id in source.rides:
+                    self._ride_pools[ride_id] = target.id
+                target.rides.update(source.rides)
+                source.rides = {}
+                self._close(source)
+                self._sync_row(db, source)
+                self._sync_row(db, target)
+                self._index(target)
+                self.merged += 1
+                moved = True
+                break
+        if moved:
+            db.commit()
+
+    def claim(self, db: Session, pool_id: int, driver_id: int) -> bool:
+        """Assign a driver to an open pool and accept all of its pending bookings"""
+        state = self._pools.get(pool_id)
+        if state is not None and state.is_over(datetime.now()):
+            return False
+        claimed = db.query(IntercityPool).filter(
+            IntercityPool.id == pool_id,
+            IntercityPool.status == OPEN,
+            IntercityPool.driver_id == None
+        ).update({IntercityPool.driver_id: driver_id, IntercityPool.status: ASSIGNED}, synchronize_session=False)
+        if not claimed:
+            db.rollback()
+            return False
+        db.query(IntercityRide).filter(
+            IntercityRide.pool_id == pool_id,
+            IntercityRide.status == RideStatus.PENDING
+        ).update({IntercityRide.driver_id: driver_id, IntercityRide.status: RideStatus.ACCEPTED}, synchronize_session=False)
+        db.commit()
+        if state is not None:
+            state.status = ASSIGNED
+            state.driver_id = driver_id
+            self._unindex(state)
+        return True
+
+    # Queries
+
+    def pool_of(self, ride_id: int) -> Optional[int]:
+        return self._ride_pools.get(ride_id)
+
+    def get(self, pool_id: int) -> Optional[PoolState]:
+        return self._pools.get(pool_id)
+
+    def _open(self) -> List[PoolState]:
+        """Open pools that have not departed yet (the sweep closes the others)"""
+        now = datetime.now()
+        return [state for bucket in self._buckets.values() for state in bucket.values() if state.departure >= now]
+
+    def open_pools(self, limit: int = 50) -> List[dict]:
+        """Open pools by departure time, for drivers"""
+        pools = self._open()
+        pools.sort(key=lambda state: state.departure)
+        return [state.as_dict() for state in pools[:limit]]
+
+    def stats(self) -> dict:
+        open_pools = self._open()
+        seats = sum(state.capacity for state in open_pools)
+        return {
+            "enabled": self.enabled,
+            "pools": len(self._pools),
+            "open_pools": len(open_pools),
+            "buckets": len(self._buckets),
+            "pooled_rides": len(self._ride_pools),
+            "open_seat_utilization": round(sum(state.seats_taken for state in open_pools) / seats, 4) if seats else 0.0,
+            "created": self.created,
+            "joined": self.joined,
+            "merged": self.merged,
+            "closed": self.closed
+        }
+
+
+pooling_engine = PoolingEngine(
+    enabled=settings.intercity_pooling_enabled,
+    window_hours=settings.intercity_pool_window_hours,
+    radius_km=settings.intercity_pool_radius_km
+)
+
+
+@job_scheduler.handler(SWEEP_JOB)
+async def run_sweep(db: Session, payload: dict) -> Optional[datetime]:
+    closed = pooling_engine.sweep(db)
+    if closed:
+        print(f"Pooling sweep closed {closed} finished pools")
+    return datetime.now() + timedelta(minutes=settings.intercity_pool_sweep_minutes)
+
+
+def schedule_sweep(db: Session):
+    """Start the recurring sweep (moves the pending job if there is one)"""
+    if pooling_engine.enabled:
+        job_scheduler.schedule(db, SWEEP_JOB, datetime.now() + timedelta(minutes=settings.intercity_pool_sweep_minutes), key=SWEEP_JOB)
@@ -0,0 +1,130 @@
+"""
+Rotating refresh tokens.
+
+Access tokens are short-lived (``access_token_expire_minutes``). Login and
+registration also hand out an opaque refresh token that can be exchanged at
+``/api/auth/refresh`` for a new access token without a password, so renewing
+a session costs a SHA-256 and an indexed lookup instead of a bcrypt verify.
+
+Only the SHA-256 of each token is stored; tokens are 256 random bits, so a
+fast hash is enough. Every refresh rotates the token: the presented token is
+revoked and a new one is issued in the same family. Presenting a token that
+was already rotated means it leaked, so the whole family is revoked and the
+holder has to log in again. Logging out revokes the family.
+
+Rotated and revoked rows are kept until they expire so reuse can still be
+detected; a recurring ``refresh_token_purge`` job then deletes them.
+"""
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.jobs import job_scheduler
+from app.models import RefreshToken, ScheduledJob, User
+
+PURGE_JOB = "refresh_token_purge"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """Create and store a refresh token; returns the raw token (shown to the client once) and its row"""
+    token = secrets.token_urlsafe(32)
+    row = RefreshToken(
+        user_id=user_id,
+        token_hash=hash_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now() + timedelta(days=settings.refresh_token_expire_days)
+    )
+    db.add(row)
+    db.commit()
+    return token, row
+
+
+def revoke_family(db: Session, family_id: str) -> int:
+    revoked = db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at == None
+    ).update({RefreshToken.revoked_at: datetime.now()}, synchronize_session=False)
+    db.commit()
+    return revoked
+
+
+def _naive(value: datetime) -> datetime:
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+def rotate(db: Session, token: str) -> Optional[Tuple[User, str]]:
+    """Exchange a refresh token for its successor; None if it is unknown, expired, reused or revoked"""
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)).first()
+    if row is None:
+        return None
+    if row.revoked_at is not None:
+        if row.replaced_by_id is not None:
+            revoked = revoke_family(db, row.family_id)
+            print(f"Refresh token reuse detected for user {row.user_id}; revoked {revoked} tokens in family {row.family_id}")
+        return None
+    if _naive(row.expires_at) <= datetime.now():
+        return None
+
+    user = db.get(User, row.user_id)
+    if user is None or not user.is_active:
+        return None
+
+    # Claim the old token first so two concurrent refreshes cannot both succeed
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == row.id,
+        RefreshToken.revoked_at == None
+    ).update({RefreshToken.revoked_at: datetime.now()}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        revoke_family(db, row.family_id)
+        return None
+
+    new_token, new_row = issue(db, user.id, row.family_id)
+    row.replaced_by_id = new_row.id
+    db.commit()
+    return user, new_token
+
+
+def revoke(db: Session, token: str) -> bool:
+    """Log out: revoke the token's whole family"""
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)).first()
+    if row is None:
+        return False
+    revoke_family(db, row.family_id)
+    return True
+
+
+def purge_expired(db: Session) -> int:
+    """Delete tokens past their expiry (revoked or not); they can no longer be used or reused"""
+    purged = db.query(RefreshToken).filter(
+        RefreshToken.expires_at < datetime.now()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return purged
+
+
+@job_scheduler.handler(PURGE_JOB)
+async def run_purge(db: Session, payload: dict) -> Optional[datetime]:
+    purged = purge_expired(db)
+    if purged:
+        print(f"Purged {purged} expired refresh tokens")
+    return datetime.now() + timedelta(hours=settings.refresh_token_purge_hours)
+
+
+def schedule_purge(db: Session):
+    """Make sure the recurring purge job exists (kept as is if already pending)"""
+    pending = db.query(ScheduledJob.id).filter(
+        ScheduledJob.key == PURGE_JOB,
+        ScheduledJob.status == "pending"
+    ).first()
+    if pending is None:
+        job_scheduler.schedule(db, PURGE_JOB, datetime.now(), key=PURGE_JOB)
@@ -0,0 +1,96 @@
+"""
+In-memory response cache with ETag revalidation for reference data.
+
+Cities, vehicle types and tariffs are read on almost every screen but change
+only through a handful of admin writes. Their endpoints serialize the response
+once into ``response_cache`` under a fixed key; later requests are answered
+from memory, and a client sending the cached ETag in ``If-None-Match`` gets a
+bodyless 304. Neither path touches the database.
+
+Writers call ``response_cache.invalidate(key)`` after committing, and tariff
+reloads invalidate the tariff-derived keys through a tariff listener. ETags
+are hashes of the body, so they stay valid across restarts for unchanged data.
+"""
+import hashlib
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.tariffs import tariff_service
+
+CITIES = "cities"
+VEHICLE_TYPES = "vehicle_types"
+ADMIN_TARIFFS = "admin_tariffs"
+PRICE_GRID = "price_grid"  # One key per origin city: "price_grid:<city id>"
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Serialized JSON bodies and their ETags, keyed by endpoint"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def respond(self, request: Request, key: str, build: Callable[[], Any], private: bool = False) -> Response:
+        """Serve ``key`` from memory, calling ``build`` (which may query the database) only on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            body = json.dumps(jsonable_encoder(build()), separators=(",", ":")).encode()
+            entry = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+            self._entries[key] = entry
+        else:
+            self.hits += 1
+
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache" if private else "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "keys": sorted(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+response_cache = ResponseCache()
+
+# Vehicle type fares and the admin tariff list are derived from the tariff table
+tariff_service.add_listener(lambda table: response_cache.invalidate(VEHICLE_TYPES, ADMIN_TARIFFS))
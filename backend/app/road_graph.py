@@ -0,0 +1,286 @@
+"""
+Offline road-network routing engine.
+
+The road graph is held in compressed sparse row (CSR) form using flat
+``array`` buffers: ``offsets[i]:offsets[i + 1]`` indexes the outgoing edges of
+node ``i`` in ``targets``/``lengths``/``minutes``. Shortest paths are found
+with A* on travel time, using straight-line distance at the network's top
+speed as an admissible heuristic.
+
+Two file formats are supported:
+
+- OpenStreetMap XML (``.osm``/``.xml``) - drivable ``highway`` ways, honouring
+  ``oneway`` and ``maxspeed`` tags
+- JSON (``.json``)::
+
+    {
+        "nodes": {"<id>": [lat, lng], ...},
+        "edges": [[from_id, to_id, length_km, speed_kmh, oneway], ...]
+    }
+
+  ``speed_kmh`` and ``oneway`` are optional (defaults: 40 km/h, two-way).
+"""
+import heapq
+import json
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import xml.etree.ElementTree as ET
+
+from app.utils import calculate_distance
+
+EARTH_RADIUS_KM = 6371
+
+# Default speeds (km/h) for OSM highway classes when no maxspeed tag is present
+HIGHWAY_SPEEDS = {
+    "motorway": 80, "motorway_link": 50,
+    "trunk": 70, "trunk_link": 40,
+    "primary": 50, "primary_link": 35,
+    "secondary": 40, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25,
+    "unclassified": 30, "residential": 25,
+    "living_street": 10, "service": 15, "road": 30,
+}
+
+# Grid size (degrees) of the spatial index used to snap coordinates to nodes
+SNAP_CELL_DEG = 0.01
+
+Edge = Tuple[int, int, float, float, bool]  # (from, to, length_km, speed_kmh, oneway)
+
+
+def parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    """Parse an OSM maxspeed tag ("50", "50 km/h", "30 mph") into km/h"""
+    if not value:
+        return None
+    value = value.strip().lower()
+    try:
+        if value.endswith("mph"):
+            return float(value[:-3].strip()) * 1.609
+        return float(value.replace("km/h", "").replace("kmh", "").strip())
+    except ValueError:
+        return None
+
+
+class RoadGraph:
+    def __init__(
+        self,
+        lats: array,
+        lngs: array,
+        offsets: array,
+        targets: array,
+        lengths: array,
+        minutes: array,
+        max_speed_kmh: float
+    ):
+        self.lats = lats
+        self.lngs = lngs
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths
+        self.minutes = minutes
+        self.max_speed_kmh = max_speed_kmh
+
+        self._lat_rad = array("d", (math.radians(x) for x in lats))
+        self._lng_rad = array("d", (math.radians(x) for x in lngs))
+        self._cos_lat = array("d", (math.cos(x) for x in self._lat_rad))
+
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for node in range(len(lats)):
+            self._grid.setdefault(self._cell(lats[node], lngs[node]), []).append(node)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lats)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / SNAP_CELL_DEG)), int(math.floor(lng / SNAP_CELL_DEG)))
+
+    @classmethod
+    def from_edges(cls, coordinates: Sequence[Tuple[float, float]], edges: Iterable[Edge]) -> "RoadGraph":
+        """Build the CSR arrays from node coordinates and an edge list"""
+        node_count = len(coordinates)
+        sources = array("l")
+        targets = array("l")
+        lengths = array("d")
+        minutes = array("d")
+        max_speed = 1.0
+
+        for u, v, length_km, speed_kmh, oneway in edges:
+            edge_minutes = (length_km / speed_kmh) * 60
+            max_speed = max(max_speed, speed_kmh)
+            sources.append(u); targets.append(v); lengths.append(length_km); minutes.append(edge_minutes)
+            if not oneway:
+                sources.append(v); targets.append(u); lengths.append(length_km); minutes.append(edge_minutes)
+
+        # Counting sort by source node
+        offsets = array("l", [0]) * (node_count + 1)
+        for u in sources:
+            offsets[u + 1] += 1
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+
+        cursor = array("l", offsets[:-1])
+        csr_targets = array("l", [0]) * len(targets)
+        csr_lengths = array("d", [0.0]) * len(targets)
+        csr_minutes = array("d", [0.0]) * len(targets)
+        for i, u in enumerate(sources):
+            slot = cursor[u]
+            cursor[u] = slot + 1
+            csr_targets[slot] = targets[i]
+            csr_lengths[slot] = lengths[i]
+            csr_minutes[slot] = minutes[i]
+
+        return cls(
+            array("d", (c[0] for c in coordinates)),
+            array("d", (c[1] for c in coordinates)),
+            offsets, csr_targets, csr_lengths, csr_minutes, max_speed
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        if path.endswith(".json"):
+            graph = cls.from_json(path)
+        else:
+            graph = cls.from_osm(path)
+        print(f"Loaded road graph from {path}: {graph.node_count} nodes, {graph.edge_count} directed edges")
+        return graph
+
+    @classmethod
+    def from_json(cls, path: str) -> "RoadGraph":
+        with open(path) as f:
+            data = json.load(f)
+
+        index: Dict[str, int] = {}
+        coordinates: List[Tuple[float, float]] = []
+        for node_id, (lat, lng) in data["nodes"].items():
+            index[str(node_id)] = len(coordinates)
+            coordinates.append((float(lat), float(lng)))
+
+        def edges():
+            for edge in data["edges"]:
+                speed = float(edge[3]) if len(edge) > 3 and edge[3] else 40.0
+                oneway = bool(edge[4]) if len(edge) > 4 else False
+                yield index[str(edge[0])], index[str(edge[1])], float(edge[2]), speed, oneway
+
+        return cls.from_edges(coordinates, edges())
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadGraph":
+        """Parse drivable ways from an OpenStreetMap XML extract"""
+        node_coords: Dict[str, Tuple[float, float]] = {}
+        ways: List[Tuple[List[str], float, int]] = []  # (node refs, speed, direction)
+
+        for _, element in ET.iterparse(path, events=("end",)):
+            if element.tag == "node":
+                node_coords[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+                element.clear()
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+                highway = tags.get("highway")
+                if highway in HIGHWAY_SPEEDS:
+                    refs = [nd.get("ref") for nd in element.findall("nd")]
+                    speed = parse_maxspeed(tags.get("maxspeed")) or HIGHWAY_SPEEDS[highway]
+                    oneway = tags.get("oneway", "no")
+                    if oneway in ("yes", "true", "1") or highway.startswith("motorway"):
+                        direction = 1
+                    elif oneway == "-1":
+                        direction = -1
+                    else:
+                        direction = 0
+                    ways.append((refs, speed, direction))
+                element.clear()
+
+        # Keep only nodes referenced by drivable ways
+        index: Dict[str, int] = {}
+        coordinates: List[Tuple[float, float]] = []
+        edges: List[Edge] = []
+        for refs, speed, direction in ways:
+            refs = [ref for ref in refs if ref in node_coords]
+            if direction == -1:
+                refs.reverse()
+            for ref in refs:
+                if ref not in index:
+                    index[ref] = len(coordinates)
+                    coordinates.append(node_coords[ref])
+            for a, b in zip(refs, refs[1:]):
+                u, v = index[a], index[b]
+                length_km = calculate_distance(*coordinates[u], *coordinates[v])
+                edges.append((u, v, length_km, speed, direction != 0))
+
+        return cls.from_edges(coordinates, edges)
+
+    def nearest_node(self, lat: float, lng: float, max_rings: int = 3) -> Tuple[Optional[int], float]:
+        """Return the closest node to a coordinate and its distance in km"""
+        row, col = self._cell(lat, lng)
+        best_node, best_distance = None, float("inf")
+        found_ring = None
+        for ring in range(max_rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for node in self._grid.get((r, c), ()):
+                        distance = calculate_distance(lat, lng, self.lats[node], self.lngs[node])
+                        if distance < best_distance:
+                            best_node, best_distance = node, distance
+            # A closer node can still sit in the next ring (cell corners), but never further out
+            if best_node is not None:
+                if found_ring is None:
+                    found_ring = ring
+                else:
+                    break
+        return best_node, best_distance
+
+    def shortest_path(self, source: int, target: int) -> Optional[Tuple[float, float]]:
+        """A* on travel time; returns (length_km, minutes) or None if unreachable"""
+        if source == target:
+            return 0.0, 0.0
+
+        offsets, targets, lengths, minutes = self.offsets, self.targets, self.lengths, self.minutes
+        lat_rad, lng_rad, cos_lat = self._lat_rad, self._lng_rad, self._cos_lat
+        target_lat, target_lng, target_cos = lat_rad[target], lng_rad[target], cos_lat[target]
+        # km -> minutes at the fastest speed on the network keeps the heuristic admissible
+        to_minutes = 60 / self.max_speed_kmh
+        asin, sin, sqrt = math.asin, math.sin, math.sqrt
+
+        def heuristic(node: int) -> float:
+            a = sin((target_lat - lat_rad[node]) / 2) ** 2 + cos_lat[node] * target_cos * sin((target_lng - lng_rad[node]) / 2) ** 2
+            return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a))) * to_minutes
+
+        best = {source: 0.0}
+        distance = {source: 0.0}
+        closed = set()
+        queue = [(heuristic(source), 0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while queue:
+            _, cost, node = pop(queue)
+            if node == target:
+                return distance[node], cost
+            if node in closed:
+                continue
+            closed.add(node)
+            node_distance = distance[node]
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[edge]
+                if neighbour in closed:
+                    continue
+                candidate = cost + minutes[edge]
+                if candidate < best.get(neighbour, float("inf")):
+                    best[neighbour] = candidate
+                    distance[neighbour] = node_distance + lengths[edge]
+                    push(queue, (candidate + heuristic(neighbour), candidate, neighbour))
+        return None
+
+    def route(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> Optional[Tuple[float, float]]:
+        """Snap both points to the graph and return (length_km, minutes) between them"""
+        source, _ = self.nearest_node(origin_lat, origin_lng)
+        target, _ = self.nearest_node(dest_lat, dest_lng)
+        if source is None or target is None:
+            return None
+        return self.shortest_path(source, target)
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
 
 from app.database import get_db
-from app.models import User, Ride, DriverProfile, UserRole, RideStatus
-from app.schemas import AdminStats, UserResponse
+from app.models import User, Ride, DriverProfile, UserRole, RideStatus, Tariff
+from app.schemas import AdminStats, UserResponse, TariffCreate, TariffResponse
 from app.auth import get_current_active_user
+from app.tariffs import tariff_service
+from app.routing import route_provider
+from app.vacation_pricing import price_cache
+from app.driver_state import driver_registry
+from app.websocket import manager
+from app.offers import offer_engine
+from app.batch_matcher import batch_matcher
+from app.response_cache import response_cache, ADMIN_TARIFFS
+from app.pooling import pooling_engine
 
 router = APIRouter()
 
@@ -112,3 +121,94 @@ async def delete_user(
     db.commit()
     
     return {"message": "User deleted successfully"}
+
+
+@router.get("/tariffs", response_model=List[TariffResponse])
+async def get_tariffs(
+    request: Request,
+    current_user: User = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Get tariff overrides stored in the database"""
+    def build():
+        tariffs = db.query(Tariff).order_by(Tariff.vehicle_type, Tariff.city).all()
+        return [TariffResponse.model_validate(tariff) for tariff in tariffs]
+    return response_cache.respond(request, ADMIN_TARIFFS, build, private=True)
+
+@router.put("/tariffs", response_model=TariffResponse)
+async def upsert_tariff(
+    tariff_data: TariffCreate,
+    current_user: User = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Create or update a tariff and hot-reload the tariff table"""
+    vehicle_type = tariff_data.vehicle_type.lower()
+    city = tariff_data.city.strip() if tariff_data.city else None
+    
+    query = db.query(Tariff).filter(Tariff.vehicle_type == vehicle_type)
+    if city:
+        query = query.filter(Tariff.city == city)
+    else:
+        query = query.filter(Tariff.city == None)
+    tariff = query.first()
+    
+    if not tariff:
+        tariff = Tariff(vehicle_type=vehicle_type, city=city)
+        db.add(tariff)
+    
+    tariff.base_fare = tariff_data.base_fare
+    tariff.per_km_rate = tariff_data.per_km_rate
+    tariff.peak_multiplier = tariff_data.peak_multiplier
+    tariff.peak_hours = tariff_data.peak_hours
+    tariff.is_active = tariff_data.is_active
+    
+    db.commit()
+    db.refresh(tariff)
+    
+    response_cache.invalidate(ADMIN_TARIFFS)
+    tariff_service.reload(db)
+    return tariff
+
+@router.post("/tariffs/reload")
+async def reload_tariffs(
+    current_user: User = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Reload the in-memory tariff table from the database"""
+    table = tariff_service.reload(db)
+    return {"version": table.version, "tariffs": table.rows()}
+
+@router.get("/routing/stats")
+async def get_routing_stats(current_user: User = Depends(verify_admin)):
+    """Get route provider cache statistics"""
+    return route_provider.stats()
+
+@router.get("/response-cache/stats")
+async def get_response_cache_stats(current_user: User = Depends(verify_admin)):
+    """Get reference data response cache statistics"""
+    return response_cache.stats()
+
+@router.get("/pooling/stats")
+async def get_pooling_stats(current_user: User = Depends(verify_admin)):
+    """Get intercity pooling statistics"""
+    return pooling_engine.stats()
+
+@router.get("/pricing/stats")
+async def get_pricing_stats(current_user: User = Depends(verify_admin)):
+    """Get vacation package price cache statistics"""
+    return price_cache.stats()
+
+@router.get("/drivers/state")
+async def get_driver_states(current_user: User = Depends(verify_admin)):
+    """Get live driver states from the driver registry"""
+    return {"counts": driver_registry.counts(), "drivers": driver_registry.snapshot()}
+
+@router.get("/presence")
+async def get_presence(current_user: User = Depends(verify_admin)):
+    """Get online user counts per role and heartbeat statistics"""
+    return manager.stats()
+
+@router.get("/dispatch/stats")
+async def get_dispatch_stats(current_user: User = Depends(verify_admin)):
+    """Get ride offer counts, time-to-accept and batch matching statistics"""
+    return {**offer_engine.stats(), "batch": batch_matcher.stats()}
@@ -4,11 +4,24 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import User, UserRole, DriverProfile, LoyaltyPoints
-from app.schemas import UserCreate, UserResponse, Token, DriverProfileCreate
-from app.auth import get_password_hash, verify_password, create_access_token
+from app.schemas import UserCreate, UserResponse, Token, DriverProfileCreate, RefreshRequest
+from app.auth import get_password_hash, verify_password, access_token_for
+from app.driver_state import driver_registry
+from app import refresh_tokens
 
 router = APIRouter()
 
+def token_response(db: Session, user: User, refresh_token: str = None) -> dict:
+    """Access token plus a refresh token (a new session unless one is passed in)"""
+    if refresh_token is None:
+        refresh_token, _ = refresh_tokens.issue(db, user.id)
+    return {
+        "access_token": access_token_for(user),
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "user": user
+    }
+
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user (rider, driver, or admin)"""
@@ -51,15 +64,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db.add(driver_profile)
     
     db.commit()
+    if new_user.role == UserRole.DRIVER:
+        db.refresh(driver_profile)
+        driver_registry.sync_profile(driver_profile)
     
-    # Create access token
-    access_token = create_access_token(data={"sub": new_user.email})
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": new_user
-    }
+    return token_response(db, new_user)
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
@@ -79,13 +88,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Inactive user account"
         )
     
-    access_token = create_access_token(data={"sub": user.email})
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    return token_response(db, user)
 
 @router.post("/driver/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register_driver(
@@ -138,12 +141,25 @@ async def register_driver(
     
     db.add(new_driver_profile)
     db.commit()
+    db.refresh(new_driver_profile)
+    driver_registry.sync_profile(new_driver_profile)
     
-    # Create access token
-    access_token = create_access_token(data={"sub": new_user.email})
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": new_user
-    }
+    return token_response(db, new_user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    rotated = refresh_tokens.rotate(db, request.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = rotated
+    return token_response(db, user, refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the refresh token and every token rotated from the same login"""
+    refresh_tokens.revoke(db, request.refresh_token)
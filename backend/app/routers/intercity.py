@@ -1,44 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import or_, and_
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
 import math
 
 from app.database import get_db
 from app.models import User, City, IntercityRide, UserRole, RideStatus
-from app.schemas import CityCreate, CityResponse, IntercityRideCreate, IntercityRideResponse
+from app.schemas import (
+    CityCreate, CityResponse, IntercityRideCreate, IntercityRideResponse, IntercityPriceGrid, IntercityPoolResponse
+)
 from app.auth import get_current_active_user
-from app.utils import calculate_distance
+from app.geocoding import geocoder
+from app.city_index import (
+    city_index, INTERCITY_BASE_FARE, INTERCITY_PER_KM_RATE, INTERCITY_FARE_MULTIPLIER, HIGHWAY_SPEED_KMH
+)
+from app.response_cache import response_cache, CITIES, PRICE_GRID
+from app.pooling import pooling_engine
+from app.vacation_pricing import price_cache
 
 router = APIRouter()
 
-def calculate_intercity_price(distance_km: float, vehicle_type: str, base_multiplier: float = 1.5) -> float:
-    """Calculate intercity ride price"""
-    base_fare = {
-        "economy": 200,
-        "premium": 350,
-        "suv": 450,
-        "luxury": 700
-    }
-    
-    per_km_rate = {
-        "economy": 12,
-        "premium": 18,
-        "suv": 22,
-        "luxury": 30
-    }
-    
-    base = base_fare.get(vehicle_type, 200)
-    rate = per_km_rate.get(vehicle_type, 12)
+def calculate_intercity_price(distance_km: float, vehicle_type: str, base_multiplier: float = INTERCITY_FARE_MULTIPLIER) -> float:
+    """Calculate intercity ride price (city pairs with coordinates use the precomputed city_index prices)"""
+    base = INTERCITY_BASE_FARE.get(vehicle_type, INTERCITY_BASE_FARE["economy"])
+    rate = INTERCITY_PER_KM_RATE.get(vehicle_type, INTERCITY_PER_KM_RATE["economy"])
     
     return (base + (distance_km * rate)) * base_multiplier
 
 
 
+def encode_cursor(scheduled: datetime, ride_id: int) -> str:
+    """Opaque, URL-safe page cursor (a raw ISO timestamp's "+00:00" would not survive an unencoded query string)"""
+    return base64.urlsafe_b64encode(f"{scheduled.isoformat()}_{ride_id}".encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything else"""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    scheduled, ride_id = raw.rsplit("_", 1)
+    return datetime.fromisoformat(scheduled), int(ride_id)
+
+
 @router.get("/cities", response_model=List[CityResponse])
-async def get_cities(db: Session = Depends(get_db)):
+async def get_cities(request: Request, db: Session = Depends(get_db)):
     """Get all active cities"""
-    cities = db.query(City).filter(City.is_active == True).all()
-    return cities
+    def build():
+        cities = db.query(City).filter(City.is_active == True).all()
+        return [CityResponse.model_validate(city) for city in cities]
+    return response_cache.respond(request, CITIES, build)
 
 @router.post("/cities", response_model=CityResponse, status_code=status.HTTP_201_CREATED)
 async def create_city(
@@ -65,8 +76,33 @@ async def create_city(
     db.commit()
     db.refresh(new_city)
     
+    geocoder.add_city(new_city)
+    city_index.add_city(new_city)
+    response_cache.invalidate(CITIES)
+    response_cache.invalidate_prefix(PRICE_GRID)
+    # Package quotes for this name were priced with fallback coordinates
+    price_cache.clear()
+    
     return new_city
 
+@router.get("/cities/{city_id}/prices", response_model=IntercityPriceGrid)
+async def get_price_grid(city_id: int, request: Request):
+    """Distance, duration and fares from a city to every other active city"""
+    origin = city_index.get(city_id)
+    if origin is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="City not found"
+        )
+    
+    def build():
+        return {
+            "origin_city_id": origin.id,
+            "origin_name": origin.name,
+            "destinations": city_index.price_grid(origin.id)
+        }
+    return response_cache.respond(request, f"{PRICE_GRID}:{origin.id}", build)
+
 @router.post("/rides", response_model=IntercityRideResponse, status_code=status.HTTP_201_CREATED)
 async def create_intercity_ride(
     ride_data: IntercityRideCreate,
@@ -80,9 +116,9 @@ async def create_intercity_ride(
             detail="Only riders can book intercity rides"
         )
     
-    # Verify cities exist
-    origin_city = db.query(City).filter(City.id == ride_data.origin_city_id).first()
-    dest_city = db.query(City).filter(City.id == ride_data.destination_city_id).first()
+    # Verify cities exist (in-memory index, no queries)
+    origin_city = city_index.get(ride_data.origin_city_id)
+    dest_city = city_index.get(ride_data.destination_city_id)
     
     if not origin_city or not dest_city:
         raise HTTPException(
@@ -90,21 +126,18 @@ async def create_intercity_ride(
             detail="Origin or destination city not found"
         )
     
-    # Calculate distance if city coordinates are available
-    distance = None
-    if origin_city.lat and origin_city.lng and dest_city.lat and dest_city.lng:
-        distance = calculate_distance(
-            origin_city.lat, origin_city.lng,
-            dest_city.lat, dest_city.lng
-        )
+    # Precomputed pair distance, duration and price if both cities have coordinates
+    distance = city_index.distance(origin_city.id, dest_city.id)
+    if distance is not None:
+        price = round(city_index.price(origin_city.id, dest_city.id, ride_data.vehicle_type.value), 2)
+        estimated_duration = city_index.duration_hours(origin_city.id, dest_city.id)
     else:
         distance = 100  # Default distance
+        price = calculate_intercity_price(distance, ride_data.vehicle_type.value)
+        estimated_duration = distance / HIGHWAY_SPEED_KMH
     
-    # Calculate price
-    price = calculate_intercity_price(distance, ride_data.vehicle_type.value)
-    
-    # Estimate duration (assuming average highway speed of 80 km/h)
-    estimated_duration = distance / 80 if distance else 2
+    if not estimated_duration:
+        estimated_duration = 2
     
     new_ride = IntercityRide(
         rider_id=current_user.id,
@@ -124,21 +157,24 @@ async def create_intercity_ride(
     db.commit()
     db.refresh(new_ride)
     
+    # Share a vehicle with bookings on the same route and day
+    pooling_engine.add_ride(db, new_ride)
+    
     return new_ride
 
 @router.get("/rides", response_model=List[IntercityRideResponse])
 async def get_intercity_rides(
-    status: str = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get intercity rides for current user"""
     query = db.query(IntercityRide)
     
-    if status:
+    if status_filter:
         # Convert string to enum
         try:
-            status_enum = RideStatus(status.lower())
+            status_enum = RideStatus(status_filter.lower())
             query = query.filter(IntercityRide.status == status_enum)
         except ValueError:
             raise HTTPException(
@@ -160,19 +196,43 @@ async def get_intercity_rides(
 
 @router.get("/rides/available", response_model=List[IntercityRideResponse])
 async def get_available_intercity_rides(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get available intercity rides for drivers"""
+    """Get available intercity rides for drivers, newest scheduled first, one page at a time"""
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only drivers can view available rides"
         )
     
-    rides = db.query(IntercityRide).filter(
-        IntercityRide.status == RideStatus.PENDING
-    ).order_by(IntercityRide.scheduled_date.desc()).all()
+    query = db.query(IntercityRide).filter(IntercityRide.status == RideStatus.PENDING)
+    
+    # Keyset pagination on (scheduled_date, id) walks ix_intercity_rides_open instead of counting past an offset
+    if cursor:
+        try:
+            scheduled, ride_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(or_(
+            IntercityRide.scheduled_date < scheduled,
+            and_(IntercityRide.scheduled_date == scheduled, IntercityRide.id < ride_id)
+        ))
+    
+    rides = query.order_by(
+        IntercityRide.scheduled_date.desc(), IntercityRide.id.desc()
+    ).limit(limit + 1).all()
+    
+    if len(rides) > limit:
+        rides = rides[:limit]
+        last = rides[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.scheduled_date, last.id)
     
     return rides
 
@@ -189,6 +249,27 @@ async def accept_intercity_ride(
             detail="Only drivers can accept rides"
         )
     
+    # A pooled booking is one seat in a shared vehicle: the driver takes the whole pool
+    pool_id = pooling_engine.pool_of(ride_id)
+    if pool_id is not None:
+        if not pooling_engine.claim(db, pool_id, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ride is not available"
+            )
+        ride = db.query(IntercityRide).filter(IntercityRide.id == ride_id).first()
+        return {"message": "Intercity ride accepted successfully", "ride": ride, "pool": pooling_engine.get(pool_id).as_dict()}
+    
+    # Claim the ride in one conditional UPDATE so two drivers cannot both accept it
+    claimed = db.query(IntercityRide).filter(
+        IntercityRide.id == ride_id,
+        IntercityRide.status == RideStatus.PENDING
+    ).update({
+        IntercityRide.driver_id: current_user.id,
+        IntercityRide.status: RideStatus.ACCEPTED
+    }, synchronize_session=False)
+    db.commit()
+    
     ride = db.query(IntercityRide).filter(IntercityRide.id == ride_id).first()
     
     if not ride:
@@ -197,19 +278,86 @@ async def accept_intercity_ride(
             detail="Ride not found"
         )
     
-    if ride.status != RideStatus.PENDING:
+    if not claimed:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Ride is not available"
         )
     
-    ride.driver_id = current_user.id
-    ride.status = RideStatus.ACCEPTED
+    return {"message": "Intercity ride accepted successfully", "ride": ride}
+
+@router.delete("/rides/{ride_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_intercity_ride(
+    ride_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Cancel an intercity ride, freeing its seats in the shared vehicle"""
+    ride = db.query(IntercityRide).filter(IntercityRide.id == ride_id).first()
     
+    if not ride:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ride not found"
+        )
+    
+    if ride.rider_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to cancel this ride"
+        )
+    
+    if ride.status not in [RideStatus.PENDING, RideStatus.ACCEPTED]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot cancel this ride"
+        )
+    
+    ride.status = RideStatus.CANCELLED
     db.commit()
-    db.refresh(ride)
+    pooling_engine.remove_ride(db, ride)
     
-    return {"message": "Intercity ride accepted successfully", "ride": ride}
+    return None
+
+@router.get("/pools/available", response_model=List[IntercityPoolResponse])
+async def get_available_pools(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Open shared vehicles for drivers, earliest departure first"""
+    if current_user.role != UserRole.DRIVER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can view available pools"
+        )
+    return pooling_engine.open_pools(limit)
+
+@router.patch("/pools/{pool_id}/accept", response_model=IntercityPoolResponse)
+async def accept_pool(
+    pool_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Accept a shared vehicle and every booking in it (Driver only)"""
+    if current_user.role != UserRole.DRIVER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can accept rides"
+        )
+    
+    if pooling_engine.get(pool_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pool not found"
+        )
+    
+    if not pooling_engine.claim(db, pool_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pool is not available"
+        )
+    
+    return pooling_engine.get(pool_id).as_dict()
 
 @router.patch("/rides/{ride_id}/reject")
 async def reject_intercity_ide(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 from typing import List, Optional
@@ -8,7 +8,7 @@ from datetime import datetime
 from app.database import get_db
 from app.database import get_db
 from app.models import User, Ride, DriverProfile, RideStatus, UserRole, Transaction
-from app.schemas import RideCreate, RideResponse, RideUpdate, RideRating, LocationUpdate
+from app.schemas import RideCreate, RideResponse, RideUpdate, RideRating, LocationUpdate, RideQuoteRequest, RideQuoteResponse, VehicleTypeResponse
 from app.auth import get_current_active_user
 from app.websocket import manager
 
@@ -17,41 +17,15 @@ from app.routers.vacation_scheduler import schedule_next_ride
 router = APIRouter()
 
 from app.utils import calculate_fare, calculate_distance
-
-def find_nearby_drivers(db: Session, pickup_lat: float, pickup_lng: float, max_distance_km: float = 50.0) -> List[User]:
-    """Find drivers within specified distance of pickup location"""
-    # Get all available drivers with location data
-    drivers = db.query(User).join(DriverProfile).filter(
-        and_(
-            User.role == UserRole.DRIVER,
-            User.is_active == True,
-            DriverProfile.is_available == True,
-            DriverProfile.current_lat != None,
-            DriverProfile.current_lng != None
-        )
-    ).all()
-    
-    nearby_drivers = []
-    for driver in drivers:
-        if driver.driver_profile and driver.driver_profile.current_lat is not None and driver.driver_profile.current_lng is not None:
-            try:
-                distance = calculate_distance(
-                    pickup_lat, pickup_lng,
-                    float(driver.driver_profile.current_lat),
-                    float(driver.driver_profile.current_lng)
-                )
-                if distance <= max_distance_km:
-                    nearby_drivers.append(driver)
-            except (ValueError, TypeError) as e:
-                print(f"Error calculating distance for driver {driver.id}: {e}")
-                continue
-    
-    print(f"Found {len(nearby_drivers)} nearby drivers for pickup at ({pickup_lat}, {pickup_lng})")
-    for driver in nearby_drivers:
-        print(f"  Driver {driver.id} at ({driver.driver_profile.current_lat}, {driver.driver_profile.current_lng})")
-    
-    return nearby_drivers
-
+from app.tariffs import QUOTE_VEHICLE_TYPES, tariff_service
+from app.surge import surge_engine
+from app.routing import route_provider
+from app.dispatch import submit_ride
+from app.availability import availability, ride_window
+from app.driver_state import driver_registry
+from app.offers import offer_engine
+from app.batch_matcher import batch_matcher
+from app.response_cache import response_cache, VEHICLE_TYPES
 
 @router.post("/", response_model=RideResponse, status_code=status.HTTP_201_CREATED)
 async def create_ride(
@@ -66,17 +40,23 @@ async def create_ride(
             detail="Only riders can create ride requests"
         )
     
-    # Calculate distance
-    distance = calculate_distance(
+    # Calculate distance and duration
+    route = await route_provider.estimate_async(
         float(ride_data.pickup_lat), float(ride_data.pickup_lng),
         float(ride_data.destination_lat), float(ride_data.destination_lng)
     )
+    distance = route.distance_km
     
     # Calculate estimated fare
-    estimated_fare = calculate_fare(distance, ride_data.vehicle_type.value)
+    estimated_fare = calculate_fare(
+        distance, ride_data.vehicle_type.value,
+        city=ride_data.city,
+        when=ride_data.scheduled_time,
+        pickup_lat=float(ride_data.pickup_lat),
+        pickup_lng=float(ride_data.pickup_lng)
+    )
     
-    # Estimate duration (assuming average speed of 40 km/h)
-    duration = int((distance / 40) * 60)
+    duration = route.duration_minutes
     
     new_ride = Ride(
         rider_id=current_user.id,
@@ -97,61 +77,61 @@ async def create_ride(
     db.commit()
     db.refresh(new_ride)
     
-    # Find nearby drivers within 3km
-    print(f"=== FINDING NEARBY DRIVERS FOR RIDE {new_ride.id} ===")
-    print(f"Pickup location: ({ride_data.pickup_lat}, {ride_data.pickup_lng})")
-    nearby_drivers = find_nearby_drivers(
-        db, 
-        float(ride_data.pickup_lat), 
-        float(ride_data.pickup_lng), 
-        max_distance_km=50.0
-    )
-    print(f"Found {len(nearby_drivers)} nearby drivers")
+    # Count the open request towards pickup-area demand for surge pricing
+    surge_engine.record_request(new_ride.id, new_ride.pickup_lat, new_ride.pickup_lng)
     
-    notification_sent = False
+    # Offer to drivers now, or hold until shortly before the scheduled time
+    await submit_ride(db, new_ride)
+
+    return new_ride
+
+@router.post("/quote", response_model=RideQuoteResponse)
+async def quote_ride(
+    quote_data: RideQuoteRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Quote fares for every vehicle type in a single call"""
+    route = await route_provider.estimate_async(
+        quote_data.pickup_lat, quote_data.pickup_lng,
+        quote_data.destination_lat, quote_data.destination_lng
+    )
+    distance = route.distance_km
+    duration = route.duration_minutes
     
-    # Send WebSocket notification to nearby drivers
-    if nearby_drivers:
-        print(f"Sending notifications to {len(nearby_drivers)} drivers")
-        for driver in nearby_drivers:
-            # Refresh the driver to get actual values
-            db.refresh(driver)
-            try:
-                print(f"Sending WebSocket message to driver {driver.id}")
-                await manager.send_personal_message({
-                    "type": "new_ride_request",
-                    "ride_id": new_ride.id,
-                    "pickup_address": new_ride.pickup_address,
-                    "destination_address": new_ride.destination_address,
-                    "distance_km": round(float(new_ride.distance_km or 0), 2),
-                    "estimated_fare": round(float(new_ride.estimated_fare or 0), 2),
-                    "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type is not None else "economy"
-                }, int(driver.id) if driver.id is not None else 0)
-                print(f"Successfully sent WebSocket message to driver {driver.id}")
-                notification_sent = True
-            except Exception as e:
-                print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
-    else:
-        print("No nearby drivers found")
+    # Resolve against one table snapshot so all quotes come from the same tariff version
+    table = tariff_service.table
+    surge = surge_engine.multiplier(quote_data.pickup_lat, quote_data.pickup_lng)
+    quotes = [
+        {
+            "vehicle_type": vehicle_type,
+            "estimated_fare": round(table.lookup(vehicle_type, quote_data.city).fare(distance, quote_data.scheduled_time) * surge, 2)
+        }
+        for vehicle_type in QUOTE_VEHICLE_TYPES
+    ]
     
-    # If no notifications were sent to nearby drivers, broadcast to all connected drivers as fallback
-    if not notification_sent:
-        try:
-            print("Broadcasting ride request to all connected drivers as fallback")
-            await manager.broadcast({
-                "type": "new_ride_request",
-                "ride_id": new_ride.id,
-                "pickup_address": new_ride.pickup_address,
-                "destination_address": new_ride.destination_address,
-                "distance_km": round(float(new_ride.distance_km or 0), 2),
-                "estimated_fare": round(float(new_ride.estimated_fare or 0), 2),
-                "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type is not None else "economy"
-            })
-            print("Broadcast message sent to all connected drivers")
-        except Exception as e:
-            print(f"Failed to broadcast ride request: {e}")
+    return {
+        "distance_km": round(distance, 2),
+        "duration_minutes": duration,
+        "surge_multiplier": surge,
+        "quotes": quotes
+    }
 
-    return new_ride
+@router.get("/vehicle-types", response_model=List[VehicleTypeResponse])
+async def get_vehicle_types(request: Request):
+    """Vehicle types offered to riders with their standard (non-city) fares"""
+    def build():
+        table = tariff_service.table
+        return [
+            {
+                "vehicle_type": vehicle_type,
+                "base_fare": rate.base_fare,
+                "per_km_rate": rate.per_km_rate,
+                "peak_multiplier": rate.peak_multiplier,
+                "peak_hours": sorted(rate.peak_hours)
+            }
+            for vehicle_type, rate in ((vt, table.lookup(vt)) for vt in QUOTE_VEHICLE_TYPES)
+        ]
+    return response_cache.respond(request, VEHICLE_TYPES, build)
 
 @router.get("/available", response_model=List[RideResponse])
 async def get_available_rides(
@@ -172,11 +152,12 @@ async def get_available_rides(
             detail="Only drivers can view available rides"
         )
     
-    # Get all pending rides without a driver
+    # Get all pending rides without a driver; scheduled rides appear once released
     rides = db.query(Ride).filter(
         and_(
             Ride.status == RideStatus.PENDING,
-            Ride.driver_id == None
+            Ride.driver_id == None,
+            Ride.dispatched_at != None
         )
     ).order_by(Ride.created_at.desc()).all()
     
@@ -210,7 +191,8 @@ async def get_rides(
                     Ride.driver_id == current_user.id,
                     and_(
                         Ride.status == RideStatus.PENDING,
-                        Ride.driver_id == None
+                        Ride.driver_id == None,
+                        Ride.dispatched_at != None
                     )
                 )
             )
@@ -267,7 +249,8 @@ async def rate_ride(
             detail="Not authorized to rate this ride"
         )
     
-    if str(ride.status) != RideStatus.COMPLETED.value:
+    ride_status = ride.status.value if hasattr(ride.status, "value") else str(ride.status)
+    if ride_status != RideStatus.COMPLETED.value:
         log_debug(f"Invalid status: {ride.status} (Expected: {RideStatus.COMPLETED.value})")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -367,10 +350,33 @@ async def cancel_ride(
     # Cancel the ride
     ride.status = RideStatus.CANCELLED.value
     db.commit()
+    availability.release(("ride", ride.id))
+    offer_engine.cancel(ride.id)
+    batch_matcher.cancel(ride.id)
+    surge_engine.remove_request(ride.id)
+    if ride.driver_id is not None:
+        driver_registry.ride_finished(ride.driver_id, ride.id)
 
     return None
 
 
+@router.post("/{ride_id}/decline")
+async def decline_ride(
+    ride_id: int,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Decline a ride offered to the current driver so it moves on to the next candidate"""
+    if current_user.role != UserRole.DRIVER:
+        raise HTTPException(status_code=403, detail="Only drivers can decline rides")
+    
+    if not offer_engine.decline(ride_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No pending offer for this ride"
+        )
+    return {"message": "Ride offer declined"}
+
+
 @router.patch("/{ride_id}", response_model=RideResponse)
 async def update_ride(
     ride_id: int,
@@ -415,9 +421,26 @@ async def update_ride(
             
             if current_status_str != RideStatus.PENDING.value:
                 raise HTTPException(status_code=400, detail=f"Ride is not pending (current status: {current_status_str})")
+            
+            if not offer_engine.may_accept(ride.id, current_user.id):
+                raise HTTPException(status_code=409, detail="This ride is currently offered to another driver")
+            
+            # Vacation legs are covered by the vacation's own booking
+            if ride.vacation_id is None:
+                window_start, window_end = ride_window(ride)
+                if not availability.is_free(current_user.id, window_start, window_end):
+                    raise HTTPException(status_code=409, detail="You are already booked at this ride's time")
                 
             ride.driver_id = current_user.id
             ride.status = RideStatus.ACCEPTED.value
+            db.commit()
+            # In-memory state follows the accept only once it is committed
+            surge_engine.remove_driver(current_user.id)
+            surge_engine.remove_request(ride.id)
+            if ride.vacation_id is None:
+                availability.reserve_ride(ride)
+            driver_registry.ride_accepted(current_user.id, ride.id)
+            offer_engine.accepted(ride, current_user.id)
             
             # Send WebSocket notification to rider
             try:
@@ -443,6 +466,7 @@ async def update_ride(
                 
             ride.status = RideStatus.IN_PROGRESS.value
             ride.start_time = datetime.now()
+            driver_registry.ride_started(current_user.id, ride.id)
             
             # WebSocket notification
             try:
@@ -466,6 +490,8 @@ async def update_ride(
                 
             ride.status = RideStatus.COMPLETED.value
             ride.end_time = datetime.now()
+            availability.release(("ride", ride.id))
+            driver_registry.ride_finished(current_user.id, ride.id)
             
             # Process Payment
             driver = db.query(User).filter(User.id == current_user.id).first()
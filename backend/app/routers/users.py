@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
 from typing import List
 
 from app.database import get_db
@@ -9,6 +9,8 @@ from app.models import User, DriverProfile, UserRole, Ride, RideStatus, Transact
 from app.schemas import UserResponse, DriverProfileResponse, DriverWithProfile, LocationUpdate, WalletAdd, UserUpdate, DriverProfileUpdate, TransactionResponse
 from app.auth import get_current_active_user
 from app.websocket import manager
+from app.surge import surge_engine
+from app.driver_state import driver_registry, as_bool
 
 router = APIRouter()
 
@@ -92,6 +94,28 @@ async def get_drivers(
     
     return result
 
+@router.get("/{user_id}/presence")
+async def get_user_presence(
+    user_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Check whether a user currently has a live connection (admins, or the other party on an active ride)"""
+    if current_user.role != UserRole.ADMIN and user_id != current_user.id:
+        shared_ride = db.query(Ride.id).filter(
+            Ride.status.in_([RideStatus.ACCEPTED, RideStatus.IN_PROGRESS]),
+            or_(
+                and_(Ride.rider_id == current_user.id, Ride.driver_id == user_id),
+                and_(Ride.driver_id == current_user.id, Ride.rider_id == user_id)
+            )
+        ).first()
+        if shared_ride is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view this user's presence"
+            )
+    return {"user_id": user_id, "online": manager.is_online(user_id)}
+
 @router.patch("/driver/location", response_model=UserResponse)
 async def update_driver_location(
     location_data: LocationUpdate,
@@ -124,6 +148,10 @@ async def update_driver_location(
     db.refresh(driver_profile)
     db.refresh(current_user)
     
+    driver_registry.update_location(current_user.id, location_data.lat, location_data.lng)
+    if driver_profile.is_available:
+        surge_engine.record_driver(current_user.id, location_data.lat, location_data.lng)
+    
     # Send WebSocket update to all riders with active rides with this driver
     active_rides = db.query(Ride).filter(
         and_(
@@ -182,17 +210,18 @@ async def toggle_driver_availability(
     
     # Toggle availability
     # Toggle availability
-    current_status = driver_profile.is_available
-    if isinstance(current_status, str):
-        current_status = current_status.lower() == 'true'
-    
-    driver_profile.is_available = not current_status
+    driver_profile.is_available = not as_bool(driver_profile.is_available)
     
     try:
         db.commit()
         db.refresh(driver_profile)
         db.refresh(current_user)
         print(f"Driver {current_user.id} availability toggled to: {driver_profile.is_available}")
+        driver_registry.sync_profile(driver_profile)
+        if driver_profile.is_available and driver_profile.current_lat is not None and driver_profile.current_lng is not None:
+            surge_engine.record_driver(current_user.id, driver_profile.current_lat, driver_profile.current_lng)
+        else:
+            surge_engine.remove_driver(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -271,6 +300,7 @@ async def update_driver_profile(
         
     db.commit()
     db.refresh(driver_profile)
+    driver_registry.sync_profile(driver_profile)
     return driver_profile
 
 @router.put("/me", response_model=UserResponse)
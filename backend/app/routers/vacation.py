@@ -8,12 +8,14 @@ from datetime import datetime
 
 from app.database import get_db
 from app.models import User, Vacation, UserRole, Transaction, LoyaltyPoints
-from app.schemas import VacationCreate, VacationResponse
+from app.schemas import VacationCreate, VacationResponse, VacationQuoteBatchRequest, VacationQuoteBatchResponse
 from app.auth import get_current_active_user
-from app.schemas import VacationCreate, VacationResponse
 from app.auth import get_current_active_user
-from app.routers.vacation_scheduler import schedule_next_ride
-from app.utils import calculate_distance, calculate_fare
+from app.routers.vacation_scheduler import schedule_next_ride, schedule_leg_jobs
+from app.vacation_pricing import departure_city, quote_batch, quote_package
+from app.itinerary import compile_itinerary, prefetch_routes
+from app.dispatch import dispatch_vacation
+from app.availability import availability
 from app.models import UserRole
 import json
 
@@ -31,52 +33,32 @@ def calculate_vacation_price(
     hotel_included: bool,
     is_fixed_package: bool = False,
     flight_details: str = None,
-    activities: str = None
+    activities: str = None,
+    destination: str = None
 ) -> float:
     """Calculate vacation package price based on estimated cab rides"""
-    total_fare = 0.0
-    
-    # Default coordinates for estimation
-    bangalore_lat = 12.9716
-    bangalore_lng = 77.5946
-    bangalore_airport_lat = 13.1986
-    bangalore_airport_lng = 77.7066
-    
-    goa_airport_lat = 15.3808
-    goa_airport_lng = 73.8380
-    goa_hotel_lat = 15.2993
-    goa_hotel_lng = 74.1240
-    
-    # 1. Home -> Airport (Bangalore)
-    dist_home_airport = calculate_distance(bangalore_lat, bangalore_lng, bangalore_airport_lat, bangalore_airport_lng)
-    fare_home_airport = calculate_fare(dist_home_airport, vehicle_type)
-    total_fare += fare_home_airport
-    
-    # 2. Airport -> Hotel (Goa)
-    dist_airport_hotel = calculate_distance(goa_airport_lat, goa_airport_lng, goa_hotel_lat, goa_hotel_lng)
-    fare_airport_hotel = calculate_fare(dist_airport_hotel, vehicle_type)
-    total_fare += fare_airport_hotel
-    
-    # 3. Activities (Hotel -> Activity)
-    if activities:
-        try:
-            activities_list = json.loads(activities)
-            for i, activity in enumerate(activities_list):
-                # Simulate activity location with slight offset
-                activity_lat = 15.3000 + (i * 0.01)
-                activity_lng = 74.1250 + (i * 0.01)
-                
-                dist_activity = calculate_distance(goa_hotel_lat, goa_hotel_lng, activity_lat, activity_lng)
-                fare_activity = calculate_fare(dist_activity, vehicle_type)
-                total_fare += fare_activity
-        except:
-            pass
-            
-    # 4. Hotel -> Airport (Goa)
-    # Same distance as Airport -> Hotel
-    total_fare += fare_airport_hotel
-    
-    return round(total_fare, 2)
+    # Resolve origin/destination the same way the vacation scheduler does,
+    # defaulting to a Bangalore -> Goa trip when names are unknown
+    quote = quote_package(destination, vehicle_type, passengers, activities, departure_city(flight_details))
+    return quote["total_price"]
+
+@router.post("/quote/batch", response_model=VacationQuoteBatchResponse)
+async def quote_vacations(
+    quote_data: VacationQuoteBatchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Price many package variants in one call"""
+    items = [
+        {
+            "destination": item.destination,
+            "vehicle_type": item.vehicle_type.value,
+            "passengers": item.passengers,
+            "activities": item.activities,
+            "departure_city": item.departure_city
+        }
+        for item in quote_data.items
+    ]
+    return {"quotes": quote_batch(items)}
 
 @router.post("/", response_model=VacationResponse, status_code=status.HTTP_201_CREATED)
 async def create_vacation(
@@ -122,7 +104,8 @@ async def create_vacation(
             vacation_data.hotel_included,
             vacation_data.is_fixed_package,
             vacation_data.flight_details,
-            vacation_data.activities
+            vacation_data.activities,
+            vacation_data.destination
         )
     
     # Generate booking reference
@@ -160,6 +143,9 @@ async def create_vacation(
         db.commit()
         db.refresh(new_vacation)
         print(f"Vacation booking created successfully with ID: {new_vacation.id}")
+        await prefetch_routes(new_vacation)
+        compile_itinerary(db, new_vacation)
+        schedule_leg_jobs(db, new_vacation)
     except Exception as e:
         db.rollback()
         print(f"Failed to create vacation booking: {e}")
@@ -190,46 +176,11 @@ async def create_vacation(
         # Don't fail the booking if loyalty points can't be updated
         pass
     
-    # Send WebSocket notification to nearby drivers
+    # Offer fixed packages to nearby drivers
     # ONLY for fixed packages (custom packages are treated as local rides phase-by-phase)
     if vacation_data.is_fixed_package:
         try:
-            from app.websocket import manager
-            from app.routers.rides import find_nearby_drivers
-            # For simplicity, we'll notify all available drivers
-            # Get the user's location from their profile or first ride
-            default_lat = 12.9716  # Bangalore
-            default_lng = 77.5946
-            
-            # Try to get user's location from their profile or first ride
-            drivers = db.query(User).join(DriverProfile).filter(
-                and_(
-                    User.role == UserRole.DRIVER,
-                    User.is_active == True,
-                    DriverProfile.is_available == True,
-                    DriverProfile.current_lat != None,
-                    DriverProfile.current_lng != None
-                )
-            ).all()
-            
-            print(f"Found {len(drivers)} available drivers to notify")
-            
-            # Send WebSocket notification to nearby drivers
-            for driver in drivers:
-                try:
-                    await manager.send_personal_message({
-                        "type": "new_vacation_request",
-                        "vacation_id": new_vacation.id,
-                        "destination": new_vacation.destination,
-                        "hotel_name": new_vacation.hotel_name,
-                        "start_date": new_vacation.start_date.isoformat(),
-                        "end_date": new_vacation.end_date.isoformat(),
-                        "total_price": float(new_vacation.total_price),
-                        "passengers": new_vacation.passengers
-                    }, int(driver.id) if driver.id is not None else 0)
-                    print(f"Sent vacation request notification to driver {driver.id}")
-                except Exception as e:
-                    print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
+            await dispatch_vacation(new_vacation)
         except Exception as e:
             print(f"Failed to send WebSocket notifications: {e}")
             
@@ -375,6 +326,7 @@ async def cancel_vacation(
     
     vacation.status = "cancelled"
     db.commit()
+    availability.release(("vacation", vacation.id))
     
     return {"message": "Vacation booking cancelled successfully"}
 
@@ -420,10 +372,19 @@ async def confirm_vacation(
             detail="Vacation booking is not in pending status"
         )
     
+    # The driver must not already be booked for any part of these dates
+    conflicts = availability.conflicts(current_user.id, vacation.start_date, vacation.end_date)
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Driver is already booked during these dates: " + ", ".join(f"{kind} #{booking_id}" for kind, booking_id in conflicts)
+        )
+    
     vacation.status = "confirmed"
     vacation.driver_id = current_user.id  # Assign driver
     db.commit()
     db.refresh(vacation)
+    availability.reserve_vacation(vacation)
     
     # Schedule the first ride
     print(f"Vacation {vacation.id} confirmed. Scheduling first ride...")
@@ -612,6 +573,7 @@ async def complete_vacation(
         
     db.commit()
     db.refresh(vacation)
+    availability.release(("vacation", vacation.id))
     
     # Send WebSocket notification to rider
     try:
@@ -2,13 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
+import time
 from datetime import datetime, timedelta
 
 from app.database import get_db
 from app.models import User, Vacation, Ride, DriverProfile, RideStatus, UserRole, VehicleType
 from app.schemas import RideCreate
 from app.auth import get_current_active_user
-from app.utils import calculate_fare, calculate_distance
+from app.config import settings
+from app.models import VacationLeg
+from app.itinerary import compile_itinerary, current_legs, prefetch_routes, ride_from_leg
+from app.jobs import job_scheduler
+from app.availability import availability
 
 router = APIRouter()
 
@@ -27,297 +32,121 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
     if not vacation:
         return None
 
-    # Get all existing rides for this vacation
-    existing_rides = db.query(Ride).filter(Ride.vacation_id == vacation_id).order_by(Ride.created_at).all()
-    ride_count = len(existing_rides)
+    # Bookings made before itineraries existed are compiled on first use
+    if vacation.leg_count is None:
+        await prefetch_routes(vacation)
+        compile_itinerary(db, vacation)
+
+    legs = current_legs(db, vacation)
     
     # Check if the previous ride is completed (unless it's the first ride)
-    if ride_count > 0:
-        last_ride = existing_rides[-1]
+    previous_leg = legs["previous"]
+    if previous_leg is not None and previous_leg.ride is not None:
+        last_ride = previous_leg.ride
         if last_ride.status != RideStatus.COMPLETED:
             print(f"Cannot schedule next ride. Previous ride {last_ride.id} is not completed (Status: {last_ride.status})")
             return None
-    
-    # Parse schedule data
-    schedule = parse_schedule(vacation)
-    flight_details = {}
-    if vacation.flight_details:
-        try:
-            flight_details = json.loads(vacation.flight_details)
-        except json.JSONDecodeError:
-            pass
-            
-    activities = []
-    if vacation.activities:
-        try:
-            activities = json.loads(vacation.activities)
-        except json.JSONDecodeError:
-            pass
-
-    # Determine which ride to create
-    new_ride = None
 
-    # City Coordinates Database
-    CITY_COORDINATES = {
-        "bangalore": (12.9716, 77.5946),
-        "bengaluru": (12.9716, 77.5946),
-        "goa": (15.2993, 74.1240),
-        "hyderabad": (17.3850, 78.4867),
-        "kolkata": (22.5726, 88.3639),
-        "delhi": (28.7041, 77.1025),
-        "new delhi": (28.6139, 77.2090),
-        "mumbai": (19.0760, 72.8777),
-        "chennai": (13.0827, 80.2707),
-        "tamil nadu": (13.0827, 80.2707), 
-        "coorg": (12.3375, 75.8069),
-        "mysore": (12.2958, 76.6394),
-        "mysuru": (12.2958, 76.6394),
-        "leh": (34.1526, 77.5770),
-        "ladakh": (34.1526, 77.5770),
-        "kashmir": (34.0837, 74.7973), 
-        "srinagar": (34.0837, 74.7973),
-        "mangalore": (12.9141, 74.8560),
-        "mangaluru": (12.9141, 74.8560),
-        "gokarna": (14.5479, 74.3188),
-        "kochi": (9.9312, 76.2673),
-        "kerala": (9.9312, 76.2673), 
-        "jaipur": (26.9124, 75.7873),
-        "udaipur": (24.5854, 73.7125)
-    }
+    next_leg = legs["next"]
+    if next_leg is None:
+        # All ride legs completed
+        if vacation.leg_count and previous_leg is not None and vacation.status != "completed":
+            print(f"All rides completed for vacation {vacation_id}. Updating status.")
+            vacation.status = "completed"
+            db.commit()
+            availability.release(("vacation", vacation.id))
+        return None
 
-    def get_city_coords(city_name):
-        if not city_name:
-            return (12.9716, 77.5946) # Default to Bangalore
-        
-        city_lower = city_name.lower().strip()
-        if city_lower in CITY_COORDINATES:
-            return CITY_COORDINATES[city_lower]
-        
-        for key, coords in CITY_COORDINATES.items():
-            if key in city_lower or city_lower in key:
-                return coords
-                
-        return (12.9716, 77.5946) # Default fallback
+    new_ride = ride_from_leg(vacation, next_leg)
+    try:
+        db.add(new_ride)
+        db.flush()
+        next_leg.ride_id = new_ride.id
+        vacation.leg_cursor = next_leg.sequence + 1
+        db.commit()
+        db.refresh(new_ride)
+        print(f"Scheduled next ride for vacation {vacation_id}: {new_ride.id} ({next_leg.kind} leg {next_leg.sequence + 1}/{vacation.leg_count})")
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to save new ride: {e}")
+        return None
     
-    # Ride 0: Home -> Airport (Departure from Origin)
-    if ride_count == 0:
-        if flight_details.get('departureTime'):
-            try:
-                # Create ride from user's location to airport
-                # Origin City logic
-                origin_city = flight_details.get('departureCity', 'Bangalore')
-                origin_lat, origin_lng = get_city_coords(origin_city)
-                
-                # Airport is usually ~30km away
-                airport_lat = origin_lat + 0.2
-                airport_lng = origin_lng + 0.2
-                
-                pickup_lat = origin_lat
-                pickup_lng = origin_lng
-                
-                distance = calculate_distance(pickup_lat, pickup_lng, airport_lat, airport_lng)
-                estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-                
-                new_ride = Ride(
-                    rider_id=vacation.user_id,
-                    vacation_id=vacation.id,
-                    pickup_address="Home",
-                    pickup_lat=pickup_lat,
-                    pickup_lng=pickup_lng,
-                    destination_address=f"{flight_details.get('departureCity', 'Airport')} Airport",
-                    destination_lat=airport_lat,
-                    destination_lng=airport_lng,
-                    vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                    distance_km=distance,
-                    duration_minutes=int((distance / 40) * 60),
-                    estimated_fare=estimated_fare,
-                    scheduled_time=datetime.now(), # Schedule immediately for demo
-                    driver_id=vacation.driver_id # Assign to the vacation driver
-                )
-            except Exception as e:
-                print(f"Failed to create departure ride: {e}")
-
-    # Ride 1: Airport -> Hotel (Arrival at Destination)
-    elif ride_count == 1:
-        if flight_details.get('arrivalTime'):
-            try:
-                # Create ride from airport to hotel
-                dest_city = vacation.destination or flight_details.get('arrivalCity', 'Goa')
-                dest_lat, dest_lng = get_city_coords(dest_city)
-                
-                # Airport location
-                airport_lat = dest_lat + 0.2
-                airport_lng = dest_lng + 0.2
-                
-                # Hotel location
-                hotel_lat = dest_lat
-                hotel_lng = dest_lng
-                
-                distance = calculate_distance(airport_lat, airport_lng, hotel_lat, hotel_lng)
-                estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-                
-                new_ride = Ride(
-                    rider_id=vacation.user_id,
-                    vacation_id=vacation.id,
-                    pickup_address=f"{flight_details.get('arrivalCity', 'Destination')} Airport",
-                    pickup_lat=airport_lat,
-                    pickup_lng=airport_lng,
-                    destination_address=vacation.hotel_name or "Hotel",
-                    destination_lat=hotel_lat,
-                    destination_lng=hotel_lng,
-                    vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                    distance_km=distance,
-                    duration_minutes=int((distance / 40) * 60),
-                    estimated_fare=estimated_fare,
-                    scheduled_time=datetime.now(),
-                    driver_id=vacation.driver_id
-                )
-            except Exception as e:
-                print(f"Failed to create arrival ride: {e}")
-
-    # Rides 2 to N+1: Activities (Hotel -> Activity)
-    elif ride_count <= len(activities) + 1:
-        activity_index = ride_count - 2
-        activity = activities[activity_index]
-        try:
-            dest_city = vacation.destination
-            hotel_lat, hotel_lng = get_city_coords(dest_city)
-            
-            # Activity location randomized around city
-            activity_lat = hotel_lat + (0.01 * (activity_index + 1))
-            activity_lng = hotel_lng + (0.01 * (activity_index + 1))
-            
-            distance = calculate_distance(hotel_lat, hotel_lng, activity_lat, activity_lng)
-            estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-            
-            new_ride = Ride(
-                rider_id=vacation.user_id,
-                vacation_id=vacation.id,
-                pickup_address=vacation.hotel_name or "Hotel",
-                pickup_lat=hotel_lat,
-                pickup_lng=hotel_lng,
-                destination_address=activity.get('location', 'Activity Location'),
-                destination_lat=activity_lat,
-                destination_lng=activity_lng,
-                vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                distance_km=distance,
-                duration_minutes=int((distance / 40) * 60),
-                estimated_fare=estimated_fare,
-                scheduled_time=datetime.now(),
-                driver_id=vacation.driver_id
-            )
-        except Exception as e:
-            print(f"Failed to create activity ride: {e}")
+    # Notify the vacation driver about the new ride
+    try:
+        from app.websocket import manager
+        await manager.send_personal_message({
+            "type": "new_ride_request",
+            "ride_id": new_ride.id,
+            "pickup_address": new_ride.pickup_address,
+            "destination_address": new_ride.destination_address,
+            "distance_km": new_ride.distance_km,
+            "estimated_fare": new_ride.estimated_fare,
+            "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type else "economy"
+        }, int(new_ride.driver_id))
+        print(f"Sent new ride request notification to driver {new_ride.driver_id}")
+    except Exception as e:
+        print(f"Failed to send WebSocket notification: {e}")
+        
+    return new_ride
 
-    # Last Ride: Hotel -> Airport (Departure from Destination)
-    elif ride_count == len(activities) + 2:
-        if flight_details.get('departureTime'):
-            try:
-                dest_city = vacation.destination or flight_details.get('arrivalCity', 'Goa')
-                dest_lat, dest_lng = get_city_coords(dest_city)
-                
-                hotel_lat = dest_lat
-                hotel_lng = dest_lng
-                
-                airport_lat = dest_lat + 0.2
-                airport_lng = dest_lng + 0.2
-                
-                distance = calculate_distance(hotel_lat, hotel_lng, airport_lat, airport_lng)
-                estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-                
-                new_ride = Ride(
-                    rider_id=vacation.user_id,
-                    vacation_id=vacation.id,
-                    pickup_address=vacation.hotel_name or "Hotel",
-                    pickup_lat=hotel_lat,
-                    pickup_lng=hotel_lng,
-                    destination_address=f"{dest_city} Airport",
-                    destination_lat=airport_lat,
-                    destination_lng=airport_lng,
-                    vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                    distance_km=distance,
-                    duration_minutes=int((distance / 40) * 60),
-                    estimated_fare=estimated_fare,
-                    scheduled_time=datetime.now(),
-                    driver_id=vacation.driver_id
-                )
-            except Exception as e:
-                print(f"Failed to create return ride: {e}")
+def leg_dispatch_time(leg: VacationLeg) -> Optional[datetime]:
+    """When a leg's ride should be created, or None for legs without a planned time"""
+    if leg.planned_time is None:
+        return None
+    lead = timedelta(minutes=settings.vacation_leg_lead_minutes)
+    # Airport-bound legs must arrive before the flight, not start at it
+    if leg.kind in ("departure", "return"):
+        lead += timedelta(minutes=leg.duration_minutes or 0)
+    return leg.planned_time - lead
 
-    # Final Leg: Origin Airport -> Home
-    elif ride_count == len(activities) + 3:
-        try:
-            origin_city = flight_details.get('departureCity', 'Bangalore')
-            origin_lat, origin_lng = get_city_coords(origin_city)
-            
-            airport_lat = origin_lat + 0.2
-            airport_lng = origin_lng + 0.2
-            
-            home_lat = origin_lat
-            home_lng = origin_lng
-            
-            distance = calculate_distance(airport_lat, airport_lng, home_lat, home_lng)
-            estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-            
-            new_ride = Ride(
-                rider_id=vacation.user_id,
-                vacation_id=vacation.id,
-                pickup_address=f"{origin_city} Airport",
-                pickup_lat=airport_lat,
-                pickup_lng=airport_lng,
-                destination_address="Home",
-                destination_lat=home_lat,
-                destination_lng=home_lng,
-                vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                distance_km=distance,
-                duration_minutes=int((distance / 40) * 60),
-                estimated_fare=estimated_fare,
-                scheduled_time=datetime.now(),
-                driver_id=vacation.driver_id
-            )
-            print(f"Created final leg: {origin_city} Airport -> Home")
-        except Exception as e:
-            print(f"Failed to create final home ride: {e}")
+def schedule_leg_jobs(db: Session, vacation: Vacation) -> int:
+    """Queue a dispatch job for every leg with a planned time"""
+    scheduled = 0
+    for leg in vacation.legs:
+        dispatch_at = leg_dispatch_time(leg)
+        if dispatch_at is None:
+            continue
+        job_scheduler.schedule(
+            db, "vacation_leg", dispatch_at,
+            payload={"vacation_id": vacation.id, "sequence": leg.sequence},
+            key=f"vacation:{vacation.id}:leg:{leg.sequence}"
+        )
+        scheduled += 1
+    print(f"Queued {scheduled} timed leg dispatches for vacation {vacation.id}")
+    return scheduled
 
-    # All ride legs completed
-    elif ride_count > len(activities) + 3:
-        # Check if the last ride is completed
-        if existing_rides and existing_rides[-1].status == RideStatus.COMPLETED:
-            print(f"All rides completed for vacation {vacation_id}. Updating status.")
-            vacation.status = "completed"
-            db.commit()
-            return None
-
-    if new_ride:
-        try:
-            db.add(new_ride)
-            db.commit()
-            db.refresh(new_ride)
-            print(f"Scheduled next ride for vacation {vacation_id}: {new_ride.id}")
-            
-            # Notify drivers about the new ride
-            try:
-                from app.websocket import manager
-                await manager.send_personal_message({
-                    "type": "new_ride_request",
-                    "ride_id": new_ride.id,
-                    "pickup_address": new_ride.pickup_address,
-                    "destination_address": new_ride.destination_address,
-                    "distance_km": new_ride.distance_km,
-                    "estimated_fare": new_ride.estimated_fare,
-                    "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type else "economy"
-                }, int(new_ride.driver_id))
-                print(f"Sent new ride request notification to driver {new_ride.driver_id}")
-            except Exception as e:
-                print(f"Failed to send WebSocket notification: {e}")
-                
-            return new_ride
-        except Exception as e:
-            db.rollback()
-            print(f"Failed to save new ride: {e}")
-            return None
-            
-    return None
+@job_scheduler.handler("vacation_leg")
+async def dispatch_vacation_leg(db: Session, payload: dict) -> Optional[datetime]:
+    """Create the ride for a timed vacation leg once earlier legs are done"""
+    vacation_id = payload["vacation_id"]
+    sequence = payload["sequence"]
+    
+    vacation = db.query(Vacation).filter(Vacation.id == vacation_id).first()
+    if not vacation or vacation.status not in ["pending", "confirmed", "in_progress"]:
+        return None
+    
+    # Already dispatched (manually or by an earlier run)
+    if (vacation.leg_cursor or 0) > sequence:
+        return None
+    
+    leg = db.query(VacationLeg).filter(
+        VacationLeg.vacation_id == vacation_id,
+        VacationLeg.sequence == sequence
+    ).first()
+    if leg is None:
+        return None
+    if leg.planned_time and time.time() > leg.planned_time.timestamp() + settings.vacation_leg_expiry_hours * 3600:
+        print(f"Giving up on auto-dispatch of vacation {vacation_id} leg {sequence}: planned time has long passed")
+        return None
+    
+    retry_at = datetime.now() + timedelta(minutes=settings.vacation_leg_retry_minutes)
+    
+    # Waiting for a driver to confirm the booking, or for earlier legs to be dispatched
+    if vacation.status == "pending" or (vacation.leg_cursor or 0) < sequence:
+        return retry_at
+    
+    ride = await schedule_next_ride(db, vacation_id)
+    return None if ride else retry_at
 
 @router.post("/vacation/{vacation_id}/schedule-rides")
 async def schedule_vacation_rides(
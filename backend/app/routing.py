@@ -0,0 +1,200 @@
+"""
+Route distance and ETA providers.
+
+All trip distance/duration estimates go through ``route_provider`` so the
+backing implementation can be swapped via settings:
+
+- ``haversine``: straight-line distance at an average speed (default)
+- ``road_graph``: shortest path over an offline road graph file
+- ``google``: Google Maps Distance Matrix (requires ``google_maps_api_key``)
+
+Results are cached on quantized origin/destination pairs with LRU eviction.
+Async handlers call ``estimate_async``, which runs cache misses of blocking
+(network) providers in the threadpool so they never stall the event loop.
+"""
+import abc
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.utils import calculate_distance
+
+
+@dataclass(frozen=True)
+class RouteEstimate:
+    distance_km: float
+    duration_minutes: int
+
+
+class DistanceProvider(abc.ABC):
+    """Interface for distance/ETA backends"""
+    name = "base"
+    blocking = False  # True if estimate() waits on network I/O
+
+    @abc.abstractmethod
+    def estimate(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        ...
+
+
+class HaversineProvider(DistanceProvider):
+    """Straight-line distance at a fixed average speed"""
+    name = "haversine"
+
+    def __init__(self, average_speed_kmh: float = 40.0):
+        self.average_speed_kmh = average_speed_kmh
+
+    def estimate(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        distance = calculate_distance(origin_lat, origin_lng, dest_lat, dest_lng)
+        return RouteEstimate(distance, int((distance / self.average_speed_kmh) * 60))
+
+
+class RoadGraphProvider(DistanceProvider):
+    """Shortest path over an offline road graph, falling back when no route exists"""
+    name = "road_graph"
+
+    def __init__(self, graph_path: str, fallback: DistanceProvider, max_snap_km: float = 2.0):
+        from app.road_graph import RoadGraph
+        self.graph = RoadGraph.load(graph_path)
+        self.fallback = fallback
+        self.max_snap_km = max_snap_km
+
+    def estimate(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        source, source_gap = self.graph.nearest_node(origin_lat, origin_lng)
+        target, target_gap = self.graph.nearest_node(dest_lat, dest_lng)
+        if source is None or target is None or source_gap > self.max_snap_km or target_gap > self.max_snap_km:
+            return self.fallback.estimate(origin_lat, origin_lng, dest_lat, dest_lng)
+
+        result = self.graph.shortest_path(source, target)
+        if result is None:
+            return self.fallback.estimate(origin_lat, origin_lng, dest_lat, dest_lng)
+
+        length_km, minutes = result
+        # Account for the stretch from the exact points to the snapped graph nodes
+        gap_km = source_gap + target_gap
+        gap_minutes = (gap_km / getattr(self.fallback, "average_speed_kmh", 40.0)) * 60
+        return RouteEstimate(length_km + gap_km, int(minutes + gap_minutes))
+
+
+class GoogleMapsProvider(DistanceProvider):
+    """Driving distance from the Google Maps Distance Matrix API"""
+    name = "google"
+    blocking = True
+
+    def __init__(self, api_key: str, fallback: DistanceProvider):
+        import googlemaps
+        self.client = googlemaps.Client(key=api_key)
+        self.fallback = fallback
+
+    def estimate(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        try:
+            response = self.client.distance_matrix(
+                origins=[(origin_lat, origin_lng)],
+                destinations=[(dest_lat, dest_lng)],
+                mode="driving"
+            )
+            element = response["rows"][0]["elements"][0]
+            if element.get("status") == "OK":
+                return RouteEstimate(
+                    element["distance"]["value"] / 1000,
+                    int(element["duration"]["value"] / 60)
+                )
+        except Exception as e:
+            print(f"Google Maps distance lookup failed: {e}")
+        return self.fallback.estimate(origin_lat, origin_lng, dest_lat, dest_lng)
+
+
+class CachedProvider(DistanceProvider):
+    """LRU cache keyed on coordinates rounded to ``precision`` decimal places"""
+
+    def __init__(self, provider: DistanceProvider, maxsize: int = 10000, precision: int = 3):
+        self.provider = provider
+        self.name = provider.name
+        self.blocking = provider.blocking
+        self.maxsize = maxsize
+        self.precision = precision
+        self._cache: "OrderedDict[tuple, RouteEstimate]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: tuple) -> Optional[RouteEstimate]:
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        return None
+
+    def _store(self, key: tuple, result: RouteEstimate) -> RouteEstimate:
+        self._cache[key] = result
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return result
+
+    def _key(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> tuple:
+        p = self.precision
+        return (round(origin_lat, p), round(origin_lng, p), round(dest_lat, p), round(dest_lng, p))
+
+    def estimate(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        key = self._key(origin_lat, origin_lng, dest_lat, dest_lng)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._store(key, self.provider.estimate(origin_lat, origin_lng, dest_lat, dest_lng))
+
+    async def estimate_async(self, origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float) -> RouteEstimate:
+        """Same as estimate(), but a miss on a blocking provider runs in the threadpool"""
+        key = self._key(origin_lat, origin_lng, dest_lat, dest_lng)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        if self.provider.blocking:
+            result = await run_in_threadpool(self.provider.estimate, origin_lat, origin_lng, dest_lat, dest_lng)
+        else:
+            result = self.provider.estimate(origin_lat, origin_lng, dest_lat, dest_lng)
+        return self._store(key, result)
+
+    async def prefetch(self, pairs: Iterable[Tuple[Tuple[float, float], Tuple[float, float]]]):
+        """Warm the cache for (origin, destination) pairs so later sync estimate() calls are hits"""
+        for (origin_lat, origin_lng), (dest_lat, dest_lng) in pairs:
+            await self.estimate_async(origin_lat, origin_lng, dest_lat, dest_lng)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "provider": self.name,
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def build_route_provider(kind: Optional[str] = None) -> CachedProvider:
+    """Build the configured provider wrapped in the LRU cache"""
+    kind = (kind or settings.route_provider).lower()
+    fallback = HaversineProvider(settings.average_speed_kmh)
+    provider: DistanceProvider = fallback
+
+    try:
+        if kind == "road_graph" and settings.road_graph_path:
+            provider = RoadGraphProvider(settings.road_graph_path, fallback)
+        elif kind == "google" and settings.google_maps_api_key:
+            provider = GoogleMapsProvider(settings.google_maps_api_key, fallback)
+        elif kind != "haversine":
+            print(f"Route provider '{kind}' is not configured, using haversine")
+    except Exception as e:
+        print(f"Failed to initialise route provider '{kind}', using haversine: {e}")
+        provider = fallback
+
+    return CachedProvider(provider, settings.route_cache_size, settings.route_cache_precision)
+
+
+route_provider = build_route_provider()
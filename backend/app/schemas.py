@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Dict, Optional, List, Union
 from datetime import datetime
 from app.models import UserRole, RideStatus, VehicleType
+from app.tariffs import parse_peak_hours
 
 # User Schemas
 class UserBase(BaseModel):
@@ -71,8 +72,12 @@ class DriverWithProfile(UserResponse):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     user: UserResponse
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class UserUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -104,6 +109,7 @@ class RideCreate(BaseModel):
     destination_lng: float
     vehicle_type: VehicleType = VehicleType.ECONOMY
     scheduled_time: Optional[datetime] = None
+    city: Optional[str] = None  # Selects city-specific tariffs, as in RideQuoteRequest
 
 class RideResponse(BaseModel):
     id: int
@@ -145,6 +151,60 @@ class RideRating(BaseModel):
     rating: int = Field(ge=1, le=5)
     feedback: Optional[str] = None
 
+# Fare Quote Schemas
+class RideQuoteRequest(BaseModel):
+    pickup_lat: float
+    pickup_lng: float
+    destination_lat: float
+    destination_lng: float
+    city: Optional[str] = None
+    scheduled_time: Optional[datetime] = None
+
+class FareQuote(BaseModel):
+    vehicle_type: VehicleType
+    estimated_fare: float
+
+class RideQuoteResponse(BaseModel):
+    distance_km: float
+    duration_minutes: int
+    surge_multiplier: float = 1.0
+    quotes: List[FareQuote]
+
+class VehicleTypeResponse(BaseModel):
+    vehicle_type: str
+    base_fare: float
+    per_km_rate: float
+    peak_multiplier: float
+    peak_hours: List[int]
+
+# Tariff Schemas
+class TariffBase(BaseModel):
+    vehicle_type: str
+    city: Optional[str] = None
+    base_fare: float = Field(ge=0)
+    per_km_rate: float = Field(ge=0)
+    peak_multiplier: float = Field(default=1.0, ge=1.0)
+    peak_hours: Optional[str] = None  # Hour ranges such as "8-11,17-21"
+    is_active: bool = True
+
+class TariffCreate(TariffBase):
+    @field_validator("peak_hours")
+    @classmethod
+    def validate_peak_hours(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            try:
+                parse_peak_hours(value)
+            except ValueError:
+                raise ValueError('peak_hours must be hour ranges within 0-23 such as "8-11,17-21"')
+        return value
+
+class TariffResponse(TariffBase):
+    # Not re-validated so rows saved before validation existed can still be listed
+    id: int
+    
+    class Config:
+        from_attributes = True
+
 # Location Update Schema
 class LocationUpdate(BaseModel):
     lat: float
@@ -158,7 +218,7 @@ class IntercityRideCreate(BaseModel):
     dropoff_address: str
     scheduled_date: datetime
     vehicle_type: VehicleType = VehicleType.ECONOMY
-    passengers: int = 1
+    passengers: int = Field(default=1, ge=1)
 
 class IntercityRideResponse(BaseModel):
     id: int
@@ -175,6 +235,7 @@ class IntercityRideResponse(BaseModel):
     estimated_duration_hours: Optional[float]
     price: float
     passengers: int
+    pool_id: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -200,6 +261,30 @@ class CityResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class IntercityPoolResponse(BaseModel):
+    id: int
+    origin_city_id: int
+    destination_city_id: int
+    departure_time: datetime
+    vehicle_type: VehicleType
+    capacity: int
+    seats_taken: int
+    status: str
+    driver_id: Optional[int] = None
+    ride_ids: List[int]
+
+class IntercityPriceRow(BaseModel):
+    city_id: int
+    name: str
+    distance_km: float
+    duration_hours: float
+    prices: Dict[str, float]  # Fare per vehicle type
+
+class IntercityPriceGrid(BaseModel):
+    origin_city_id: int
+    origin_name: str
+    destinations: List[IntercityPriceRow]
+
 # Vacation Schemas
 class VacationCreate(BaseModel):
     destination: str
@@ -250,6 +335,27 @@ class VacationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class VacationQuoteItem(BaseModel):
+    destination: str
+    vehicle_type: VehicleType = VehicleType.ECONOMY
+    passengers: int = 1
+    activities: Optional[Union[str, List[Any]]] = None  # JSON string or list, as in VacationCreate
+    departure_city: Optional[str] = None
+
+class VacationQuoteBatchRequest(BaseModel):
+    items: List[VacationQuoteItem] = Field(max_length=500)
+
+class VacationQuote(BaseModel):
+    destination: str
+    vehicle_type: VehicleType
+    passengers: int
+    leg_count: int
+    distance_km: float
+    total_price: float
+
+class VacationQuoteBatchResponse(BaseModel):
+    quotes: List[VacationQuote]
+
 # Admin Schemas
 class AdminStats(BaseModel):
     total_users: int
@@ -0,0 +1,174 @@
+"""
+Demand/supply surge pricing.
+
+Ride requests and idle driver pings are bucketed into a lat/lng grid. A
+background task periodically counts open requests and idle drivers per cell
+over a sliding window and publishes a multiplier table, so fare calculation
+reads the current surge with a single dict lookup and no database queries.
+A request stops counting as demand as soon as its ride is accepted or
+cancelled (``remove_request``); the window only bounds how long an unserved
+request keeps counting.
+"""
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, DriverProfile, Ride, RideStatus, UserRole
+
+Cell = Tuple[int, int]
+
+
+class SurgeEngine:
+    def __init__(
+        self,
+        cell_size_deg: float = 0.02,
+        window_seconds: int = 600,
+        refresh_seconds: int = 15,
+        max_multiplier: float = 2.5,
+        sensitivity: float = 0.5,
+        enabled: bool = True
+    ):
+        self.cell_size_deg = cell_size_deg
+        self.window_seconds = window_seconds
+        self.refresh_seconds = refresh_seconds
+        self.max_multiplier = max_multiplier
+        self.sensitivity = sensitivity
+        self.enabled = enabled
+
+        # Open requests per cell: ride_id -> request timestamp
+        self._requests: Dict[Cell, Dict[int, float]] = {}
+        self._request_cells: Dict[int, Cell] = {}
+        # Latest idle ping per driver: driver_id -> (cell, timestamp)
+        self._drivers: Dict[int, Tuple[Cell, float]] = {}
+        # Published multipliers; replaced wholesale on every refresh
+        self._multipliers: Dict[Cell, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def cell_for(self, lat: float, lng: float) -> Cell:
+        return (int(lat // self.cell_size_deg), int(lng // self.cell_size_deg))
+
+    def record_request(self, ride_id: int, lat: float, lng: float, at: Optional[float] = None):
+        """Count an open ride request at the pickup location"""
+        self.remove_request(ride_id)
+        cell = self.cell_for(lat, lng)
+        self._requests.setdefault(cell, {})[ride_id] = at if at is not None else time.time()
+        self._request_cells[ride_id] = cell
+
+    def remove_request(self, ride_id: int):
+        """Stop counting a request as demand (accepted or cancelled)"""
+        cell = self._request_cells.pop(ride_id, None)
+        if cell is None:
+            return
+        requests = self._requests.get(cell)
+        if requests is not None:
+            requests.pop(ride_id, None)
+            if not requests:
+                del self._requests[cell]
+
+    def record_driver(self, driver_id: int, lat: float, lng: float, at: Optional[float] = None):
+        """Mark a driver as idle at the given location"""
+        self._drivers[driver_id] = (self.cell_for(lat, lng), at if at is not None else time.time())
+
+    def remove_driver(self, driver_id: int):
+        """Stop counting a driver as supply (went offline or took a ride)"""
+        self._drivers.pop(driver_id, None)
+
+    def multiplier(self, lat: Optional[float], lng: Optional[float]) -> float:
+        """Current surge multiplier for a pickup location"""
+        if not self.enabled or lat is None or lng is None:
+            return 1.0
+        return self._multipliers.get(self.cell_for(lat, lng), 1.0)
+
+    def recompute(self, now: Optional[float] = None) -> Dict[Cell, float]:
+        """Prune expired events and publish a fresh multiplier table"""
+        now = now if now is not None else time.time()
+        cutoff = now - self.window_seconds
+
+        demand: Dict[Cell, int] = {}
+        for cell in list(self._requests):
+            requests = self._requests[cell]
+            for ride_id in [ride_id for ride_id, requested_at in requests.items() if requested_at < cutoff]:
+                del requests[ride_id]
+                del self._request_cells[ride_id]
+            if requests:
+                demand[cell] = len(requests)
+            else:
+                del self._requests[cell]
+
+        supply: Dict[Cell, int] = {}
+        for driver_id, (cell, seen_at) in list(self._drivers.items()):
+            if seen_at < cutoff:
+                del self._drivers[driver_id]
+                continue
+            supply[cell] = supply.get(cell, 0) + 1
+
+        multipliers = {}
+        for cell, requests in demand.items():
+            ratio = requests / max(supply.get(cell, 0), 1)
+            if ratio <= 1:
+                continue
+            surge = min(self.max_multiplier, 1 + self.sensitivity * (ratio - 1))
+            multipliers[cell] = round(surge, 1)
+
+        self._multipliers = multipliers
+        return multipliers
+
+    def seed(self, db: Session):
+        """Prime the window from recent pending rides and idle drivers"""
+        now = time.time()
+        cutoff = now - self.window_seconds
+
+        drivers = db.query(DriverProfile.user_id, DriverProfile.current_lat, DriverProfile.current_lng).join(User).filter(
+            User.role == UserRole.DRIVER,
+            User.is_active == True,
+            DriverProfile.is_available == True,
+            DriverProfile.current_lat != None,
+            DriverProfile.current_lng != None
+        ).all()
+        for driver_id, lat, lng in drivers:
+            self.record_driver(driver_id, float(lat), float(lng), at=now)
+
+        rides = db.query(Ride.id, Ride.pickup_lat, Ride.pickup_lng, Ride.created_at).filter(
+            Ride.status == RideStatus.PENDING
+        ).all()
+        for ride_id, lat, lng, created_at in rides:
+            created = created_at.timestamp() if created_at else now
+            if created >= cutoff:
+                self.record_request(ride_id, float(lat), float(lng), at=created)
+
+        self.recompute(now)
+        print(f"Surge engine seeded with {len(drivers)} idle drivers and {len(self._request_cells)} open requests")
+
+    async def _run(self):
+        while True:
+            try:
+                self.recompute()
+            except Exception as e:
+                print(f"Surge recompute failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+surge_engine = SurgeEngine(
+    cell_size_deg=settings.surge_cell_size_deg,
+    window_seconds=settings.surge_window_seconds,
+    refresh_seconds=settings.surge_refresh_seconds,
+    max_multiplier=settings.surge_max_multiplier,
+    sensitivity=settings.surge_sensitivity,
+    enabled=settings.surge_enabled
+)
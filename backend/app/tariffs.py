@@ -0,0 +1,159 @@
+"""
+Tariff tables used for fare calculation.
+
+Tariffs are loaded once from the ``tariffs`` table (falling back to the
+built-in defaults) into an immutable in-memory table, so pricing never hits
+the database. Edits are picked up by calling ``tariff_service.reload(db)``,
+which swaps the whole table atomically.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Tariff
+
+# Canonical vehicle types offered to riders (VehicleType.PREMIUM_UC is a legacy alias)
+QUOTE_VEHICLE_TYPES = ["economy", "premium", "suv", "luxury"]
+
+DEFAULT_TARIFFS = {
+    "economy": {"base_fare": 50, "per_km_rate": 10},
+    "premium": {"base_fare": 100, "per_km_rate": 15},
+    "suv": {"base_fare": 120, "per_km_rate": 18},
+    "luxury": {"base_fare": 200, "per_km_rate": 25},
+}
+
+FALLBACK_VEHICLE_TYPE = "economy"
+
+
+def parse_peak_hours(value: Optional[str]) -> FrozenSet[int]:
+    """Parse hour ranges like "8-11,17-21" into the set of hours they cover; ValueError if malformed or not 0-23"""
+    hours = set()
+    if not value:
+        return frozenset()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if not (0 <= start < 24 and 0 <= end < 24):
+            raise ValueError(f"Peak hour out of range 0-23: {part}")
+        if start <= end:
+            hours.update(range(start, end + 1))
+        else:
+            # Range wraps past midnight, e.g. "22-5"
+            hours.update(range(start, 24))
+            hours.update(range(0, end + 1))
+    return frozenset(hours)
+
+
+@dataclass(frozen=True)
+class TariffRate:
+    base_fare: float
+    per_km_rate: float
+    peak_multiplier: float = 1.0
+    peak_hours: FrozenSet[int] = frozenset()
+
+    def multiplier(self, when: Optional[datetime] = None) -> float:
+        """Peak multiplier in effect at ``when`` (1.0 off-peak)"""
+        if self.peak_hours and (when or datetime.now()).hour in self.peak_hours:
+            return self.peak_multiplier
+        return 1.0
+
+    def fare(self, distance_km: float, when: Optional[datetime] = None) -> float:
+        return (self.base_fare + (distance_km * self.per_km_rate)) * self.multiplier(when)
+
+
+class TariffTable:
+    """Read-only tariff lookup keyed by (city, vehicle_type)"""
+
+    def __init__(self, rates: Dict[Tuple[Optional[str], str], TariffRate], version: int = 0):
+        self._rates = MappingProxyType(dict(rates))
+        self.version = version
+
+    @staticmethod
+    def _city_key(city: Optional[str]) -> Optional[str]:
+        return city.strip().lower() if city else None
+
+    def lookup(self, vehicle_type: str, city: Optional[str] = None) -> TariffRate:
+        """Return the most specific tariff for a vehicle type, optionally within a city"""
+        rates = self._rates
+        city_key = self._city_key(city)
+        if city_key is not None:
+            rate = rates.get((city_key, vehicle_type))
+            if rate is not None:
+                return rate
+        rate = rates.get((None, vehicle_type))
+        if rate is not None:
+            return rate
+        return rates[(None, FALLBACK_VEHICLE_TYPE)]
+
+    def rows(self) -> List[dict]:
+        return [
+            {
+                "city": city,
+                "vehicle_type": vehicle_type,
+                "base_fare": rate.base_fare,
+                "per_km_rate": rate.per_km_rate,
+                "peak_multiplier": rate.peak_multiplier,
+                "peak_hours": sorted(rate.peak_hours),
+            }
+            for (city, vehicle_type), rate in self._rates.items()
+        ]
+
+    @classmethod
+    def defaults(cls, version: int = 0) -> "TariffTable":
+        return cls(
+            {(None, vt): TariffRate(float(r["base_fare"]), float(r["per_km_rate"])) for vt, r in DEFAULT_TARIFFS.items()},
+            version=version,
+        )
+
+
+class TariffService:
+    """Holds the current tariff table and reloads it on demand"""
+
+    def __init__(self):
+        self.table = TariffTable.defaults()
+        self._listeners: List[Callable[[TariffTable], None]] = []
+
+    def add_listener(self, callback: Callable[[TariffTable], None]):
+        """Register a callback invoked after every reload (e.g. to drop derived caches)"""
+        self._listeners.append(callback)
+
+    def reload(self, db: Session) -> TariffTable:
+        """Rebuild the tariff table from the database and swap it in"""
+        version = self.table.version + 1
+        rates = dict(TariffTable.defaults()._rates)
+        try:
+            tariffs = db.query(Tariff).filter(Tariff.is_active == True).all()
+        except Exception as e:
+            print(f"Failed to load tariffs, keeping current table: {e}")
+            return self.table
+
+        for tariff in tariffs:
+            try:
+                rates[(TariffTable._city_key(tariff.city), tariff.vehicle_type.lower())] = TariffRate(
+                    base_fare=float(tariff.base_fare),
+                    per_km_rate=float(tariff.per_km_rate),
+                    peak_multiplier=float(tariff.peak_multiplier or 1.0),
+                    peak_hours=parse_peak_hours(tariff.peak_hours),
+                )
+            except (TypeError, ValueError) as e:
+                print(f"Skipping invalid tariff {tariff.id}: {e}")
+
+        self.table = TariffTable(rates, version=version)
+        print(f"Loaded tariff table v{version} ({len(tariffs)} database overrides)")
+        for callback in self._listeners:
+            try:
+                callback(self.table)
+            except Exception as e:
+                print(f"Tariff reload listener failed: {e}")
+        return self.table
+
+
+tariff_service = TariffService()
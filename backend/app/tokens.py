@@ -0,0 +1,149 @@
+"""
+Access token signing and verification.
+
+Every HTTP request and WebSocket handshake verifies a JWT, so HS256 (the
+default ``algorithm``) is handled directly with ``hmac``/``hashlib`` on a
+precomputed header instead of going through python-jose. Verified tokens are
+kept in an LRU cache until their ``exp``, so a client repeating the same
+bearer token pays for one dictionary lookup. Other algorithms fall back to
+python-jose.
+
+Tokens carry ``uid`` and ``role`` claims next to ``sub`` (the email) so the
+current user can be loaded by primary key. Tokens issued before these claims
+existed are still accepted.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+
+from app.config import settings
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _timestamp(value) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+class TokenService:
+    def __init__(self, secret_key: str, algorithm: str = "HS256", expire_minutes: int = 30, cache_size: int = 10000):
+        self.algorithm = algorithm
+        self.secret_key = secret_key
+        self.expire_minutes = expire_minutes
+        self.cache_size = cache_size
+        self._fast = algorithm == "HS256"
+        self._key = secret_key.encode()
+        header = json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode()
+        self._header = _b64encode(header)
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return _b64encode(hmac.new(self._key, signing_input, hashlib.sha256).digest())
+
+    def create(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
+        """Sign ``data`` with an ``exp`` claim"""
+        expire = time.time() + (expires_delta.total_seconds() if expires_delta else self.expire_minutes * 60)
+        claims = dict(data, exp=int(expire))
+        if not self._fast:
+            return jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+        payload = _b64encode(json.dumps(claims, separators=(",", ":"), default=str).encode())
+        signing_input = self._header + b"." + payload
+        return (signing_input + b"." + self._sign(signing_input)).decode()
+
+    def _verify(self, token: str) -> Optional[dict]:
+        if not self._fast:
+            try:
+                return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            except JWTError:
+                return None
+
+        parts = token.split(".")
+        if len(parts) != 3:
+            return None
+        header, payload, signature = parts
+        signing_input = f"{header}.{payload}".encode()
+        if not hmac.compare_digest(self._sign(signing_input), signature.encode()):
+            return None
+        try:
+            # The signature is valid, but never trust an algorithm other than the configured one
+            if header.encode() != self._header and json.loads(_b64decode(header)).get("alg") != "HS256":
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(claims, dict):
+            return None
+        now = time.time()
+        try:
+            if "exp" in claims and _timestamp(claims["exp"]) <= now:
+                return None
+            if "nbf" in claims and _timestamp(claims["nbf"]) > now:
+                return None
+        except (TypeError, ValueError):
+            return None
+        return claims
+
+    def decode(self, token: str) -> Optional[dict]:
+        """Claims of a valid, unexpired token, or None"""
+        entry = self._cache.get(token)
+        if entry is not None:
+            expires_at, claims = entry
+            if expires_at > time.time():
+                self._cache.move_to_end(token)
+                self.hits += 1
+                return dict(claims)
+            del self._cache[token]
+
+        self.misses += 1
+        claims = self._verify(token)
+        if claims is None:
+            self.rejected += 1
+            return None
+        if "exp" in claims:
+            self._cache[token] = (_timestamp(claims["exp"]), claims)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(claims)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "algorithm": self.algorithm,
+            "fast_path": self._fast,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+token_service = TokenService(
+    settings.secret_key,
+    algorithm=settings.algorithm,
+    expire_minutes=settings.access_token_expire_minutes,
+    cache_size=settings.token_cache_size
+)
@@ -1,25 +1,21 @@
 import math
+from datetime import datetime
+from typing import Optional
 
-def calculate_fare(distance_km: float, vehicle_type: str) -> float:
-    """Calculate ride fare based on distance and vehicle type"""
-    base_fare = {
-        "economy": 50,
-        "premium": 100,
-        "suv": 120,
-        "luxury": 200
-    }
-    
-    per_km_rate = {
-        "economy": 10,
-        "premium": 15,
-        "suv": 18,
-        "luxury": 25
-    }
-    
-    base = base_fare.get(vehicle_type, 50)
-    rate = per_km_rate.get(vehicle_type, 10)
-    
-    return base + (distance_km * rate)
+from app.tariffs import tariff_service
+from app.surge import surge_engine
+
+def calculate_fare(
+    distance_km: float,
+    vehicle_type: str,
+    city: Optional[str] = None,
+    when: Optional[datetime] = None,
+    pickup_lat: Optional[float] = None,
+    pickup_lng: Optional[float] = None
+) -> float:
+    """Calculate ride fare based on distance, vehicle type, the active tariff table and pickup surge"""
+    fare = tariff_service.table.lookup(vehicle_type, city).fare(distance_km, when)
+    return fare * surge_engine.multiplier(pickup_lat, pickup_lng)
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance between two coordinates using Haversine formula"""
@@ -0,0 +1,279 @@
+"""
+Vacation package pricing.
+
+A package is priced as the sum of its cab legs:
+
+1. Home -> origin airport
+2. Destination airport -> hotel
+3. Hotel -> each activity
+4. Hotel -> destination airport (same distance as leg 2)
+
+Every leg is fared with the same tariff rate, and a fare is linear in
+distance (``base + per_km * d``, times the peak multiplier), so a package
+reduces to ``(leg_count, total_km)`` and its price to
+``(leg_count * base + per_km * total_km) * peak``. The geometry depends only
+on the origin/destination coordinates and the number of activities, so it is
+memoized and shared across every vehicle type and passenger count in a batch.
+``quote_batch`` then prices all of a batch's cache misses in one numpy pass
+(``price_trips``).
+
+Finished package prices are additionally kept in ``price_cache``, an LRU/TTL
+cache keyed on the normalized pricing inputs. It is cleared on every tariff
+reload and whenever a city is added (its name may have been priced with
+fallback coordinates).
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.geocoding import geocoder, normalize_name
+from app.tariffs import tariff_service
+from app.utils import calculate_distance
+
+DEFAULT_ORIGIN = (12.9716, 77.5946)  # Bangalore
+DEFAULT_DESTINATION = (15.2993, 74.1240)  # Goa
+
+# Airports are modelled as a fixed offset (~30km) from the city centre
+AIRPORT_OFFSET_DEG = 0.2
+# Activities are spread around the hotel in steps of this offset
+ACTIVITY_OFFSET_DEG = 0.01
+
+Coordinates = Tuple[float, float]
+
+
+def _parse_activities(activities: Any) -> list:
+    if isinstance(activities, str):
+        try:
+            activities = json.loads(activities)
+        except json.JSONDecodeError:
+            return []
+    return activities if isinstance(activities, list) else []
+
+
+def activity_count(activities: Any) -> int:
+    """Number of activity legs in an activities list or its JSON encoding"""
+    return len(_parse_activities(activities))
+
+
+def activity_hash(activities: Any) -> str:
+    """Stable digest of an activities list, independent of JSON formatting"""
+    canonical = json.dumps(_parse_activities(activities), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def departure_city(flight_details: Optional[str]) -> Optional[str]:
+    if not flight_details:
+        return None
+    try:
+        return json.loads(flight_details).get('departureCity')
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _airport_distance(lat: float, lng: float) -> float:
+    """City centre <-> airport distance"""
+    return calculate_distance(lat, lng, lat + AIRPORT_OFFSET_DEG, lng + AIRPORT_OFFSET_DEG)
+
+
+# Running totals of hotel -> activity distances per hotel location; extended on demand
+_activity_prefix: dict = {}
+
+
+def _activity_distance(hotel: Coordinates, count: int) -> float:
+    """Total distance of the first ``count`` hotel -> activity legs"""
+    prefix = _activity_prefix.get(hotel)
+    if prefix is None:
+        if len(_activity_prefix) >= 1024:
+            _activity_prefix.clear()
+        prefix = _activity_prefix[hotel] = [0.0]
+    lat, lng = hotel
+    while len(prefix) <= count:
+        offset = ACTIVITY_OFFSET_DEG * len(prefix)
+        prefix.append(prefix[-1] + calculate_distance(lat, lng, lat + offset, lng + offset))
+    return prefix[count]
+
+
+def trip_geometry(origin: Coordinates, hotel: Coordinates, activities: int) -> Tuple[int, float]:
+    """(leg_count, total_km) of a package"""
+    transfer = _airport_distance(*hotel)
+    distance = _airport_distance(*origin) + 2 * transfer + _activity_distance(hotel, activities)
+    return 3 + activities, distance
+
+
+def price_trip(leg_count: int, distance_km: float, vehicle_type: str, when: Optional[datetime] = None, table=None) -> float:
+    rate = (table or tariff_service.table).lookup(vehicle_type)
+    # fare(d) is affine in d, so summing per-leg fares equals n base fares plus per_km * total distance
+    return round((leg_count * rate.base_fare + distance_km * rate.per_km_rate) * rate.multiplier(when), 2)
+
+
+def price_trips(leg_counts: Sequence[int], distances: Sequence[float], vehicle_types: Sequence[str], when: Optional[datetime] = None, table=None) -> List[float]:
+    """``price_trip`` for many packages at once; same arithmetic, so the same prices"""
+    table = table or tariff_service.table
+    rates = {vehicle_type: table.lookup(vehicle_type) for vehicle_type in set(vehicle_types)}
+    base = np.array([rates[vt].base_fare for vt in vehicle_types], dtype=np.float64)
+    per_km = np.array([rates[vt].per_km_rate for vt in vehicle_types], dtype=np.float64)
+    multiplier = np.array([rates[vt].multiplier(when) for vt in vehicle_types], dtype=np.float64)
+    totals = (np.asarray(leg_counts, dtype=np.float64) * base + np.asarray(distances, dtype=np.float64) * per_km) * multiplier
+    return [round(float(total), 2) for total in totals]
+
+
+def resolve_trip(origin_city: Optional[str], destination: Optional[str]) -> Tuple[Coordinates, Coordinates]:
+    return (
+        geocoder.coords(origin_city, default=DEFAULT_ORIGIN),
+        geocoder.coords(destination, default=DEFAULT_DESTINATION)
+    )
+
+
+class PriceCache:
+    """LRU cache of package quotes whose entries also expire after ``ttl_seconds``"""
+
+    def __init__(self, maxsize: int = 5000, ttl_seconds: float = 600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expired += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, value: dict):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+price_cache = PriceCache(settings.vacation_price_cache_size, settings.vacation_price_cache_ttl_seconds)
+
+# Cached prices are only valid for the tariff table they were computed with
+tariff_service.add_listener(lambda table: price_cache.clear())
+
+
+def _quote_key(table, destination: Optional[str], vehicle_type: str, activities: Any, departure_city: Optional[str], when: datetime) -> tuple:
+    # The hour is part of the key because peak multipliers depend on it; passengers
+    # share the vehicle, so they do not change the price and are left out
+    return (
+        table.version,
+        normalize_name(departure_city or ""),
+        normalize_name(destination or ""),
+        vehicle_type,
+        activity_hash(activities),
+        when.hour
+    )
+
+
+def _quote(destination: Optional[str], vehicle_type: str, passengers: int, leg_count: int, distance: float, price: float) -> dict:
+    return {
+        "destination": destination,
+        "vehicle_type": vehicle_type,
+        "passengers": passengers,
+        "leg_count": leg_count,
+        "distance_km": round(distance, 2),
+        "total_price": price
+    }
+
+
+def quote_package(
+    destination: Optional[str],
+    vehicle_type: str,
+    passengers: int = 1,
+    activities: Any = None,
+    departure_city: Optional[str] = None,
+    when: Optional[datetime] = None,
+    table=None
+) -> dict:
+    """Quote one package, served from ``price_cache`` when the same inputs were priced recently"""
+    when = when or datetime.now()
+    table = table or tariff_service.table
+    vehicle_type = vehicle_type or "economy"
+    key = _quote_key(table, destination, vehicle_type, activities, departure_city, when)
+    quote = price_cache.get(key)
+    if quote is None:
+        origin, hotel = resolve_trip(departure_city, destination)
+        leg_count, distance = trip_geometry(origin, hotel, activity_count(activities))
+        quote = _quote(destination, vehicle_type, passengers, leg_count, distance, price_trip(leg_count, distance, vehicle_type, when, table))
+        price_cache.put(key, quote)
+    # Echo the caller's destination spelling and passengers, and keep the cached entry private
+    return dict(quote, destination=destination, passengers=passengers)
+
+
+def quote_batch(items: List[dict]) -> List[dict]:
+    """Price many package variants against one tariff snapshot and one clock reading"""
+    table = tariff_service.table
+    when = datetime.now()
+    keys: List[tuple] = []
+    quotes: Dict[tuple, dict] = {}
+    misses: Dict[tuple, Tuple[dict, str]] = {}  # Variants differing only in passengers are priced once
+    for item in items:
+        vehicle_type = item.get("vehicle_type") or "economy"
+        key = _quote_key(table, item.get("destination"), vehicle_type, item.get("activities"), item.get("departure_city"), when)
+        keys.append(key)
+        if key in quotes or key in misses:
+            continue
+        quote = price_cache.get(key)
+        if quote is None:
+            misses[key] = (item, vehicle_type)
+        else:
+            quotes[key] = quote
+
+    if misses:
+        # Geometry is memoized per city and activity count; the fares are one vectorized pass
+        geometry = [
+            trip_geometry(*resolve_trip(item.get("departure_city"), item.get("destination")), activity_count(item.get("activities")))
+            for item, _ in misses.values()
+        ]
+        prices = price_trips(
+            [leg_count for leg_count, _ in geometry],
+            [distance for _, distance in geometry],
+            [vehicle_type for _, vehicle_type in misses.values()],
+            when,
+            table
+        )
+        for (key, (item, vehicle_type)), (leg_count, distance), price in zip(misses.items(), geometry, prices):
+            quote = _quote(item.get("destination"), vehicle_type, item.get("passengers", 1), leg_count, distance, price)
+            price_cache.put(key, quote)
+            quotes[key] = quote
+
+    # Echo each caller's destination spelling and passengers, and keep cached entries private
+    return [
+        dict(quotes[key], destination=item.get("destination"), passengers=item.get("passengers", 1))
+        for key, item in zip(keys, items)
+    ]
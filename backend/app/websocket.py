@@ -1,67 +1,207 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, Set
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import asyncio
 import json
+import time
 from app.auth import decode_access_token
+from app.config import settings
+
+# Called as listener(user_id, role, online) when a user's first socket connects or last one goes away
+PresenceListener = Callable[[int, Optional[str], bool], None]
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, heartbeat_interval: float = 20, heartbeat_timeout: float = 60):
         # Store connections by user_id
         self.active_connections: Dict[int, Set[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, user_id: int):
+        # Last time each socket showed signs of life (any inbound frame or pong)
+        self.last_seen: Dict[WebSocket, float] = {}
+        # Role of each connected user, for per-role presence counts
+        self.roles: Dict[int, Optional[str]] = {}
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.reaped = 0
+        self._listeners: List[PresenceListener] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_presence_listener(self, callback: PresenceListener):
+        """Register a callback invoked when a user comes online or goes offline"""
+        self._listeners.append(callback)
+
+    def _notify_presence(self, user_id: int, role: Optional[str], online: bool):
+        for callback in self._listeners:
+            try:
+                callback(user_id, role, online)
+            except Exception as e:
+                print(f"Presence listener failed for user {user_id}: {e}")
+
+    async def connect(self, websocket: WebSocket, user_id: int, role: Optional[str] = None):
         await websocket.accept()
-        if user_id not in self.active_connections:
+        first = user_id not in self.active_connections
+        if first:
             self.active_connections[user_id] = set()
         self.active_connections[user_id].add(websocket)
+        self.last_seen[websocket] = time.monotonic()
+        self.roles[user_id] = role
         print(f"WebSocket connected for user {user_id}. Total connections: {len(self.active_connections[user_id])}")
-    
+        if first:
+            self._notify_presence(user_id, role, True)
+
     def disconnect(self, websocket: WebSocket, user_id: int):
+        self.last_seen.pop(websocket, None)
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+                self._notify_presence(user_id, self.roles.pop(user_id, None), False)
             print(f"WebSocket disconnected for user {user_id}")
-    
+
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity on a socket"""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    # --- Presence ---
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self.active_connections
+
+    def online_users(self, role: Optional[str] = None) -> List[int]:
+        if role is None:
+            return list(self.active_connections)
+        return [user_id for user_id in self.active_connections if self.roles.get(user_id) == role]
+
+    def online_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for user_id in self.active_connections:
+            role = self.roles.get(user_id) or "unknown"
+            counts[role] = counts.get(role, 0) + 1
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "online_users": len(self.active_connections),
+            "connections": len(self.last_seen),
+            "by_role": self.online_counts(),
+            "reaped": self.reaped,
+            "heartbeat_interval": self.heartbeat_interval,
+            "heartbeat_timeout": self.heartbeat_timeout
+        }
+
+    # --- Sending ---
+
     async def send_personal_message(self, message: dict, user_id: int):
         print(f"Attempting to send message to user {user_id}: {message}")
         if user_id in self.active_connections:
             connections_to_remove = []
-            for connection in self.active_connections[user_id]:
+            for connection in list(self.active_connections[user_id]):
                 try:
                     await connection.send_json(message)
                     print(f"Successfully sent message to user {user_id}")
                 except Exception as e:
                     print(f"Failed to send message to user {user_id}: {e}")
                     connections_to_remove.append(connection)
-            
+
             # Remove broken connections
             for connection in connections_to_remove:
-                self.active_connections[user_id].discard(connection)
-                if not self.active_connections[user_id]:
-                    del self.active_connections[user_id]
+                self.disconnect(connection, user_id)
         else:
             print(f"No active connections for user {user_id}")
 
+    async def send_to_many(self, message: dict, user_ids: Iterable[int], concurrency: int = 50) -> int:
+        """Send one message to several users concurrently, with at most ``concurrency`` sends in flight.
+        Users without a live connection are skipped. Returns the number of users reached."""
+        targets = [user_id for user_id in set(user_ids) if user_id in self.active_connections]
+        if not targets:
+            return 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(user_id: int) -> bool:
+            async with semaphore:
+                connections = list(self.active_connections.get(user_id, ()))
+                delivered = False
+                for connection in connections:
+                    try:
+                        await connection.send_json(message)
+                        delivered = True
+                    except Exception as e:
+                        print(f"Failed to send message to user {user_id}: {e}")
+                        self.disconnect(connection, user_id)
+                return delivered
+
+        results = await asyncio.gather(*(send(user_id) for user_id in targets))
+        return sum(results)
+
     async def broadcast(self, message: dict):
         print(f"Broadcasting message to all users: {message}")
-        users_to_remove = []
-        for user_id, connections in self.active_connections.items():
-            connections_to_remove = []
-            for connection in connections:
+        broken = []
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
                 try:
                     await connection.send_json(message)
                 except Exception as e:
                     print(f"Failed to broadcast to user {user_id}: {e}")
-                    connections_to_remove.append(connection)
-            
-            # Remove broken connections
-            for connection in connections_to_remove:
-                self.active_connections[user_id].discard(connection)
-                if not self.active_connections[user_id]:
-                    users_to_remove.append(user_id)
-        
-        # Remove users with no connections
-        for user_id in users_to_remove:
-            del self.active_connections[user_id]
-
-manager = ConnectionManager()
\ No newline at end of file
+                    broken.append((connection, user_id))
+
+        # Remove broken connections
+        for connection, user_id in broken:
+            self.disconnect(connection, user_id)
+
+    # --- Heartbeat ---
+
+    async def heartbeat(self, now: Optional[float] = None) -> int:
+        """Reap sockets silent for longer than the timeout, then ping the rest. Returns sockets reaped."""
+        now = now if now is not None else time.monotonic()
+        cutoff = now - self.heartbeat_timeout
+        stale = []
+        alive = []
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
+                if self.last_seen.get(connection, now) < cutoff:
+                    stale.append((connection, user_id))
+                else:
+                    alive.append((connection, user_id))
+
+        for connection, user_id in stale:
+            self.disconnect(connection, user_id)
+            try:
+                await asyncio.wait_for(connection.close(code=1001), timeout=1)
+            except Exception:
+                pass
+        if stale:
+            self.reaped += len(stale)
+            print(f"Reaped {len(stale)} stale WebSocket connections")
+
+        async def ping(connection: WebSocket, user_id: int):
+            try:
+                await asyncio.wait_for(connection.send_json({"type": "ping"}), timeout=self.heartbeat_interval)
+            except Exception:
+                self.disconnect(connection, user_id)
+
+        await asyncio.gather(*(ping(connection, user_id) for connection, user_id in alive))
+        return len(stale)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"WebSocket heartbeat failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+manager = ConnectionManager(
+    heartbeat_interval=settings.ws_heartbeat_interval_seconds,
+    heartbeat_timeout=settings.ws_heartbeat_timeout_seconds
+)
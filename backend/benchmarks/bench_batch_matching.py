@@ -0,0 +1,130 @@
+"""
+Compare batch (Hungarian) ride matching against one-ride-at-a-time dispatch.
+
+Each round simulates one peak dispatch window: --rides requests and --drivers
+idle drivers scattered around central Bangalore. Strategies:
+
+- broadcast: rides are handled in arrival order, every free driver within the
+  radius is notified and a random one of them wins the accept race (the
+  current default dispatch)
+- nearest:   rides in arrival order, each takes the nearest free driver (the
+  best case for sequential offers)
+- batch:     one minimum-total-pickup-distance assignment over the window
+
+    python benchmarks/bench_batch_matching.py --rides 200 --drivers 300 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.assignment import assign_batch, distance_matrix
+
+CENTER_LAT = 12.9716
+CENTER_LNG = 77.5946
+KM_PER_DEG = 111.0
+
+
+def scatter(rng: np.random.Generator, count: int, spread_km: float):
+    lats = CENTER_LAT + rng.normal(0, spread_km / KM_PER_DEG, count)
+    lngs = CENTER_LNG + rng.normal(0, spread_km / KM_PER_DEG, count)
+    return lats, lngs
+
+
+def broadcast(distances: np.ndarray, radius_km: float, rng: random.Random):
+    free = np.ones(distances.shape[1], dtype=bool)
+    pickups, notifications = [], 0
+    for row in distances:
+        notified = np.flatnonzero(free & (row <= radius_km))
+        notifications += len(notified)
+        if len(notified):
+            winner = rng.choice(list(notified))
+            free[winner] = False
+            pickups.append(row[winner])
+    return pickups, notifications
+
+
+def nearest(distances: np.ndarray, radius_km: float):
+    free = np.ones(distances.shape[1], dtype=bool)
+    pickups = []
+    for row in distances:
+        candidates = np.where(free & (row <= radius_km), row, np.inf)
+        best = int(np.argmin(candidates))
+        if np.isfinite(candidates[best]):
+            free[best] = False
+            pickups.append(row[best])
+    return pickups, len(pickups)
+
+
+def batch(distances: np.ndarray, radius_km: float):
+    pickups = [km for _, _, km in assign_batch(distances, radius_km)]
+    return pickups, len(pickups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rides", type=int, default=200, help="Ride requests per window")
+    parser.add_argument("--drivers", type=int, default=300, help="Idle drivers per window")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--spread-km", type=float, default=6.0, help="Std deviation of positions around the centre")
+    parser.add_argument("--radius-km", type=float, default=50.0)
+    parser.add_argument("--speed-kmh", type=float, default=40.0, help="Average speed for pickup ETAs")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    race = random.Random(args.seed)
+    totals = {name: {"matched": 0, "km": 0.0, "notifications": 0, "seconds": 0.0} for name in ("broadcast", "nearest", "batch")}
+
+    for _ in range(args.rounds):
+        ride_lats, ride_lngs = scatter(rng, args.rides, args.spread_km)
+        driver_lats, driver_lngs = scatter(rng, args.drivers, args.spread_km)
+        started = time.perf_counter()
+        distances = distance_matrix(ride_lats, ride_lngs, driver_lats, driver_lngs)
+        matrix_seconds = time.perf_counter() - started
+
+        for name, run in (
+            ("broadcast", lambda: broadcast(distances, args.radius_km, race)),
+            ("nearest", lambda: nearest(distances, args.radius_km)),
+            ("batch", lambda: batch(distances, args.radius_km)),
+        ):
+            started = time.perf_counter()
+            pickups, notifications = run()
+            elapsed = time.perf_counter() - started + matrix_seconds
+            total = totals[name]
+            total["matched"] += len(pickups)
+            total["km"] += float(sum(pickups))
+            total["notifications"] += notifications
+            total["seconds"] += elapsed
+
+    print(f"{args.rounds} windows of {args.rides} rides / {args.drivers} idle drivers "
+          f"(spread {args.spread_km} km, ETAs at {args.speed_kmh} km/h)\n")
+    print(f"{'strategy':<10} {'matched':>8} {'mean km':>8} {'mean ETA':>9} {'total ETA h':>12} {'notifications':>14} {'ms/window':>10} {'rides/s':>10}")
+    for name, total in totals.items():
+        matched = total["matched"] or 1
+        mean_km = total["km"] / matched
+        print(
+            f"{name:<10} {total['matched']:>8} {mean_km:>8.2f} "
+            f"{mean_km / args.speed_kmh * 60:>7.1f} m "
+            f"{total['km'] / args.speed_kmh:>12.1f} "
+            f"{total['notifications']:>14} "
+            f"{total['seconds'] * 1000 / args.rounds:>10.1f} "
+            f"{total['matched'] / total['seconds']:>10,.0f}"
+        )
+
+    print("\nBatch solve time by window size:")
+    for size in (50, 100, 200, 400, 800):
+        ride_lats, ride_lngs = scatter(rng, size, args.spread_km)
+        driver_lats, driver_lngs = scatter(rng, int(size * 1.5), args.spread_km)
+        started = time.perf_counter()
+        assign_batch(distance_matrix(ride_lats, ride_lngs, driver_lats, driver_lngs), args.radius_km)
+        print(f"  {size:>4} rides x {int(size * 1.5):>4} drivers: {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
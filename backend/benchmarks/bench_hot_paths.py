@@ -0,0 +1,186 @@
+"""
+Micro-benchmarks for the pure functions on the request hot paths.
+
+Each benchmark is timed with ``timeit`` (auto-ranged loop count, best of
+--repeat runs) and reported as time per call. Every run is appended to a
+JSON-lines history file together with the git commit and compared with the
+latest recorded result for each benchmark, so a change to one of these inner
+loops shows up as a percentage change.
+
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --filter token --no-save
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+# Nothing here touches the database, but importing app.config needs settings
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from app.auth import create_access_token, decode_access_token
+from app.itinerary import build_legs
+from app.models import Ride, RideStatus, User, UserRole, Vacation, VehicleType
+from app.routers.vacation import calculate_vacation_price
+from app.routers.vacation_scheduler import parse_schedule
+from app.schemas import RideResponse, VacationResponse
+from app.utils import calculate_distance, calculate_fare
+from app.vacation_pricing import price_cache
+
+DEFAULT_HISTORY = os.path.join(BACKEND_DIR, "benchmarks", "history", "hot_paths.jsonl")
+
+
+def sample_user(user_id: int, role: UserRole) -> User:
+    return User(
+        id=user_id, email=f"user{user_id}@example.com", name=f"User {user_id}", phone="+911234567890",
+        role=role, is_active=True, is_verified=True, wallet_balance=120.5, created_at=datetime(2024, 1, 1, 9, 0)
+    )
+
+
+def sample_ride() -> Ride:
+    return Ride(
+        id=1, rider_id=1, driver_id=2, pickup_address="MG Road, Bangalore", pickup_lat=12.9756, pickup_lng=77.6066,
+        destination_address="Kempegowda International Airport", destination_lat=13.1986, destination_lng=77.7066,
+        status=RideStatus.COMPLETED, vehicle_type=VehicleType.SUV, distance_km=33.4, duration_minutes=55,
+        estimated_fare=782.0, final_fare=790.0, rating=5, feedback="Smooth ride",
+        scheduled_time=None, created_at=datetime(2024, 3, 1, 8, 0), started_at=datetime(2024, 3, 1, 8, 10),
+        completed_at=datetime(2024, 3, 1, 9, 5),
+        rider=sample_user(1, UserRole.RIDER), driver=sample_user(2, UserRole.DRIVER)
+    )
+
+
+def sample_vacation() -> Vacation:
+    start = datetime(2024, 12, 20, 6, 0)
+    activities = [
+        {"name": name, "location": location, "date": (start + timedelta(days=day)).strftime("%Y-%m-%d"), "time": "10:00"}
+        for day, (name, location) in enumerate([
+            ("Beach day", "Baga Beach"), ("Old Goa tour", "Basilica of Bom Jesus"),
+            ("Spice farm", "Sahakari Spice Farm"), ("Sunset cruise", "Panjim Jetty")
+        ], start=1)
+    ]
+    flight_details = {
+        "departureCity": "Bangalore", "arrivalCity": "Goa",
+        "departureTime": start.isoformat(), "arrivalTime": (start + timedelta(hours=1, minutes=20)).isoformat()
+    }
+    schedule = {"days": [{"day": day + 1, "items": [activity]} for day, activity in enumerate(activities)]}
+    return Vacation(
+        id=1, user_id=1, destination="Goa", hotel_name="Taj Fort Aguada", hotel_address="Sinquerim, Goa",
+        start_date=start, end_date=start + timedelta(days=6), total_price=48500.0,
+        ride_included=True, hotel_included=True, is_fixed_package=True, vehicle_type=VehicleType.SUV,
+        passengers=3, status="confirmed", booking_reference="ABCD123456", created_at=datetime(2024, 11, 1, 12, 0),
+        schedule=json.dumps(schedule), flight_details=json.dumps(flight_details), activities=json.dumps(activities),
+        meal_preferences=None, user=sample_user(1, UserRole.RIDER)
+    )
+
+
+def build_benchmarks() -> List[Tuple[str, Callable[[], object]]]:
+    ride = sample_ride()
+    vacation = sample_vacation()
+    token = create_access_token({"sub": "user1@example.com"})
+    vacation_args = dict(
+        days=6, passengers=3, vehicle_type="suv", ride_included=True, hotel_included=True, is_fixed_package=True,
+        flight_details=vacation.flight_details, activities=vacation.activities, destination="Goa"
+    )
+
+    def cold_vacation_price():
+        price_cache.clear()
+        return calculate_vacation_price(**vacation_args)
+
+    return [
+        ("utils.calculate_distance", lambda: calculate_distance(12.9716, 77.5946, 13.1986, 77.7066)),
+        ("utils.calculate_fare", lambda: calculate_fare(18.4, "suv", None, None, 12.9716, 77.5946)),
+        ("vacation.calculate_vacation_price (cached)", lambda: calculate_vacation_price(**vacation_args)),
+        ("vacation.calculate_vacation_price (cold)", cold_vacation_price),
+        ("vacation_scheduler.parse_schedule", lambda: parse_schedule(vacation)),
+        ("itinerary.build_legs", lambda: build_legs(vacation)),
+        ("auth.create_access_token", lambda: create_access_token({"sub": "user1@example.com"})),
+        ("auth.decode_access_token", lambda: decode_access_token(token)),
+        ("RideResponse serialize", lambda: RideResponse.model_validate(ride).model_dump_json()),
+        ("VacationResponse serialize", lambda: VacationResponse.model_validate(vacation).model_dump_json()),
+    ]
+
+
+def measure(func: Callable[[], object], repeat: int, min_seconds: float) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorange stops at >= 0.2s; scale up to the requested minimum per repeat
+    if elapsed < min_seconds:
+        number = max(number, int(number * min_seconds / max(elapsed, 1e-9)))
+    runs = timer.repeat(repeat=repeat, number=number)
+    best = min(runs) / number
+    return {"ns_per_call": round(best * 1e9, 1), "calls_per_s": round(1 / best, 1), "loops": number}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def latest_results(path: str) -> Dict[str, dict]:
+    """Most recent recorded result for each benchmark (runs may have been filtered)"""
+    latest: Dict[str, dict] = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    latest.update(json.loads(line)["results"])
+    return latest
+
+
+def format_time(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:8.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:8.2f} us"
+    return f"{ns:8.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum time per repeat")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines file runs are appended to")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    previous = latest_results(args.history)
+    results = {}
+    print(f"{'benchmark':<44} {'per call':>11} {'calls/s':>14} {'vs last':>9}")
+    for name, func in build_benchmarks():
+        if args.filter and args.filter.lower() not in name.lower():
+            continue
+        func()  # warm caches and lazy imports
+        result = measure(func, args.repeat, args.min_seconds)
+        results[name] = result
+        before = previous.get(name, {}).get("ns_per_call")
+        change = f"{(result['ns_per_call'] - before) / before * 100:+8.1f}%" if before else f"{'-':>9}"
+        print(f"{name:<44} {format_time(result['ns_per_call']):>11} {result['calls_per_s']:>14,.0f} {change}")
+
+    if not args.no_save and results:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps({
+                "run_at": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.node(),
+                "results": results
+            }) + "\n")
+        print(f"\nAppended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark shortest-path queries per second on the offline road graph.
+
+By default a synthetic city-sized grid (~90k intersections around central
+Bangalore) is generated; pass --graph to benchmark a real .osm/.json file.
+
+    python benchmarks/bench_road_graph.py --size 300 --queries 200
+    python benchmarks/bench_road_graph.py --graph data/bangalore.osm
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Nothing here touches the database, but importing app.config needs settings
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from app.road_graph import RoadGraph
+from app.utils import calculate_distance
+
+CENTER_LAT = 12.9716
+CENTER_LNG = 77.5946
+SPACING_DEG = 0.0025  # ~280m between intersections
+
+
+def build_grid_graph(size: int, seed: int) -> RoadGraph:
+    """Grid of size x size intersections with mixed road classes, gaps and one-way streets"""
+    rng = random.Random(seed)
+    origin_lat = CENTER_LAT - (size / 2) * SPACING_DEG
+    origin_lng = CENTER_LNG - (size / 2) * SPACING_DEG
+    coordinates = [
+        (origin_lat + r * SPACING_DEG, origin_lng + c * SPACING_DEG)
+        for r in range(size) for c in range(size)
+    ]
+
+    def speed_for(line: int) -> float:
+        if line % 20 == 0:
+            return 60.0  # arterial
+        if line % 5 == 0:
+            return 40.0  # collector
+        return 25.0  # residential
+
+    edges = []
+    for r in range(size):
+        for c in range(size):
+            node = r * size + c
+            for neighbour, line in ((node + 1, r), (node + size, c + size)):
+                if (neighbour == node + 1 and c == size - 1) or neighbour >= size * size:
+                    continue
+                if rng.random() < 0.08:
+                    continue  # missing link
+                length = calculate_distance(*coordinates[node], *coordinates[neighbour])
+                oneway = rng.random() < 0.15
+                edges.append((node, neighbour, length, speed_for(line), oneway))
+    return RoadGraph.from_edges(coordinates, edges)
+
+
+def run_queries(graph: RoadGraph, pairs) -> tuple:
+    found = 0
+    started = time.perf_counter()
+    for source, target in pairs:
+        if graph.shortest_path(source, target) is not None:
+            found += 1
+    elapsed = time.perf_counter() - started
+    return elapsed, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", help="Road graph file (.osm or .json) instead of a synthetic grid")
+    parser.add_argument("--size", type=int, default=300, help="Synthetic grid side length (nodes)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-dijkstra", action="store_true", help="Only time A*")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    graph = RoadGraph.load(args.graph) if args.graph else build_grid_graph(args.size, args.seed)
+    print(f"Graph: {graph.node_count} nodes, {graph.edge_count} directed edges "
+          f"(built in {time.perf_counter() - started:.2f}s)")
+
+    rng = random.Random(args.seed)
+    pairs = [(rng.randrange(graph.node_count), rng.randrange(graph.node_count)) for _ in range(args.queries)]
+
+    points = [(graph.lats[n] + 0.0007, graph.lngs[n] - 0.0004) for n, _ in pairs]
+    started = time.perf_counter()
+    for lat, lng in points:
+        graph.nearest_node(lat, lng)
+    snap_elapsed = time.perf_counter() - started
+    print(f"Snap to node: {len(points) / snap_elapsed:,.0f} lookups/s")
+
+    elapsed, found = run_queries(graph, pairs)
+    print(f"A*:       {args.queries / elapsed:,.1f} queries/s ({elapsed * 1000 / args.queries:.2f} ms/query, {found} routable)")
+
+    if not args.skip_dijkstra:
+        # An effectively infinite top speed collapses the heuristic to ~0, i.e. plain Dijkstra
+        max_speed = graph.max_speed_kmh
+        graph.max_speed_kmh = 1e12
+        elapsed, found = run_queries(graph, pairs)
+        graph.max_speed_kmh = max_speed
+        print(f"Dijkstra: {args.queries / elapsed:,.1f} queries/s ({elapsed * 1000 / args.queries:.2f} ms/query, {found} routable)")
+
+
+if __name__ == "__main__":
+    main()
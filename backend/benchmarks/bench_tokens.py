@@ -0,0 +1,77 @@
+"""
+Benchmark access token signing and verification: python-jose (the previous
+implementation) against the token service's HS256 fast path, cold and with
+the verified-token cache.
+
+    python benchmarks/bench_tokens.py --seconds 1
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from jose import jwt
+
+from app.config import settings
+from app.tokens import TokenService
+
+CLAIMS = {"sub": "rider@example.com", "uid": 4821, "role": "rider"}
+
+
+def rate(func, seconds: float) -> float:
+    """Calls per second of ``func`` over roughly ``seconds``"""
+    calls = 0
+    batch = 100
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time spent on each measurement")
+    args = parser.parse_args()
+
+    key, algorithm = settings.secret_key, "HS256"
+    service = TokenService(key, algorithm)
+
+    def jose_create():
+        return jwt.encode(dict(CLAIMS, exp=datetime.utcnow() + timedelta(minutes=30)), key, algorithm=algorithm)
+
+    jose_token = jose_create()
+    fast_token = service.create(CLAIMS)
+    # Both implementations must accept each other's tokens
+    assert jwt.decode(fast_token, key, algorithms=[algorithm])["uid"] == CLAIMS["uid"]
+    assert service.decode(jose_token)["uid"] == CLAIMS["uid"]
+
+    def cold_verify():
+        service.clear()
+        return service.decode(fast_token)
+
+    results = [
+        ("create", "python-jose", rate(jose_create, args.seconds)),
+        ("create", "token service", rate(lambda: service.create(CLAIMS), args.seconds)),
+        ("verify", "python-jose", rate(lambda: jwt.decode(jose_token, key, algorithms=[algorithm]), args.seconds)),
+        ("verify", "token service (cold)", rate(cold_verify, args.seconds)),
+        ("verify", "token service (cached)", rate(lambda: service.decode(fast_token), args.seconds)),
+    ]
+
+    baseline = {}
+    print(f"{'operation':<8} {'implementation':<24} {'ops/s':>12} {'speedup':>9}")
+    for operation, name, ops in results:
+        baseline.setdefault(operation, ops)
+        print(f"{operation:<8} {name:<24} {ops:>12,.0f} {ops / baseline[operation]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Load test the booking lifecycle over HTTP and WebSocket.
+
+Starts ``main:app`` under uvicorn against a throwaway SQLite database (or the
+--database-url you pass, e.g. a local Postgres) unless --url points at a
+server that is already running. It then simulates N riders and M drivers:
+
+    drivers: register -> login -> go available -> connect WebSocket -> location pings
+    riders:  register -> login -> create ride -> (driver) accept -> start -> complete -> rate
+
+``ws_notify`` is the time from the start of the create request until a
+driver's socket receives the ``new_ride_request``. Rides are handed to
+drivers round-robin, so the server should run in the default broadcast
+dispatch mode.
+
+Results include per-step p50/p95/p99 latency and throughput. A run can be
+saved as a named baseline, and later runs compared against it; the process
+exits non-zero when any step's p95 regresses by more than --tolerance.
+
+    python benchmarks/load_test.py --riders 50 --drivers 20 --rides-per-rider 2
+    python benchmarks/load_test.py --save-baseline main
+    python benchmarks/load_test.py --compare main --tolerance 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+
+CENTER_LAT = 12.9716
+CENTER_LNG = 77.5946
+
+STEPS = [
+    "register", "login", "availability", "ws_connect", "location",
+    "create_ride", "ws_notify", "accept", "start", "complete", "rate"
+]
+
+
+class StepStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    def record(self, started: float, ended: float, ok: bool = True):
+        if ok:
+            self.latencies.append(ended - started)
+        else:
+            self.errors += 1
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+    def summary(self) -> dict:
+        samples = sorted(self.latencies)
+        span = (self.last_end - self.first_start) if self.first_start is not None else 0
+        ms = lambda value: round(value * 1000, 2) if value is not None else None
+        return {
+            "count": len(samples),
+            "errors": self.errors,
+            "mean_ms": ms(sum(samples) / len(samples)) if samples else None,
+            "p50_ms": ms(self._percentile(samples, 0.50)),
+            "p95_ms": ms(self._percentile(samples, 0.95)),
+            "p99_ms": ms(self._percentile(samples, 0.99)),
+            "throughput_per_s": round(len(samples) / span, 1) if span > 0 else None
+        }
+
+
+class LoadTest:
+    def __init__(self, args, base_url: str):
+        self.args = args
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http", "ws", 1)
+        self.stats: Dict[str, StepStats] = {name: StepStats(name) for name in STEPS}
+        self.run_id = uuid.uuid4().hex[:8]
+        self.rng = random.Random(args.seed)
+        self.limit = asyncio.Semaphore(args.concurrency)
+        self.ride_created: Dict[int, float] = {}
+        self.ride_notified: Dict[int, float] = {}
+        self.notify_recorded = set()
+        self.sockets = []
+        self.stopping = asyncio.Event()
+
+    async def call(self, client: httpx.AsyncClient, step: str, method: str, url: str, expect: int = 200, **kwargs) -> Optional[httpx.Response]:
+        async with self.limit:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code == expect
+            except httpx.HTTPError as e:
+                response, ok = None, False
+                print(f"{step}: {e}")
+            self.stats[step].record(started, time.perf_counter(), ok)
+        if not ok and response is not None and self.args.verbose:
+            print(f"{step} {url}: {response.status_code} {response.text[:200]}")
+        return response if ok else None
+
+    def position(self, spread_km: float = 5.0):
+        return (
+            CENTER_LAT + self.rng.gauss(0, spread_km / 111),
+            CENTER_LNG + self.rng.gauss(0, spread_km / 111)
+        )
+
+    async def sign_up(self, client: httpx.AsyncClient, role: str, index: int) -> Optional[dict]:
+        email = f"load-{self.run_id}-{role}-{index}@example.com"
+        created = await self.call(client, "register", "POST", "/api/auth/register", expect=201, json={
+            "email": email, "name": f"{role} {index}", "password": "loadtest-pw", "role": role
+        })
+        if created is None:
+            return None
+        login = await self.call(client, "login", "POST", "/api/auth/login", data={"username": email, "password": "loadtest-pw"})
+        if login is None:
+            return None
+        body = login.json()
+        return {"id": body["user"]["id"], "token": body["access_token"], "headers": {"Authorization": f"Bearer {body['access_token']}"}}
+
+    # --- Drivers ---
+
+    async def listen(self, connection):
+        try:
+            async for raw in connection:
+                message = json.loads(raw)
+                if message.get("type") == "ping":
+                    await connection.send(json.dumps({"type": "pong"}))
+                elif message.get("type") == "new_ride_request":
+                    self.ride_notified.setdefault(message.get("ride_id"), time.perf_counter())
+                    self.record_notify(message.get("ride_id"))
+        except websockets.ConnectionClosed:
+            pass
+
+    def record_notify(self, ride_id: int):
+        """Record ws_notify once both the create start and the first notification are known"""
+        if ride_id in self.ride_created and ride_id in self.ride_notified and ride_id not in self.notify_recorded:
+            self.notify_recorded.add(ride_id)
+            self.stats["ws_notify"].record(self.ride_created[ride_id], self.ride_notified[ride_id])
+
+    async def start_driver(self, client: httpx.AsyncClient, driver: dict):
+        await self.call(client, "availability", "PATCH", "/api/users/driver/availability", headers=driver["headers"])
+        lat, lng = self.position()
+        await self.call(client, "location", "PATCH", "/api/users/driver/location", headers=driver["headers"], json={"lat": lat, "lng": lng})
+        started = time.perf_counter()
+        try:
+            connection = await websockets.connect(f"{self.ws_url}/ws/{driver['token']}")
+        except Exception as e:
+            self.stats["ws_connect"].record(started, time.perf_counter(), False)
+            print(f"ws_connect: {e}")
+            return
+        self.stats["ws_connect"].record(started, time.perf_counter())
+        self.sockets.append((connection, asyncio.create_task(self.listen(connection))))
+
+    async def ping_location(self, client: httpx.AsyncClient, driver: dict):
+        while not self.stopping.is_set():
+            lat, lng = self.position()
+            await self.call(client, "location", "PATCH", "/api/users/driver/location", headers=driver["headers"], json={"lat": lat, "lng": lng})
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.args.ping_interval * (0.5 + self.rng.random()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def drive(self, client: httpx.AsyncClient, driver: dict, queue: asyncio.Queue):
+        """Take rides off this driver's queue one at a time"""
+        while True:
+            ride_id, done = await queue.get()
+            ok = True
+            for step, ride_status in (("accept", "accepted"), ("start", "in_progress"), ("complete", "completed")):
+                if await self.call(client, step, "PATCH", f"/api/rides/{ride_id}", headers=driver["headers"], json={"status": ride_status}) is None:
+                    ok = False
+                    break
+            done.set_result(ok)
+
+    # --- Riders ---
+
+    async def ride(self, client: httpx.AsyncClient, rider: dict, queues: List[asyncio.Queue], index: int):
+        for n in range(self.args.rides_per_rider):
+            pickup_lat, pickup_lng = self.position()
+            dest_lat, dest_lng = self.position(10.0)
+            started = time.perf_counter()
+            created = await self.call(client, "create_ride", "POST", "/api/rides/", expect=201, headers=rider["headers"], json={
+                "pickup_address": "Load test pickup", "pickup_lat": pickup_lat, "pickup_lng": pickup_lng,
+                "destination_address": "Load test drop", "destination_lat": dest_lat, "destination_lng": dest_lng
+            })
+            if created is None:
+                continue
+            ride_id = created.json()["id"]
+            # Dispatch runs inside the create request, so the notification usually arrives first
+            self.ride_created[ride_id] = started
+            self.record_notify(ride_id)
+            done = asyncio.get_running_loop().create_future()
+            await queues[(index + n) % len(queues)].put((ride_id, done))
+            if await done:
+                await self.call(client, "rate", "POST", f"/api/rides/{ride_id}/rate", headers=rider["headers"], json={
+                    "rating": self.rng.randint(3, 5), "feedback": "load test"
+                })
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60, limits=limits) as client:
+            started = time.perf_counter()
+            drivers = await asyncio.gather(*(self.sign_up(client, "driver", i) for i in range(self.args.drivers)))
+            riders = await asyncio.gather(*(self.sign_up(client, "rider", i) for i in range(self.args.riders)))
+            drivers = [driver for driver in drivers if driver]
+            riders = [rider for rider in riders if rider]
+            if not drivers or not riders:
+                raise SystemExit("Sign-up failed; run with --verbose and check the server log")
+            await asyncio.gather(*(self.start_driver(client, driver) for driver in drivers))
+            signup_seconds = time.perf_counter() - started
+
+            queues = [asyncio.Queue() for _ in drivers]
+            workers = [asyncio.create_task(self.drive(client, driver, queue)) for driver, queue in zip(drivers, queues)]
+            pingers = [asyncio.create_task(self.ping_location(client, driver)) for driver in drivers]
+            started = time.perf_counter()
+            await asyncio.gather(*(self.ride(client, rider, queues, i) for i, rider in enumerate(riders)))
+            ride_seconds = time.perf_counter() - started
+
+            self.stopping.set()
+            await asyncio.gather(*pingers)
+            for worker in workers:
+                worker.cancel()
+            for connection, listener in self.sockets:
+                await connection.close()
+                listener.cancel()
+
+        return {
+            "run_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "riders": self.args.riders,
+                "drivers": self.args.drivers,
+                "rides_per_rider": self.args.rides_per_rider,
+                "concurrency": self.args.concurrency,
+                "database": "external" if self.args.url else (self.args.database_url or "sqlite")
+            },
+            "phases": {
+                "signup_seconds": round(signup_seconds, 2),
+                "ride_seconds": round(ride_seconds, 2),
+                "rides_per_second": round(len(self.stats["complete"].latencies) / ride_seconds, 2) if ride_seconds else None
+            },
+            "steps": {name: stats.summary() for name, stats in self.stats.items()}
+        }
+
+
+# --- Server ---
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir: str):
+    port = free_port()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    env.setdefault("SECRET_KEY", "load-test-secret")
+    env["DISPATCH_MODE"] = "broadcast"
+    log = open(os.path.join(workdir, "server.log"), "w")
+    # Run from the temp directory so files the app writes relative to its cwd stay out of the tree
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited during startup; see {log.name}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url, log
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not become healthy within 30s")
+
+
+# --- Reporting ---
+
+def print_report(result: dict):
+    phases = result["phases"]
+    print(f"\nSign-up phase {phases['signup_seconds']}s, ride phase {phases['ride_seconds']}s "
+          f"({phases['rides_per_second']} completed rides/s)\n")
+    print(f"{'step':<13} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>8}")
+    for name, step in result["steps"].items():
+        fmt = lambda value: f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+        ops = f"{step['throughput_per_s']:>8.1f}" if step["throughput_per_s"] is not None else f"{'-':>8}"
+        print(f"{name:<13} {step['count']:>6} {step['errors']:>6} {fmt(step['p50_ms'])} {fmt(step['p95_ms'])} {fmt(step['p99_ms'])} {ops}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print p95 deltas against a baseline; False if any step regressed beyond tolerance percent"""
+    print(f"\nAgainst baseline from {baseline['run_at']} (tolerance {tolerance:.0f}%):")
+    passed = True
+    for name, step in result["steps"].items():
+        before = baseline["steps"].get(name, {}).get("p95_ms")
+        after = step["p95_ms"]
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        regressed = change > tolerance
+        passed = passed and not regressed
+        print(f"  {name:<13} p95 {before:>9.1f} -> {after:>9.1f} ms ({change:+6.1f}%){'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=20)
+    parser.add_argument("--drivers", type=int, default=10)
+    parser.add_argument("--rides-per-rider", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=20, help="Maximum HTTP requests in flight")
+    parser.add_argument("--ping-interval", type=float, default=2.0, help="Seconds between driver location pings")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--database-url", help="Database for the spawned server (default: a temporary SQLite file)")
+    parser.add_argument("--output", help="Also write the results JSON to this path")
+    parser.add_argument("--save-baseline", metavar="NAME", help=f"Save results as {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare p95 latencies with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="Allowed p95 regression in percent")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rideshare-load-")
+    process = log = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            process, base_url, log = start_server(args, workdir)
+        result = asyncio.run(LoadTest(args, base_url).run())
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved baseline {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
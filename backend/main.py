@@ -2,21 +2,69 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
+import json
 
-from app.database import engine, Base, get_db
+from app.database import engine, Base, get_db, SessionLocal
 from app.models import User, UserRole
-from app.routers import auth, rides, users, admin, vacation, vacation_scheduler
+from app.routers import auth, rides, users, admin, vacation, vacation_scheduler, intercity
 from app.websocket import manager
-from app.auth import decode_access_token, get_current_active_user
+from app.auth import decode_access_token, get_current_active_user, user_from_claims
+from app.tariffs import tariff_service
+from app.surge import surge_engine
+from app.geocoding import geocoder
+from app.city_index import city_index
+from app.pooling import pooling_engine, schedule_sweep
+from app.jobs import job_scheduler
+from app import refresh_tokens
+from app.availability import availability
+from app.driver_state import driver_registry
+from app.offers import offer_engine
+from app.batch_matcher import batch_matcher
 from sqlalchemy.orm import Session
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        tariff_service.reload(db)
+        geocoder.load(db)
+        city_index.load(db)
+        pooling_engine.load(db)
+        surge_engine.seed(db)
+        availability.load(db)
+        driver_registry.load(db)
+        job_scheduler.recover(db)
+        refresh_tokens.schedule_purge(db)
+        schedule_sweep(db)
+    finally:
+        db.close()
+    surge_engine.start()
+    job_scheduler.start()
+    driver_registry.start()
+    manager.start()
+    batch_matcher.start()
     yield
     # Shutdown
-    pass
+    await batch_matcher.stop()
+    await offer_engine.stop()
+    await manager.stop()
+    await driver_registry.stop()
+    await job_scheduler.stop()
+    await surge_engine.stop()
+
+def is_pong(data: str) -> bool:
+    try:
+        return json.loads(data).get("type") == "pong"
+    except (ValueError, AttributeError):
+        return data == "pong"
+
+def _track_driver_presence(user_id: int, role, online: bool):
+    if role == UserRole.DRIVER.value:
+        driver_registry.set_connected(user_id, online)
+
+manager.add_presence_listener(_track_driver_presence)
 
 app = FastAPI(
     title="Uber Clone API",
@@ -49,6 +97,7 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(vacation.router, prefix="/api/vacation", tags=["Vacation"])
 app.include_router(vacation_scheduler.router, prefix="/api/scheduler", tags=["Vacation Scheduler"])
+app.include_router(intercity.router, prefix="/api/intercity", tags=["Intercity"])
 
 @app.get("/")
 async def root():
@@ -92,29 +141,34 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
         await websocket.close(code=1008)
         return
     
-    user_email = payload.get("sub")
-    if not user_email:
-        await websocket.close(code=1008)
-        return
-    
     # Get actual user from database
-    user = db.query(User).filter(User.email == user_email).first()
+    user = user_from_claims(db, payload)
     if not user:
         await websocket.close(code=1008)
         return
     
     user_id = user.id
     
-    await manager.connect(websocket, user_id)
+    role = user.role.value if hasattr(user.role, 'value') else str(user.role)
+    
+    await manager.connect(websocket, user_id, role)
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
+            # Heartbeat replies only refresh presence
+            if is_pong(data):
+                continue
             # Echo back or process messages
             await manager.send_personal_message(
                 {"type": "message", "data": data},
                 user_id
             )
     except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket error for user {user_id}: {e}")
+    finally:
         manager.disconnect(websocket, user_id)
 
 if __name__ == "__main__":
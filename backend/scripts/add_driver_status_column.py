@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        # Snapshot of the in-memory driver state registry
+        for column, ddl in [
+            ("status", "VARCHAR DEFAULT 'offline'"),
+            ("status_updated_at", "TIMESTAMP WITH TIME ZONE"),
+        ]:
+            try:
+                conn.execute(text(f"ALTER TABLE driver_profiles ADD COLUMN {column} {ddl}"))
+                conn.commit()
+                print(f"Added {column} to driver_profiles table")
+            except Exception as e:
+                conn.rollback()
+                print(f"{column} column might already exist: {e}")
+
+if __name__ == "__main__":
+    update_schema()
@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        # Keyset pagination of available intercity rides
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_intercity_rides_open ON intercity_rides (status, scheduled_date, id)"))
+            conn.commit()
+            print("Ensured ix_intercity_rides_open index exists")
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to create ix_intercity_rides_open index: {e}")
+
+if __name__ == "__main__":
+    update_schema()
@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+from app.database import Base
+from app.models import IntercityPool
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+    
+    # Shared vehicles for intercity pooling
+    Base.metadata.create_all(bind=engine, tables=[IntercityPool.__table__])
+    print("Ensured intercity_pools table exists")
+    
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE intercity_rides ADD COLUMN pool_id INTEGER REFERENCES intercity_pools(id)"))
+            conn.commit()
+            print("Added pool_id to intercity_rides table")
+        except Exception as e:
+            conn.rollback()
+            print(f"pool_id column might already exist: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_intercity_rides_pool_id ON intercity_rides (pool_id)"))
+            conn.commit()
+            print("Ensured ix_intercity_rides_pool_id index exists")
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to create ix_intercity_rides_pool_id index: {e}")
+    
+    # Pending bookings are pooled by the pooling engine at the next startup
+
+if __name__ == "__main__":
+    update_schema()
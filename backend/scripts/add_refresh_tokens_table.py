@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from app.config import settings
+from app.database import Base
+from app.models import RefreshToken
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+
+    # Hashed, rotating refresh tokens issued at login
+    Base.metadata.create_all(bind=engine, tables=[RefreshToken.__table__])
+    print("Ensured refresh_tokens table exists")
+
+if __name__ == "__main__":
+    update_schema()
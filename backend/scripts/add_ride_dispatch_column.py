@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+    
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE rides ADD COLUMN dispatched_at TIMESTAMP WITH TIME ZONE"))
+            conn.commit()
+            print("Added dispatched_at to rides table")
+        except Exception as e:
+            conn.rollback()
+            print(f"dispatched_at column might already exist: {e}")
+        
+        # Existing rides were all dispatched on creation
+        try:
+            result = conn.execute(text("UPDATE rides SET dispatched_at = COALESCE(created_at, NOW()) WHERE dispatched_at IS NULL"))
+            conn.commit()
+            print(f"Backfilled dispatched_at for {result.rowcount} rides")
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to backfill dispatched_at: {e}")
+        
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_rides_open ON rides (status, driver_id, dispatched_at)"))
+            conn.commit()
+            print("Ensured ix_rides_open index exists")
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to create ix_rides_open index: {e}")
+
+if __name__ == "__main__":
+    update_schema()
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+from app.database import Base
+from app.models import VacationLeg
+
+def update_schema():
+    engine = create_engine(settings.database_url)
+    
+    # Create the vacation_legs table
+    Base.metadata.create_all(bind=engine, tables=[VacationLeg.__table__])
+    print("Ensured vacation_legs table exists")
+    
+    with engine.connect() as conn:
+        # Itinerary cursor columns on vacations; existing bookings are compiled lazily
+        for column, ddl in [
+            ("leg_count", "INTEGER"),
+            ("leg_cursor", "INTEGER DEFAULT 0"),
+        ]:
+            try:
+                conn.execute(text(f"ALTER TABLE vacations ADD COLUMN {column} {ddl}"))
+                conn.commit()
+                print(f"Added {column} to vacations table")
+            except Exception as e:
+                conn.rollback()
+                print(f"{column} column might already exist: {e}")
+
+if __name__ == "__main__":
+    update_schema()
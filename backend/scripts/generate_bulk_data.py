@@ -0,0 +1,438 @@
+"""
+Generate production-scale synthetic data for benchmarks and query plans.
+
+Creates riders, drivers (with profiles), rides, vacations (with their
+compiled ``vacation_legs`` itineraries) and wallet transactions in bulk. Positions are clustered around the seeded cities,
+weighted by how many other cities are nearby so metro regions dominate.
+Ride lengths are log-normal, timestamps follow daily peaks over the last
+--days, and ride and vacation statuses follow a realistic mix.
+
+Rows are generated in NumPy-backed chunks and written with
+``bulk_insert_mappings``, or with COPY on PostgreSQL (--copy), committing
+per chunk. Every generated user shares one bcrypt hash of --password so
+generation does not spend hours in bcrypt. Emails carry a run tag, so the
+script can be run repeatedly against the same database.
+
+    python scripts/generate_bulk_data.py --riders 1000000 --drivers 50000 --rides 5000000 --copy
+    python scripts/generate_bulk_data.py --riders 2000 --drivers 200 --rides 20000
+"""
+import argparse
+import csv
+import enum
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+
+from app.auth import get_password_hash
+from app.database import Base, SessionLocal, engine
+from app.geocoding import geocoder
+from app.itinerary import build_legs
+from app.models import City, DriverProfile, Ride, RideStatus, Transaction, User, UserRole, Vacation, VacationLeg, VehicleType
+from app.tariffs import DEFAULT_TARIFFS
+from seed_database import seed_cities
+
+DENSITY_RADIUS_KM = 30.0
+CITY_SPREAD_KM = 4.0
+KM_PER_DEG = 111.0
+AVERAGE_SPEED_KMH = 25.0
+
+VEHICLE_TYPES = [VehicleType.ECONOMY, VehicleType.PREMIUM, VehicleType.SUV, VehicleType.LUXURY]
+VEHICLE_WEIGHTS = [0.62, 0.18, 0.15, 0.05]
+RIDE_STATUSES = [RideStatus.COMPLETED, RideStatus.CANCELLED, RideStatus.IN_PROGRESS, RideStatus.ACCEPTED, RideStatus.PENDING]
+RIDE_STATUS_WEIGHTS = [0.86, 0.09, 0.02, 0.015, 0.015]
+VACATION_STATUSES = ["completed", "confirmed", "pending", "cancelled", "in_progress"]
+VACATION_STATUS_WEIGHTS = [0.55, 0.2, 0.1, 0.1, 0.05]
+VACATION_DESTINATIONS = ["Goa", "Jaipur", "Mumbai", "Delhi", "Chennai", "Kolkata", "Hyderabad", "Pune"]
+VACATION_ACTIVITIES = ["Beach", "Fort", "Museum", "Market", "Temple", "Boat ride", "Food walk", "Spa"]
+LEG_COLUMNS = [
+    "vacation_id", "sequence", "kind", "pickup_address", "pickup_lat", "pickup_lng",
+    "destination_address", "destination_lat", "destination_lng", "distance_km",
+    "duration_minutes", "estimated_fare", "planned_time", "ride_id"
+]
+# Share of rides requested in each hour of the day: morning and evening peaks
+HOURLY_DEMAND = np.array([
+    1, 0.6, 0.4, 0.3, 0.4, 0.8, 2, 4, 6, 5.5, 4, 3.5,
+    3.5, 3.5, 3.5, 3.8, 4.5, 6, 6.5, 6, 5, 4, 3, 2
+])
+
+
+class Generator:
+    def __init__(self, db: Session, args):
+        self.db = db
+        self.args = args
+        self.rng = np.random.default_rng(args.seed)
+        self.tag = args.tag or uuid.uuid4().hex[:6]
+        self.now = datetime.now().replace(microsecond=0)
+        self.use_copy = args.copy and db.bind.dialect.name == "postgresql"
+        self.password_hash = get_password_hash(args.password)
+        self._load_cities()
+
+    def _load_cities(self):
+        cities = self.db.query(City.name, City.lat, City.lng).filter(City.lat != None, City.lng != None).all()
+        if not cities:
+            seed_cities(self.db)
+            cities = self.db.query(City.name, City.lat, City.lng).filter(City.lat != None, City.lng != None).all()
+        self.city_names = [name for name, _, _ in cities]
+        self.city_lats = np.array([lat for _, lat, _ in cities], dtype=float)
+        self.city_lngs = np.array([lng for _, _, lng in cities], dtype=float)
+        # Demand follows urban density: weight each city by how many others lie within the radius
+        offsets = np.hypot(
+            self.city_lats[:, None] - self.city_lats[None, :],
+            self.city_lngs[:, None] - self.city_lngs[None, :]
+        ) * KM_PER_DEG
+        weights = (offsets < DENSITY_RADIUS_KM).sum(axis=1).astype(float)
+        self.city_weights = weights / weights.sum()
+        print(f"Clustering positions around {len(cities)} cities")
+        # Itineraries resolve city names the same way the app does
+        geocoder.load(self.db)
+
+    # --- Sampling helpers ---
+
+    def positions(self, count: int, spread_km: float = CITY_SPREAD_KM):
+        """(city_index, lat, lng) arrays for points scattered around weighted cities"""
+        city = self.rng.choice(len(self.city_names), size=count, p=self.city_weights)
+        lats = self.city_lats[city] + self.rng.normal(0, spread_km / KM_PER_DEG, count)
+        lngs = self.city_lngs[city] + self.rng.normal(0, spread_km / KM_PER_DEG, count)
+        return city, np.round(lats, 6), np.round(lngs, 6)
+
+    def timestamps(self, count: int) -> List[datetime]:
+        days = self.rng.integers(0, self.args.days, count)
+        hours = self.rng.choice(24, size=count, p=HOURLY_DEMAND / HOURLY_DEMAND.sum())
+        seconds = self.rng.integers(0, 3600, count)
+        start = self.now.replace(hour=0, minute=0, second=0) - timedelta(days=self.args.days)
+        return [start + timedelta(days=int(d), hours=int(h), seconds=int(s)) for d, h, s in zip(days, hours, seconds)]
+
+    def choice(self, options: list, weights: list, count: int) -> list:
+        picks = self.rng.choice(len(options), size=count, p=np.array(weights) / sum(weights))
+        return [options[i] for i in picks]
+
+    def chunks(self, total: int) -> Iterator[range]:
+        for start in range(0, total, self.args.batch_size):
+            yield range(start, min(total, start + self.args.batch_size))
+
+    # --- Writing ---
+
+    def insert(self, model, rows: List[dict]):
+        if not rows:
+            return
+        if self.use_copy:
+            self._copy(model, rows)
+        else:
+            self.db.bulk_insert_mappings(model, rows)
+        self.db.commit()
+
+    def _copy(self, model, rows: List[dict]):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([self._copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        connection = self.db.connection().connection
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+    @staticmethod
+    def _copy_value(value):
+        if value is None:
+            return None  # csv writes an empty unquoted field, which COPY reads as NULL
+        if isinstance(value, enum.Enum):
+            return value.name  # SQLAlchemy stores Enum columns by member name
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def timed(self, label: str, total: int, generate):
+        started = time.perf_counter()
+        written = 0
+        for chunk in self.chunks(total):
+            written += generate(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"\r  {label}: {written:,}/{total:,} ({written / max(elapsed, 1e-9):,.0f} rows/s)", end="", flush=True)
+        print(f"\r  {label}: {written:,} rows in {time.perf_counter() - started:.1f}s" + " " * 20)
+
+    # --- Tables ---
+
+    def users(self, role: UserRole, total: int) -> np.ndarray:
+        prefix = f"bulk-{self.tag}-{role.value}-"
+        created = self.timestamps(total)
+
+        def generate(chunk: range) -> int:
+            balances = np.round(self.rng.gamma(2.0, 250.0, len(chunk)), 2)
+            self.insert(User, [{
+                "name": f"{role.value.title()} {i}",
+                "email": f"{prefix}{i}@example.com",
+                "phone": f"+91{9000000000 + i}",
+                "password": self.password_hash,
+                "role": role,
+                "is_active": True,
+                "is_verified": True,
+                "wallet_balance": float(balance),
+                "created_at": created[i]
+            } for i, balance in zip(chunk, balances)])
+            return len(chunk)
+
+        self.timed(f"{role.value}s", total, generate)
+        ids = self.db.query(User.id).filter(User.email.like(f"{prefix}%")).order_by(User.id).all()
+        return np.array([user_id for (user_id,) in ids], dtype=np.int64)
+
+    def driver_profiles(self, driver_ids: np.ndarray):
+        def generate(chunk: range) -> int:
+            count = len(chunk)
+            _, lats, lngs = self.positions(count)
+            vehicle_types = self.choice(VEHICLE_TYPES, VEHICLE_WEIGHTS, count)
+            available = self.rng.random(count) < 0.6
+            ratings = np.round(np.clip(self.rng.normal(4.6, 0.3, count), 3.0, 5.0), 2)
+            total_rides = self.rng.poisson(300, count)
+            self.insert(DriverProfile, [{
+                "user_id": int(driver_ids[i]),
+                "license_number": f"BULK-{self.tag}-{i}",
+                "vehicle_type": vehicle_types[n],
+                "vehicle_model": "Maruti Dzire" if vehicle_types[n] == VehicleType.ECONOMY else "Toyota Innova",
+                "vehicle_plate": f"KA{i % 100:02d}X{i % 10000:04d}",
+                "rating": float(ratings[n]),
+                "total_rides": int(total_rides[n]),
+                "is_available": bool(available[n]),
+                "current_lat": float(lats[n]),
+                "current_lng": float(lngs[n]),
+                "status": "offline"
+            } for n, i in enumerate(chunk)])
+            return count
+
+        self.timed("driver profiles", len(driver_ids), generate)
+
+    def rides(self, rider_ids: np.ndarray, driver_ids: np.ndarray, total: int):
+        def generate(chunk: range) -> int:
+            count = len(chunk)
+            city, pickup_lats, pickup_lngs = self.positions(count)
+            # Trip length is log-normal (median ~7 km) in a uniformly random direction
+            trip_km = np.clip(self.rng.lognormal(np.log(7), 0.6, count), 0.5, 80)
+            bearing = self.rng.uniform(0, 2 * np.pi, count)
+            dest_lats = np.round(pickup_lats + trip_km * np.cos(bearing) / KM_PER_DEG, 6)
+            dest_lngs = np.round(pickup_lngs + trip_km * np.sin(bearing) / (KM_PER_DEG * np.cos(np.radians(pickup_lats))), 6)
+            duration = np.maximum(3, trip_km / AVERAGE_SPEED_KMH * 60).astype(int)
+            riders = self.rng.choice(rider_ids, count)
+            drivers = self.rng.choice(driver_ids, count)
+            statuses = self.choice(RIDE_STATUSES, RIDE_STATUS_WEIGHTS, count)
+            vehicle_types = self.choice(VEHICLE_TYPES, VEHICLE_WEIGHTS, count)
+            ratings = self.rng.choice([5, 4, 3, 2, 1], size=count, p=[0.62, 0.25, 0.08, 0.03, 0.02])
+            created = self.timestamps(count)
+
+            rows = []
+            for n in range(count):
+                status = statuses[n]
+                tariff = DEFAULT_TARIFFS[vehicle_types[n].value]
+                fare = round(tariff["base_fare"] + tariff["per_km_rate"] * float(trip_km[n]), 2)
+                has_driver = status != RideStatus.PENDING and not (status == RideStatus.CANCELLED and n % 2)
+                started = created[n] + timedelta(minutes=5) if status in (RideStatus.IN_PROGRESS, RideStatus.COMPLETED) else None
+                completed = status == RideStatus.COMPLETED
+                name = self.city_names[city[n]]
+                rows.append({
+                    "rider_id": int(riders[n]),
+                    "driver_id": int(drivers[n]) if has_driver else None,
+                    "pickup_address": f"{name} pickup",
+                    "pickup_lat": float(pickup_lats[n]),
+                    "pickup_lng": float(pickup_lngs[n]),
+                    "destination_address": f"{name} drop",
+                    "destination_lat": float(dest_lats[n]),
+                    "destination_lng": float(dest_lngs[n]),
+                    "status": status,
+                    "vehicle_type": vehicle_types[n],
+                    "distance_km": round(float(trip_km[n]), 2),
+                    "duration_minutes": int(duration[n]),
+                    "estimated_fare": fare,
+                    "final_fare": fare if completed else None,
+                    "rating": int(ratings[n]) if completed and n % 3 else None,
+                    "dispatched_at": created[n],
+                    "created_at": created[n],
+                    "started_at": started,
+                    "completed_at": started + timedelta(minutes=int(duration[n])) if completed else None
+                })
+            self.insert(Ride, rows)
+            return count
+
+        self.timed("rides", total, generate)
+
+    def vacations(self, rider_ids: np.ndarray, driver_ids: np.ndarray, total: int):
+        legs_written = 0
+
+        def generate(chunk: range) -> int:
+            nonlocal legs_written
+            count = len(chunk)
+            users = self.rng.choice(rider_ids, count)
+            drivers = self.rng.choice(driver_ids, count)
+            statuses = self.choice(VACATION_STATUSES, VACATION_STATUS_WEIGHTS, count)
+            destinations = self.choice(VACATION_DESTINATIONS, [6, 3, 2, 2, 1, 1, 1, 1], count)
+            origins = self.rng.choice(len(self.city_names), size=count, p=self.city_weights)
+            vehicle_types = self.choice(VEHICLE_TYPES, VEHICLE_WEIGHTS, count)
+            nights = self.rng.integers(2, 10, count)
+            passengers = self.rng.integers(1, 6, count)
+            activity_counts = self.rng.integers(0, 6, count)
+            created = self.timestamps(count)
+            rows = []
+            chunk_legs = []
+            for n, i in enumerate(chunk):
+                start = created[n] + timedelta(days=int(self.rng.integers(3, 60)))
+                end = start + timedelta(days=int(nights[n]), hours=int(self.rng.integers(9, 21)))
+                departure = start + timedelta(hours=int(self.rng.integers(6, 20)))
+                status = statuses[n]
+                flight_details = {
+                    "departureCity": self.city_names[origins[n]],
+                    "arrivalCity": destinations[n],
+                    "departureTime": departure.isoformat(),
+                    "arrivalTime": (departure + timedelta(minutes=int(self.rng.integers(60, 180)))).isoformat(),
+                    "flightNumber": f"6E{int(self.rng.integers(100, 9999))}"
+                }
+                # Most activities are scheduled on a day of the stay; some are left undated
+                activities = []
+                for a in range(int(activity_counts[n])):
+                    activity = {"location": VACATION_ACTIVITIES[(i + a) % len(VACATION_ACTIVITIES)]}
+                    if a % 3 != 2:
+                        day = start + timedelta(days=1 + int(self.rng.integers(0, max(1, int(nights[n]) - 1))))
+                        activity.update(date=day.date().isoformat(), time=f"{int(self.rng.integers(8, 18)):02d}:00")
+                    activities.append(activity)
+                row = {
+                    "user_id": int(users[n]),
+                    "driver_id": int(drivers[n]) if status in ("confirmed", "in_progress", "completed") else None,
+                    "destination": destinations[n],
+                    "hotel_name": f"{destinations[n]} Resort",
+                    "start_date": start,
+                    "end_date": end,
+                    "total_price": float(np.round(nights[n] * passengers[n] * 2200 + self.rng.normal(4000, 800), 2)),
+                    "ride_included": True,
+                    "hotel_included": bool(n % 4),
+                    "is_fixed_package": bool(n % 3 == 0),
+                    "vehicle_type": vehicle_types[n],
+                    "passengers": int(passengers[n]),
+                    "status": status,
+                    "booking_reference": f"B{self.tag}{i:08d}".upper(),
+                    "flight_details": json.dumps(flight_details),
+                    "activities": json.dumps(activities),
+                    "created_at": created[n]
+                }
+                # Compile the itinerary exactly as booking does; completed trips have dispatched every leg
+                legs = build_legs(Vacation(**row))
+                row["leg_count"] = len(legs)
+                if status == "completed":
+                    row["leg_cursor"] = len(legs)
+                elif status == "in_progress":
+                    row["leg_cursor"] = int(self.rng.integers(1, len(legs)))
+                else:
+                    row["leg_cursor"] = 0
+                rows.append(row)
+                chunk_legs.append(legs)
+            self.insert(Vacation, rows)
+
+            # Booking references are zero-padded per run, so the chunk is one contiguous range
+            ids = dict(self.db.query(Vacation.booking_reference, Vacation.id).filter(
+                Vacation.booking_reference.between(rows[0]["booking_reference"], rows[-1]["booking_reference"])
+            ).all())
+            leg_rows = []
+            for row, legs in zip(rows, chunk_legs):
+                vacation_id = ids[row["booking_reference"]]
+                for leg in legs:
+                    leg.vacation_id = vacation_id
+                    leg_rows.append({column: getattr(leg, column) for column in LEG_COLUMNS})
+            self.insert(VacationLeg, leg_rows)
+            legs_written += len(leg_rows)
+            return count
+
+        self.timed("vacations", total, generate)
+        print(f"  vacation legs: {legs_written:,} rows")
+        return legs_written
+
+    def transactions(self, rider_ids: np.ndarray, driver_ids: np.ndarray, total: int):
+        def generate(chunk: range) -> int:
+            count = len(chunk)
+            is_driver = self.rng.random(count) < 0.4
+            users = np.where(is_driver, self.rng.choice(driver_ids, count), self.rng.choice(rider_ids, count))
+            amounts = np.round(self.rng.gamma(2.0, 180.0, count) + 20, 2)
+            created = self.timestamps(count)
+            rows = []
+            for n in range(count):
+                if is_driver[n]:
+                    kind, description = "credit", "Ride earnings"
+                elif n % 3:
+                    kind, description = "debit", "Ride payment"
+                else:
+                    kind, description = "credit", "Wallet top-up"
+                rows.append({
+                    "user_id": int(users[n]),
+                    "amount": float(amounts[n]),
+                    "type": kind,
+                    "description": description,
+                    "created_at": created[n]
+                })
+            self.insert(Transaction, rows)
+            return count
+
+        self.timed("transactions", total, generate)
+
+    def run(self) -> Dict[str, int]:
+        args = self.args
+        print(f"Run tag {self.tag}; writing with {'COPY' if self.use_copy else 'bulk_insert_mappings'}")
+        rider_ids = self.users(UserRole.RIDER, args.riders)
+        driver_ids = self.users(UserRole.DRIVER, args.drivers)
+        self.driver_profiles(driver_ids)
+        vacation_legs = 0
+        if len(rider_ids) and len(driver_ids):
+            self.rides(rider_ids, driver_ids, args.rides)
+            vacation_legs = self.vacations(rider_ids, driver_ids, args.vacations)
+            self.transactions(rider_ids, driver_ids, args.transactions)
+        if self.db.bind.dialect.name == "postgresql":
+            # Fresh statistics so EXPLAIN reflects the new volumes
+            self.db.connection().exec_driver_sql("ANALYZE")
+            self.db.commit()
+        return {
+            "riders": len(rider_ids),
+            "drivers": len(driver_ids),
+            "rides": args.rides,
+            "vacations": args.vacations,
+            "vacation legs": vacation_legs,
+            "transactions": args.transactions
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=100000)
+    parser.add_argument("--drivers", type=int, default=10000)
+    parser.add_argument("--rides", type=int, default=1000000)
+    parser.add_argument("--vacations", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=500000)
+    parser.add_argument("--days", type=int, default=180, help="Spread timestamps over this many past days")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per insert/commit")
+    parser.add_argument("--copy", action="store_true", help="Use COPY instead of bulk inserts on PostgreSQL")
+    parser.add_argument("--password", default="password123", help="Password shared by every generated user")
+    parser.add_argument("--tag", help="Run tag used in emails and unique fields (default: random)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        counts = Generator(db, args).run()
+    finally:
+        db.close()
+    total = sum(counts.values())
+    print(f"\nGenerated {total:,} rows in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{count:,} {name}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
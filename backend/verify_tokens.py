@@ -0,0 +1,173 @@
+"""
+Checks for access token verification (app/tokens.py) and refresh token
+rotation (app/refresh_tokens.py).
+
+Runs against a throwaway SQLite database and exits non-zero if any check fails:
+
+    python verify_tokens.py
+"""
+import base64
+import hmac
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "verify-secret")
+
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import RefreshToken, User, UserRole
+from app import refresh_tokens
+from app.tokens import TokenService
+
+KEY = "verify-secret"
+CLAIMS = {"sub": "rider@example.com", "uid": 7, "role": "rider"}
+
+failures = []
+
+
+def check(name: str, condition: bool):
+    print(f"{'PASS' if condition else 'FAIL'}  {name}")
+    if not condition:
+        failures.append(name)
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def forge(header: dict, payload: dict, key: str = KEY) -> str:
+    """Token with an arbitrary header, HMAC-SHA256 signed with ``key``"""
+    signing_input = f"{b64(json.dumps(header).encode())}.{b64(json.dumps(payload).encode())}"
+    signature = hmac.new(key.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{b64(signature)}"
+
+
+def forge_raw(payload: bytes) -> str:
+    """HS256-signed token with an arbitrary (possibly non-JSON) payload"""
+    signing_input = f"{b64(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())}.{b64(payload)}"
+    signature = hmac.new(KEY.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{b64(signature)}"
+
+
+def verify_access_tokens():
+    service = TokenService(KEY, "HS256", expire_minutes=15, cache_size=4)
+    token = service.create(CLAIMS)
+    claims = service.decode(token)
+    check("round trip keeps claims", claims is not None and all(claims[k] == v for k, v in CLAIMS.items()))
+    check("exp claim is set", claims is not None and claims["exp"] > time.time())
+
+    # python-jose interoperability, both directions
+    check("jose accepts our tokens", jwt.decode(token, KEY, algorithms=["HS256"])["uid"] == CLAIMS["uid"])
+    jose_token = jwt.encode(dict(CLAIMS, exp=datetime.utcnow() + timedelta(minutes=5)), KEY, algorithm="HS256")
+    check("we accept jose tokens", (service.decode(jose_token) or {}).get("uid") == CLAIMS["uid"])
+
+    exp = int(time.time()) + 300
+    header, payload, signature = token.split(".")
+    unsigned_none = f"{b64(json.dumps({'alg': 'none', 'typ': 'JWT'}).encode())}.{payload}."
+    check("alg=none without signature is rejected", service.decode(unsigned_none) is None)
+    check("alg=none with a valid HMAC is rejected", service.decode(forge({"alg": "none", "typ": "JWT"}, dict(CLAIMS, exp=exp))) is None)
+    check("alg=HS512 header is rejected", service.decode(forge({"alg": "HS512", "typ": "JWT"}, dict(CLAIMS, exp=exp))) is None)
+    check("reordered HS256 header is accepted", service.decode(forge({"typ": "JWT", "alg": "HS256"}, dict(CLAIMS, exp=exp))) is not None)
+
+    tampered_payload = b64(json.dumps(dict(CLAIMS, uid=1, role="admin", exp=exp)).encode())
+    check("tampered payload is rejected", service.decode(f"{header}.{tampered_payload}.{signature}") is None)
+    flipped = signature[:-2] + ("A" if signature[-2] != "A" else "B") + signature[-1]
+    check("tampered signature is rejected", service.decode(f"{header}.{payload}.{flipped}") is None)
+    check("wrong key is rejected", service.decode(forge({"alg": "HS256", "typ": "JWT"}, dict(CLAIMS, exp=exp), key="other")) is None)
+
+    for label, bad in [
+        ("empty string", ""),
+        ("two segments", "a.b"),
+        ("four segments", "a.b.c.d"),
+        ("garbage segments", "%%%.%%%.%%%"),
+    ]:
+        check(f"malformed token ({label}) is rejected", service.decode(bad) is None)
+    check("non-JSON payload is rejected", service.decode(forge_raw(b"not json")) is None)
+    check("non-object payload is rejected", service.decode(forge_raw(json.dumps([1, 2]).encode())) is None)
+    check("non-numeric exp is rejected", service.decode(forge({"alg": "HS256", "typ": "JWT"}, dict(CLAIMS, exp="soon"))) is None)
+
+    check("expired token is rejected", service.decode(forge({"alg": "HS256", "typ": "JWT"}, dict(CLAIMS, exp=int(time.time()) - 1))) is None)
+    check("not-yet-valid token is rejected", service.decode(forge({"alg": "HS256", "typ": "JWT"}, dict(CLAIMS, exp=exp, nbf=int(time.time()) + 60))) is None)
+
+    # Cached tokens must still expire
+    short = service.create(CLAIMS, expires_delta=timedelta(seconds=1))
+    check("short-lived token is accepted", service.decode(short) is not None)
+    check("short-lived token is served from the cache", service.decode(short) is not None and service.hits > 0)
+    time.sleep(1.1)
+    check("cached token is rejected after exp", service.decode(short) is None)
+
+    for uid in range(10):
+        service.decode(service.create(dict(CLAIMS, uid=uid)))
+    check("cache stays within cache_size", service.stats()["cached"] <= 4)
+
+    returned = service.decode(token)
+    returned["role"] = "admin"
+    check("callers cannot mutate cached claims", service.decode(token)["role"] == "rider")
+
+
+def verify_refresh_tokens():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'tokens.db')}")
+        Base.metadata.create_all(bind=engine, tables=[User.__table__, RefreshToken.__table__])
+        db = sessionmaker(bind=engine)()
+        try:
+            user = User(name="Rider", email="rider@example.com", password="x", role=UserRole.RIDER, is_active=True)
+            db.add(user)
+            db.commit()
+
+            first, row = refresh_tokens.issue(db, user.id)
+            check("only the hash is stored", row.token_hash == refresh_tokens.hash_token(first) and row.token_hash != first)
+
+            rotated = refresh_tokens.rotate(db, first)
+            check("refresh returns the user and a new token", rotated is not None and rotated[0].id == user.id and rotated[1] != first)
+            second = rotated[1]
+            check("rotated token stays in the family", db.query(RefreshToken).filter(RefreshToken.family_id == row.family_id).count() == 2)
+
+            check("reusing a rotated token is rejected", refresh_tokens.rotate(db, first) is None)
+            check("reuse revokes the whole family", refresh_tokens.rotate(db, second) is None)
+
+            check("unknown token is rejected", refresh_tokens.rotate(db, "not-a-token") is None)
+
+            third, _ = refresh_tokens.issue(db, user.id)
+            check("logout revokes the family", refresh_tokens.revoke(db, third) and refresh_tokens.rotate(db, third) is None)
+
+            expired, expired_row = refresh_tokens.issue(db, user.id)
+            expired_row.expires_at = datetime.now() - timedelta(minutes=1)
+            db.commit()
+            expired_id = expired_row.id
+            check("expired token is rejected", refresh_tokens.rotate(db, expired) is None)
+
+            inactive, _ = refresh_tokens.issue(db, user.id)
+            user.is_active = False
+            db.commit()
+            check("inactive user cannot refresh", refresh_tokens.rotate(db, inactive) is None)
+            user.is_active = True
+            db.commit()
+
+            purged = refresh_tokens.purge_expired(db)
+            check("purge deletes expired tokens", purged >= 1 and db.query(RefreshToken).filter(RefreshToken.id == expired_id).count() == 0)
+            live, _ = refresh_tokens.issue(db, user.id)
+            refresh_tokens.purge_expired(db)
+            check("purge keeps live tokens", refresh_tokens.rotate(db, live) is not None)
+        finally:
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    verify_access_tokens()
+    verify_refresh_tokens()
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll token checks passed")
@@ -29,6 +29,26 @@ const api = axios.create({
   },
 })
 
+// One refresh at a time; requests that fail while it runs wait for the same result
+let refreshPromise = null
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const storageKey = getStorageKey()
+    const refreshToken = sessionStorage.getItem(`${storageKey}-refresh`)
+    refreshPromise = (refreshToken
+      ? axios.post('/api/auth/refresh', { refresh_token: refreshToken }).then(({ data }) => {
+          useAuthStore.getState().setTokens(data.access_token, data.refresh_token)
+          return data.access_token
+        })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshPromise = null
+    })
+  }
+  return refreshPromise
+}
+
 api.interceptors.request.use((config) => {
   console.log('=== AXIOS REQUEST INTERCEPTOR ===')
   console.log('Request URL:', config.url)
@@ -69,6 +89,23 @@ api.interceptors.response.use(
     console.error('Error message:', error.message)
     console.error('=== END AXIOS RESPONSE ERROR INTERCEPTOR ===')
 
+    const original = error.config
+    if (error.response?.status === 401 && original && !original._retried && !original.url?.startsWith('/auth/')) {
+      // The access token expired; renew it with the refresh token and retry once
+      original._retried = true
+      return refreshAccessToken().then(
+        (token) => {
+          original.headers.Authorization = `Bearer ${token}`
+          return api(original)
+        },
+        () => {
+          console.log('Refresh failed, logging out...')
+          useAuthStore.getState().logout()
+          return Promise.reject(error)
+        }
+      )
+    }
+
     if (error.response?.status === 401) {
       console.log('401 Unauthorized, logging out...')
       // Use auth store to logout properly
@@ -4,6 +4,13 @@ import { Car, Mail, Lock, AlertCircle } from 'lucide-react'
 import { authService } from '../services/api'
 import { useAuthStore } from '../store/authStore'
 
+// Tokens for the other portal travel in the URL fragment, never the query string
+const redirectFragment = (data) => new URLSearchParams({
+  token: data.access_token,
+  refresh: data.refresh_token || '',
+  user: JSON.stringify(data.user)
+}).toString()
+
 export default function Login() {
   const [email, setEmail] = useState('')
   const [password, setPassword] = useState('')
@@ -13,16 +20,22 @@ export default function Login() {
   const navigate = useNavigate()
   const login = useAuthStore((state) => state.login)
 
-  // Check for token in URL on mount (for cross-port redirection)
+  // Check for tokens in the URL fragment on mount (for cross-port redirection).
+  // The fragment is never sent to a server or in a Referer header, and it is
+  // cleared from the address bar and history before anything else happens.
   useEffect(() => {
-    const params = new URLSearchParams(window.location.search)
+    const params = new URLSearchParams(window.location.hash.slice(1))
     const token = params.get('token')
+    const refreshToken = params.get('refresh')
     const userStr = params.get('user')
+    if (window.location.hash) {
+      window.history.replaceState(null, '', window.location.pathname + window.location.search)
+    }
 
     if (token && userStr) {
       try {
-        const user = JSON.parse(decodeURIComponent(userStr))
-        login(token, user)
+        const user = JSON.parse(userStr)
+        login(token, user, refreshToken)
 
         // Navigate based on role
         if (user.role === 'rider') navigate('/rider')
@@ -46,22 +59,22 @@ export default function Login() {
 
       // Port Redirection Logic
       if (role === 'driver' && currentPort !== '6001') {
-        window.location.href = `http://localhost:6001/login?token=${data.access_token}&user=${encodeURIComponent(JSON.stringify(data.user))}`
+        window.location.href = `http://localhost:6001/login#${redirectFragment(data)}`
         return
       }
 
       if (role === 'rider' && currentPort !== '5000' && currentPort !== '5173') {
         // Allow 5173 as dev default, but prefer 5000 if configured
-        window.location.href = `http://localhost:5000/login?token=${data.access_token}&user=${encodeURIComponent(JSON.stringify(data.user))}`
+        window.location.href = `http://localhost:5000/login#${redirectFragment(data)}`
         return
       }
 
       if (role === 'admin' && currentPort !== '7001') {
-        window.location.href = `http://localhost:7001/login?token=${data.access_token}&user=${encodeURIComponent(JSON.stringify(data.user))}`
+        window.location.href = `http://localhost:7001/login#${redirectFragment(data)}`
         return
       }
 
-      login(data.access_token, data.user)
+      login(data.access_token, data.user, data.refresh_token)
 
       // Navigate based on role (if no redirection needed)
       if (role === 'rider') navigate('/rider')
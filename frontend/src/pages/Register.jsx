@@ -64,7 +64,7 @@ export default function Register() {
             vehicle_color: formData.vehicle_color || 'White'
           }
         )
-        login(data.access_token, data.user)
+        login(data.access_token, data.user, data.refresh_token)
         navigate('/driver')
       } else {
         // Register as rider
@@ -75,7 +75,7 @@ export default function Register() {
           password: formData.password,
           role: 'rider'
         })
-        login(data.access_token, data.user)
+        login(data.access_token, data.user, data.refresh_token)
         navigate('/rider')
       }
     } catch (err) {
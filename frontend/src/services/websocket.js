@@ -34,6 +34,11 @@ class WebSocketService {
     this.ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        // Answer server heartbeats so the connection isn't reaped as stale
+        if (data.type === 'ping') {
+          this.sendMessage({ type: 'pong' });
+          return;
+        }
         this.notifyListeners('message', data);
       } catch (error) {
         console.error('Failed to parse WebSocket message:', error);
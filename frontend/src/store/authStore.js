@@ -30,16 +30,35 @@ export const useAuthStore = create(
     isAuthenticated: false,
     role: getRoleFromUrl(),
 
-    login: (token, user) => {
+    login: (token, user, refreshToken) => {
       const storageKey = getStorageKey()
       sessionStorage.setItem(`${storageKey}-token`, token)
+      if (refreshToken) sessionStorage.setItem(`${storageKey}-refresh`, refreshToken)
       sessionStorage.setItem(`${storageKey}-user`, JSON.stringify(user))
       set({ token, user, isAuthenticated: true, role: getRoleFromUrl() })
     },
 
+    // Store a renewed token pair after /api/auth/refresh
+    setTokens: (token, refreshToken) => {
+      const storageKey = getStorageKey()
+      sessionStorage.setItem(`${storageKey}-token`, token)
+      sessionStorage.setItem(`${storageKey}-refresh`, refreshToken)
+      set({ token })
+    },
+
     logout: () => {
       const storageKey = getStorageKey()
+      const refreshToken = sessionStorage.getItem(`${storageKey}-refresh`)
+      if (refreshToken) {
+        // Revoke the session server-side; the local logout does not wait for it
+        fetch('/api/auth/logout', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ refresh_token: refreshToken })
+        }).catch((error) => console.error('logout failed:', error))
+      }
       sessionStorage.removeItem(`${storageKey}-token`)
+      sessionStorage.removeItem(`${storageKey}-refresh`)
       sessionStorage.removeItem(`${storageKey}-user`)
       set({ token: null, user: null, isAuthenticated: false, role: getRoleFromUrl() })
     },
@@ -81,6 +100,7 @@ export const useAuthStore = create(
           console.error('Failed to parse user from storage:', e)
           // Clear invalid storage
           sessionStorage.removeItem(`${storageKey}-token`)
+          sessionStorage.removeItem(`${storageKey}-refresh`)
           sessionStorage.removeItem(`${storageKey}-user`)
         }
       }
@@ -92,6 +112,7 @@ export const useAuthStore = create(
       const keys = ['rider', 'driver', 'admin']
       keys.forEach(role => {
         sessionStorage.removeItem(`auth-storage-${role}-token`)
+        sessionStorage.removeItem(`auth-storage-${role}-refresh`)
         sessionStorage.removeItem(`auth-storage-${role}-user`)
       })
       set({ token: null, user: null, isAuthenticated: false, role: getRoleFromUrl() })